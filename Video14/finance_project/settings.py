@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -58,6 +59,7 @@ MIDDLEWARE = [
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "django_htmx.middleware.HtmxMiddleware",
+    "tracker.middleware.RateLimitMiddleware",
 ]
 
 ROOT_URLCONF = "finance_project.urls"
@@ -84,10 +86,31 @@ WSGI_APPLICATION = "finance_project.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# connections are kept for a minute, by request threads and by the worker
+# threads of the async views (see tracker/concurrency.py) alike
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        "CONN_MAX_AGE": 60,
+        "CONN_HEALTH_CHECKS": True,
+    }
+}
+
+
+# Cache
+# A single SQLite file shared by every worker process on the host, so that
+# invalidations (and the per-user data versions) are seen by all of them.
+
+CACHES = {
+    "default": {
+        "BACKEND": "tracker.sqlite_cache.SQLiteCache",
+        "LOCATION": BASE_DIR / "cache.sqlite3",
+        "TIMEOUT": 300,
+        "OPTIONS": {
+            "MAX_ENTRIES": 100_000,
+            "MAX_SIZE": 256 * 1024 * 1024,
+        },
     }
 }
 
@@ -145,4 +168,109 @@ INTERNAL_IPS = [
 AUTH_USER_MODEL = 'tracker.User'
 LOGIN_REDIRECT_URL = 'index'
 
-PAGE_SIZE = 5
\ No newline at end of file
+PAGE_SIZE = 5
+
+# bounds for the page sizes chosen from the client's viewport and scroll speed
+# (see tracker/paging.py)
+PAGE_SIZE_MIN = 5
+PAGE_SIZE_MAX = 100
+PAGE_OVERSCAN_ROWS = 5
+PAGE_LOOKAHEAD_SECONDS = 1
+
+# most points a time-series chart draws, and how many times as many buckets
+# line charts fetch before they are downsampled (see tracker/bucketing.py)
+CHART_MAX_POINTS = 366
+CHART_OVERSAMPLE = 4
+
+# seconds a rendered transaction row stays in the cache
+ROW_CACHE_TIMEOUT = 60 * 60 * 24
+
+# seconds the income/expense totals of a filter stay in the cache
+TOTALS_CACHE_TIMEOUT = 60 * 60
+
+# seconds a user's columnar copy of their transactions (tracker/frames.py)
+# stays in the cache
+FRAME_CACHE_TIMEOUT = 60 * 60
+
+# seconds a period comparison (tracker/reports.py) stays in the cache
+COMPARISON_CACHE_TIMEOUT = 60 * 60
+
+# spending anomalies (tracker/anomalies.py): an expense is scored against the
+# previous ANOMALY_WINDOW expenses in its category, a day's spending against
+# the previous ANOMALY_DAILY_WINDOW days, and flagged above ANOMALY_THRESHOLD
+# robust z-scores. detect_anomalies scans ANOMALY_CHUNK_SIZE users per task
+# on ANOMALY_WORKERS processes (None: one per CPU).
+ANOMALY_WINDOW = 30
+ANOMALY_DAILY_WINDOW = 28
+ANOMALY_THRESHOLD = 3.5
+ANOMALY_CHUNK_SIZE = 50
+ANOMALY_WORKERS = None
+
+# recurring transactions (tracker/recurring.py): a series is at least
+# RECURRING_MIN_OCCURRENCES transactions of a type and category whose amounts
+# are within RECURRING_AMOUNT_TOLERANCE of each other, with at least
+# RECURRING_MIN_MATCH of the intervals between them weekly, monthly or annual
+RECURRING_AMOUNT_TOLERANCE = 0.05
+RECURRING_MIN_OCCURRENCES = 4
+RECURRING_MIN_MATCH = 0.75
+
+# users with at least SNAPSHOT_MIN_TRANSACTIONS transactions get a columnar
+# snapshot on disk, read with numpy.memmap; writes go to a delta segment that
+# is merged once it has SNAPSHOT_DELTA_MAX records (see tracker/snapshots.py).
+# None switches snapshots off.
+SNAPSHOT_DIR = BASE_DIR / 'snapshots'
+SNAPSHOT_MIN_TRANSACTIONS = 5000
+SNAPSHOT_DELTA_MAX = 500
+
+# full pages kept per user to answer htmx history-restore requests, for how
+# many seconds, and the largest page kept - bigger ones would crowd the rest
+# of the shared cache out
+HISTORY_PAGES = 10
+HISTORY_PAGE_TIMEOUT = 60 * 30
+HISTORY_PAGE_MAX_BYTES = 512 * 1024
+
+# use the async list/chart views, which run independent queries concurrently.
+# asgi.py switches this on; WSGI deployments keep the sync views.
+ASYNC_VIEWS = os.environ.get('TRACKER_ASYNC_VIEWS') == '1'
+CONCURRENT_QUERIES = True
+
+# identical expensive requests (charts, export) are computed once per host: the
+# leader holds a lock file in this directory, and leaves its result there for
+# requests queued in other processes, who read it within
+# SINGLEFLIGHT_RESULT_TTL seconds. The directory must be private to the user
+# the app runs as (mode 0700); it is created that way at startup. Lock files
+# unused for SINGLEFLIGHT_LOCK_MAX_AGE seconds are removed.
+SINGLEFLIGHT_LOCK_DIR = BASE_DIR / 'singleflight'
+SINGLEFLIGHT_RESULT_TTL = 5
+SINGLEFLIGHT_LOCK_MAX_AGE = 60 * 60
+
+# limits for the expensive views, by URL name. "user" and "global" are token
+# buckets of (tokens per second, burst size); "concurrency" caps the requests
+# each process runs at once. Rejected requests get a 429 with Retry-After.
+# Optional "methods" limits only those methods, and "htmx": False leaves out
+# htmx requests - the export's htmx request only redirects to the download.
+RATE_LIMITS = {
+    'transactions-charts': {'user': (1, 10), 'global': (20, 60), 'concurrency': 4},
+    'pivot-report': {'user': (1, 10), 'global': (20, 60), 'concurrency': 4},
+    'pivot-report-csv': {'user': (0.2, 3), 'global': (2, 10), 'concurrency': 2},
+    'period-comparison': {'user': (1, 10), 'global': (20, 60), 'concurrency': 4},
+    'export': {
+        'user': (0.2, 3), 'global': (2, 10), 'concurrency': 2,
+        'methods': ('GET',), 'htmx': False,
+    },
+    'import': {
+        'user': (0.2, 3), 'global': (2, 10), 'concurrency': 2,
+        'methods': ('POST',),
+    },
+}
+
+# seconds of database time each view may use before its queries are aborted.
+# Requests replaced by a newer one from the same tab are cancelled as well.
+QUERY_TIME_BUDGETS = {
+    'transactions-list': 5,
+    'get-transactions': 5,
+    'transactions-charts': 10,
+    'dashboard-panel': 5,
+    'pivot-report': 10,
+    'period-comparison': 10,
+}
\ No newline at end of file
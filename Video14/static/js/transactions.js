@@ -0,0 +1,193 @@
+// One delegated click handler for the edit/delete links on every transaction row.
+// Rows only carry a data-pk; the URLs are built from the templates on the table.
+document.addEventListener('click', function (evt) {
+    const link = evt.target.closest('[data-action]');
+    if (!link) return;
+
+    if (link.dataset.action === 'close-form') {
+        document.getElementById('transaction-form-area').innerHTML = '';
+        return;
+    }
+
+    const row = link.closest('tr[data-pk]');
+    const table = link.closest('table[data-update-url]');
+    if (!row || !table) return;
+
+    const action = link.dataset.action;
+    const url = table.dataset[action + 'Url'].replace('/0/', '/' + row.dataset.pk + '/');
+
+    if (action === 'delete') {
+        if (!confirm('Are you sure you want to delete this transaction?')) return;
+        htmx.ajax('DELETE', url, {source: link, target: '#transaction-form-area'});
+    } else {
+        htmx.ajax('GET', url, {source: link, target: '#transaction-form-area'});
+    }
+});
+
+// htmx doesn't swap error responses by default - let the rate-limit and
+// timeout alerts through
+document.addEventListener('htmx:beforeSwap', function (evt) {
+    if (evt.detail.xhr.status === 429 || evt.detail.xhr.status === 503) {
+        evt.detail.shouldSwap = true;
+        evt.detail.isError = false;
+    }
+});
+
+// Client hints for the infinite-scroll page size (see tracker/paging.py): how
+// many rows fit in the viewport, and how fast the list is being scrolled.
+const DEFAULT_ROW_HEIGHT = 49;
+let scrollVelocity = 0;  // rows per second
+let lastScroll = {y: window.scrollY, time: performance.now()};
+
+function rowHeight() {
+    const row = document.querySelector('#transaction-rows tr[data-pk]');
+    return (row && row.offsetHeight) || DEFAULT_ROW_HEIGHT;
+}
+
+function viewportRows() {
+    return Math.ceil(window.innerHeight / rowHeight());
+}
+
+// full page loads can't send headers, so the first page is sized from a cookie
+function rememberViewportRows() {
+    document.cookie = 'viewport_rows=' + viewportRows() + '; path=/; max-age=31536000; SameSite=Lax';
+}
+rememberViewportRows();
+window.addEventListener('resize', rememberViewportRows);
+
+window.addEventListener('scroll', function () {
+    const now = performance.now();
+    const seconds = (now - lastScroll.time) / 1000;
+    if (seconds <= 0) return;
+    const rows = Math.abs(window.scrollY - lastScroll.y) / rowHeight();
+    // smoothed, so a single jump doesn't decide the next page size
+    scrollVelocity = 0.7 * scrollVelocity + 0.3 * (rows / seconds);
+    lastScroll = {y: window.scrollY, time: now};
+}, {passive: true});
+
+// Requests from elements with hx-sync="...replace" carry a tab id and an
+// increasing sequence number, so the server can stop running the queries of a
+// request that a newer one from the same tab has replaced.
+const tabId = sessionStorage.getItem('tabId') || Math.random().toString(36).slice(2);
+sessionStorage.setItem('tabId', tabId);
+
+document.addEventListener('htmx:configRequest', function (evt) {
+    // no scroll events for a second means the list has stopped
+    const idle = (performance.now() - lastScroll.time) / 1000 > 1;
+    evt.detail.headers['X-Viewport-Rows'] = viewportRows();
+    evt.detail.headers['X-Scroll-Velocity'] = idle ? 0 : scrollVelocity.toFixed(1);
+
+    // writes answer with out-of-band row and totals updates, which depend on
+    // the filter the list is showing
+    const filterForm = document.getElementById('filterform');
+    if (evt.detail.verb !== 'get' && filterForm) {
+        evt.detail.headers['X-Filter-Query'] = new URLSearchParams(new FormData(filterForm)).toString();
+    }
+
+    if (!evt.detail.elt.closest('[hx-sync*="replace"]')) return;
+    evt.detail.headers['X-Tab-Id'] = tabId;
+    // microseconds since the epoch keep increasing across page reloads
+    evt.detail.headers['X-Request-Seq'] = Math.round((performance.timeOrigin + performance.now()) * 1000);
+});
+
+// Windowed list: once the table holds more than WINDOW_ROWS rows, rows more
+// than WINDOW_MARGIN_SCREENS screens away from the viewport are dropped, so
+// the DOM stays bounded however far the list is scrolled. Rows dropped above
+// the viewport leave a spacer of the same height, which fetches them back
+// (?before=<cursor>) when it's scrolled into view. Rows dropped below move the
+// "load more" trigger (?after=<cursor>) up to the new last row.
+const WINDOW_ROWS = 150;
+const WINDOW_MARGIN_SCREENS = 2;
+
+function rowsUrl(direction, row) {
+    const table = document.getElementById('transaction-table');
+    return table.dataset.rowsUrl + '?' + direction + '=' + encodeURIComponent(row.dataset.cursor);
+}
+
+function fetchRowsFrom(elt, direction, row, trigger) {
+    elt.dataset.fromCursor = row.dataset.cursor;
+    elt.setAttribute('hx-get', rowsUrl(direction, row));
+    elt.setAttribute('hx-trigger', trigger);
+    elt.setAttribute('hx-swap', 'afterend');
+    elt.setAttribute('hx-include', '#filterform');
+    // changed attributes make htmx set the element up again
+    htmx.process(elt);
+}
+
+function topSpacer(tbody) {
+    let spacer = tbody.querySelector(':scope > tr.window-spacer');
+    if (!spacer) {
+        spacer = document.createElement('tr');
+        spacer.className = 'window-spacer';
+        spacer.style.height = '0px';
+        // a row without cells may not take up any height
+        const cell = document.createElement('td');
+        cell.colSpan = 5;
+        spacer.appendChild(cell);
+        tbody.insertBefore(spacer, tbody.querySelector(':scope > tr[data-cursor]'));
+    }
+    return spacer;
+}
+
+function pruneWindow() {
+    const tbody = document.getElementById('transaction-rows');
+    if (!tbody) return;
+    const rows = Array.from(tbody.querySelectorAll(':scope > tr[data-cursor]'));
+    if (rows.length <= WINDOW_ROWS) return;
+
+    const margin = window.innerHeight * WINDOW_MARGIN_SCREENS;
+    const above = [], below = [];
+    for (const row of rows) {
+        const rect = row.getBoundingClientRect();
+        if (rect.bottom < -margin) above.push(row);
+        else if (rect.top > window.innerHeight + margin) below.push(row);
+    }
+    if (above.length === rows.length || below.length === rows.length) return;
+
+    if (above.length) {
+        const height = above.reduce((sum, row) => sum + row.offsetHeight, 0);
+        const spacer = topSpacer(tbody);
+        above.forEach(row => row.remove());
+        spacer.style.height = (parseFloat(spacer.style.height) + height) + 'px';
+        // intersect rather than revealed: it fires again if the spacer is
+        // still in view after a page of rows came back
+        fetchRowsFrom(spacer, 'before', rows[above.length], 'intersect');
+    }
+    if (below.length) {
+        const last = rows[rows.length - below.length - 1];
+        below.forEach(row => row.remove());
+        fetchRowsFrom(last, 'after', last, 'revealed');
+    }
+}
+
+document.addEventListener('htmx:afterSwap', function (evt) {
+    const spacer = evt.detail.elt;
+    if (spacer.classList && spacer.classList.contains('window-spacer')) {
+        // the rows fetched back now take up part of the spacer's height
+        let height = 0;
+        for (let row = spacer.nextElementSibling; row && row.dataset.cursor !== spacer.dataset.fromCursor; row = row.nextElementSibling) {
+            height += row.offsetHeight;
+        }
+        const first = spacer.nextElementSibling;
+        if (evt.detail.xhr.getResponseHeader('X-Has-More') !== 'true' || !first || !first.dataset.cursor) {
+            spacer.remove();
+        } else {
+            spacer.style.height = Math.max(parseFloat(spacer.style.height) - height, 0) + 'px';
+            fetchRowsFrom(spacer, 'before', first, 'intersect');
+        }
+    }
+    if (evt.detail.target.closest && evt.detail.target.closest('#transaction-rows')) {
+        pruneWindow();
+    }
+});
+
+// An edited row is swapped out whole. If it was the one loading more rows,
+// the new row takes over its trigger, still fetching after the old cursor.
+document.addEventListener('htmx:oobBeforeSwap', function (evt) {
+    const old = evt.detail.target;
+    const row = evt.detail.fragment.firstElementChild || evt.detail.fragment;
+    if (!old.matches || !old.matches('#transaction-rows > tr[hx-get]') || row.hasAttribute('hx-get')) return;
+    for (const name of ['hx-get', 'hx-trigger', 'hx-swap', 'hx-include', 'hx-indicator', 'data-from-cursor']) {
+        if (old.hasAttribute(name)) row.setAttribute(name, old.getAttribute(name));
+    }
+});
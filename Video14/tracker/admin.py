@@ -1,6 +1,8 @@
 from django.contrib import admin
-from tracker.models import Category, Transaction
+from tracker.models import Anomaly, Category, RecurringSeries, Transaction
 
 # Register your models here.
 admin.site.register(Transaction)
-admin.site.register(Category)
\ No newline at end of file
+admin.site.register(Category)
+admin.site.register(Anomaly)
+admin.site.register(RecurringSeries)
\ No newline at end of file
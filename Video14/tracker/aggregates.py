@@ -0,0 +1,134 @@
+"""
+Statistical aggregates that SQLite lacks: percentiles, the median and the
+standard deviation, so per-category statistics can be computed in the
+database rather than by pulling every row into Python.
+
+On SQLite they are user-defined functions registered on every new
+connection. Each keeps its state incrementally - a sorted list, or running
+sums - so it also works as a window function over a sliding frame. On
+PostgreSQL the same aggregates compile to the built-in PERCENTILE_CONT and
+STDDEV_SAMP.
+
+Over a MoneyField the results come back as amounts, rounded to the cent.
+"""
+import bisect
+import math
+from django.db.backends.signals import connection_created
+from django.db.models import Aggregate, Func
+from django.dispatch import receiver
+
+
+class _Percentile:
+    """PERCENTILE(value, fraction): linear interpolation, like PERCENTILE_CONT."""
+
+    def __init__(self):
+        self.values = []
+        self.fraction = None
+
+    def step(self, value, fraction):
+        self.fraction = fraction
+        if value is not None:
+            bisect.insort(self.values, value)
+
+    def inverse(self, value, fraction):
+        if value is not None:
+            del self.values[bisect.bisect_left(self.values, value)]
+
+    def value(self):
+        if not self.values:
+            return None
+        position = (len(self.values) - 1) * self.fraction
+        lower = math.floor(position)
+        upper = min(lower + 1, len(self.values) - 1)
+        return self.values[lower] + (self.values[upper] - self.values[lower]) * (position - lower)
+
+    finalize = value
+
+
+class _StdDev:
+    """STDDEV(value): the sample standard deviation, like STDDEV_SAMP."""
+
+    def __init__(self):
+        # exact for integers, such as amounts in cents
+        self.count = self.total = self.squares = 0
+
+    def step(self, value):
+        if value is not None:
+            self.count += 1
+            self.total += value
+            self.squares += value * value
+
+    def inverse(self, value):
+        if value is not None:
+            self.count -= 1
+            self.total -= value
+            self.squares -= value * value
+
+    def value(self):
+        if self.count < 2:
+            return None
+        variance = (self.squares - self.total * self.total / self.count) / (self.count - 1)
+        return math.sqrt(max(variance, 0))
+
+    finalize = value
+
+
+FUNCTIONS = {
+    'PERCENTILE': (2, _Percentile),
+    'STDDEV': (1, _StdDev),
+}
+
+
+@receiver(connection_created)
+def register_functions(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    for name, (num_params, implementation) in FUNCTIONS.items():
+        # also usable as aggregates, with OVER (...) or without
+        connection.connection.create_window_function(name, num_params, implementation)
+
+
+class Percentile(Aggregate):
+    function = 'PERCENTILE'
+    name = 'Percentile'
+    template = '%(function)s(%(distinct)s%(expressions)s, %(fraction)r)'
+
+    def __init__(self, expression, fraction, **extra):
+        fraction = float(fraction)
+        if not 0 <= fraction <= 1:
+            raise ValueError("fraction must be between 0 and 1")
+        super().__init__(expression, fraction=fraction, **extra)
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler,
+            connection,
+            function='PERCENTILE_CONT',
+            template='%(function)s(%(fraction)r) WITHIN GROUP (ORDER BY %(expressions)s)',
+            **extra_context,
+        )
+
+
+class Median(Percentile):
+    name = 'Median'
+
+    def __init__(self, expression, **extra):
+        super().__init__(expression, 0.5, **extra)
+
+
+class StdDev(Aggregate):
+    function = 'STDDEV'
+    name = 'StdDev'
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, function='STDDEV_SAMP', **extra_context)
+
+
+class RunningSum(Func):
+    """
+    SUM() as a window function over an aggregate, which Sum() itself refuses:
+    Window(RunningSum(Sum('amount')), order_by='month') is the running total
+    of the monthly sums.
+    """
+    function = 'SUM'
+    window_compatible = True
@@ -0,0 +1,244 @@
+"""
+Spending anomalies: expenses far outside their category's recent amounts,
+and days whose total spending is far outside the days before them.
+
+Both are robust z-scores against a trailing window - the median and the
+median absolute deviation (MAD) of the category's previous
+settings.ANOMALY_WINDOW expenses, or of the previous
+settings.ANOMALY_DAILY_WINDOW days' totals - which one huge expense can't
+drag along the way it drags a mean and a standard deviation. A user's
+scores are computed at once over NumPy sliding windows, with no loop per
+transaction.
+
+detect() scans users in chunks on a process pool. The workers only read
+and compute; the parent saves the flags, so SQLite never has concurrent
+writers. Saving touches the rows whose badge changes (their updated_at,
+which keys the row cache) and bumps the user's anomalies data version,
+which ETags and cached pages are validated against.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+import django
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+from tracker import snapshots
+from tracker.caching import anomalies_owner, bump_data_version, get_data_version
+from tracker.frames import EXPENSE, fetch_columns, to_date
+from tracker.models import Anomaly, Transaction
+
+# scales the MAD to the standard deviation of normally distributed data
+MAD_SCALE = 1.4826
+
+# windows scored at a time, which bounds the memory of a huge user's scan
+BLOCK_ROWS = 65536
+
+
+def _row_medians(rows):
+    # sorting rows of a few dozen values is several times faster than
+    # np.median(), which partitions each row
+    rows = np.sort(rows, axis=1)
+    width = rows.shape[1]
+    return (rows[:, width // 2] + rows[:, (width - 1) // 2]) / 2
+
+
+def robust_z(values, windows):
+    """
+    The robust z-score of each value against its row of windows. Values
+    whose window has no spread (a MAD of 0) score 0: nothing is known about
+    how far from the median is unusual.
+    """
+    scores = np.zeros(len(values))
+    for start in range(0, len(values), BLOCK_ROWS):
+        block = np.asarray(windows[start:start + BLOCK_ROWS], dtype=float)
+        median = _row_medians(block)
+        mad = _row_medians(np.abs(block - median[:, None])) * MAD_SCALE
+        spread = mad > 0
+        scores[start:start + BLOCK_ROWS][spread] = (
+            values[start:start + BLOCK_ROWS][spread] - median[spread]
+        ) / mad[spread]
+    return scores
+
+
+def amount_anomalies(columns, window, threshold):
+    """
+    (transaction id, day, score) of the expenses that score above threshold
+    against the previous `window` expenses in their category. Amounts are
+    scored on a log scale, as they are skewed: twice the usual amount is as
+    far out as half of it.
+    """
+    expense = columns['types'] == EXPENSE
+    # by category, keeping the (date, id) order within each
+    order = np.argsort(columns['categories'][expense], kind='stable')
+    ids = columns['ids'][expense][order]
+    days = columns['days'][expense][order]
+    categories = columns['categories'][expense][order]
+    amounts = np.log(np.maximum(columns['cents'][expense][order], 1))
+    if len(amounts) <= window:
+        return []
+
+    # expense i + window is scored against expenses i .. i + window - 1,
+    # when all of them are in its category
+    windows = sliding_window_view(amounts, window)[:-1]
+    scored = np.flatnonzero(categories[:-window] == categories[window:])
+    scores = robust_z(amounts[window:][scored], windows[scored])
+    flagged = scored[scores > threshold] + window
+    return list(zip(
+        ids[flagged].tolist(), days[flagged].tolist(), scores[scores > threshold].tolist()
+    ))
+
+
+def daily_anomalies(columns, window, threshold):
+    """
+    (day, score) of the days whose total spending scores above threshold
+    against the previous `window` days, days without expenses counting as 0.
+    """
+    expense = columns['types'] == EXPENSE
+    days, cents = columns['days'][expense], columns['cents'][expense]
+    if not len(days):
+        return []
+    first = days.min()
+    totals = np.bincount(days - first, weights=cents)
+    if len(totals) <= window:
+        return []
+
+    scores = robust_z(totals[window:], sliding_window_view(totals, window)[:-1])
+    flagged = np.flatnonzero(scores > threshold)
+    return list(zip((flagged + window + first).tolist(), scores[flagged].tolist()))
+
+
+def find_anomalies(columns, window=None, daily_window=None, threshold=None):
+    """
+    Returns {(kind, transaction id or None, date): score} for a user's columns
+    (see frames.fetch_columns), with the settings' windows and threshold by
+    default.
+    """
+    window = window or settings.ANOMALY_WINDOW
+    daily_window = daily_window or settings.ANOMALY_DAILY_WINDOW
+    threshold = threshold or settings.ANOMALY_THRESHOLD
+
+    found = {
+        (Anomaly.AMOUNT, pk, to_date(day)): score
+        for pk, day, score in amount_anomalies(columns, window, threshold)
+    }
+    found.update(
+        ((Anomaly.DAILY, None, to_date(day)), score)
+        for day, score in daily_anomalies(columns, daily_window, threshold)
+    )
+    return found
+
+
+def scan_users(user_pks):
+    """
+    Returns (user pk, data version, find_anomalies() result) for each user:
+    the work of one chunk, run in a pool worker. A user's columns come from
+    their snapshot when they have one.
+    """
+    results = []
+    for user_pk in user_pks:
+        # read before the columns, like get_frame(): a write in between
+        # leaves the scan under an older version, to be scanned again
+        version = get_data_version(user_pk)
+        columns = snapshots.load_columns(user_pk)
+        if columns is None:
+            columns = fetch_columns(Transaction.objects.filter(user_id=user_pk))
+        results.append((user_pk, version, find_anomalies(columns)))
+    return results
+
+
+def save_anomalies(user_pk, found):
+    """
+    Replaces a user's flags with `found` (see find_anomalies), keeping the
+    ones that are still raised. Rows whose badge appears or goes away are
+    touched, so they are rendered again. Returns the number of flags added
+    and removed.
+    """
+    with transaction.atomic():
+        existing = {
+            (flag.kind, flag.transaction_id, flag.date): flag.pk
+            for flag in Anomaly.objects.filter(user_id=user_pk)
+        }
+        added = found.keys() - existing.keys()
+        # expenses deleted since the scan read them can't be flagged; locking
+        # the rest keeps them until the flags are in
+        flagged_pks = {pk for kind, pk, _ in added if kind == Anomaly.AMOUNT}
+        if flagged_pks:
+            still_there = set(
+                Transaction.objects.select_for_update()
+                .filter(pk__in=flagged_pks).values_list('pk', flat=True)
+            )
+            added = {
+                (kind, pk, date) for kind, pk, date in added
+                if kind != Anomaly.AMOUNT or pk in still_there
+            }
+        removed = existing.keys() - found.keys()
+        if not added and not removed:
+            return 0
+
+        changed = added | removed
+        transaction_pks = [pk for kind, pk, _ in changed if kind == Anomaly.AMOUNT]
+        days = [date for kind, _, date in changed if kind == Anomaly.DAILY]
+        Anomaly.objects.filter(pk__in=[existing[key] for key in removed]).delete()
+        Anomaly.objects.bulk_create(
+            Anomaly(user_id=user_pk, kind=kind, transaction_id=pk, date=date, score=found[kind, pk, date])
+            for kind, pk, date in added
+        )
+        Transaction.objects.filter(
+            Q(pk__in=transaction_pks) | Q(user_id=user_pk, type='expense', date__in=days)
+        ).update(updated_at=timezone.now())
+        transaction.on_commit(lambda: bump_data_version(anomalies_owner(user_pk)))
+    return len(changed)
+
+
+def scanned_key(user_pk):
+    return f"anomalies-scanned:{user_pk}"
+
+
+def _chunks(items, size):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def _init_worker():
+    # workers that are spawned rather than forked start without Django set up
+    django.setup()
+
+
+def detect(user_pks, workers=None, chunk_size=None, changed_only=False):
+    """
+    Scans the users in chunks of chunk_size (settings.ANOMALY_CHUNK_SIZE) on
+    a pool of `workers` processes (settings.ANOMALY_WORKERS, or one per CPU)
+    and saves their flags. With changed_only, users whose transactions
+    haven't changed since their last scan are skipped. Returns
+    {user pk: flags added and removed} for the users scanned.
+    """
+    if changed_only:
+        last_scanned = cache.get_many([scanned_key(pk) for pk in user_pks])
+        user_pks = [
+            pk for pk in user_pks if last_scanned.get(scanned_key(pk)) != get_data_version(pk)
+        ]
+    workers = workers or settings.ANOMALY_WORKERS or os.cpu_count()
+    chunks = _chunks(list(user_pks), chunk_size or settings.ANOMALY_CHUNK_SIZE)
+
+    if workers == 1 or len(chunks) <= 1:
+        results = map(scan_users, chunks)
+        pool = None
+    else:
+        # forked workers must not share the parent's database connections
+        connections.close_all()
+        pool = ProcessPoolExecutor(min(workers, len(chunks)), initializer=_init_worker)
+        results = pool.map(scan_users, chunks)
+
+    changes = {}
+    try:
+        for chunk in results:
+            for user_pk, version, found in chunk:
+                changes[user_pk] = save_anomalies(user_pk, found)
+                cache.set(scanned_key(user_pk), version, timeout=None)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return changes
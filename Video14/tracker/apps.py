@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class TrackerConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "tracker"
+
+    def ready(self):
+        from django.conf import settings
+        from tracker import signals  # noqa: F401
+        from tracker import singleflight
+
+        if singleflight.fcntl is not None and settings.SINGLEFLIGHT_LOCK_DIR:
+            singleflight.check_lock_dir(settings.SINGLEFLIGHT_LOCK_DIR)
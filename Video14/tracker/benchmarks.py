@@ -0,0 +1,339 @@
+"""
+Benchmarks run with ``python manage.py benchmark <name>``.
+
+They run against the configured database, using the transactions of an
+existing user - ``python manage.py generate_transactions --count 50000``
+creates a suitable data set for the default 'bugbytes' user.
+"""
+import asyncio
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.db import connections
+from django.test import AsyncRequestFactory, RequestFactory
+from django_htmx.middleware import HtmxDetails
+
+BENCHMARKS = {}
+
+
+def benchmark(name, needs_user=True):
+    def register(func):
+        func.needs_user = needs_user
+        BENCHMARKS[name] = func
+        return func
+    return register
+
+
+def _timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def _summary(label, latencies, wall_time):
+    return (
+        f"{label:<28} wall {wall_time * 1000:8.1f}ms   "
+        f"mean {statistics.mean(latencies) * 1000:8.1f}ms   "
+        f"max {max(latencies) * 1000:8.1f}ms"
+    )
+
+
+@benchmark('async-views')
+def async_views(user, concurrency=20, **options):
+    """Sync vs. async list and chart views under concurrent load"""
+    from tracker import views
+
+    def make_request(factory, path):
+        request = factory.get(path, headers={'HX-Request': 'true'})
+        request.user = user
+        request.htmx = HtmxDetails(request)
+        return request
+
+    def run_sync(view, path):
+        def one_request():
+            try:
+                return _timed(view, make_request(RequestFactory(), path))
+            finally:
+                connections.close_all()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            latencies = list(pool.map(lambda _: one_request(), range(concurrency)))
+        return latencies, time.perf_counter() - start
+
+    def run_async(view, path):
+        async def one_request():
+            start = time.perf_counter()
+            await view(make_request(AsyncRequestFactory(), path))
+            return time.perf_counter() - start
+
+        async def run_all():
+            return await asyncio.gather(*(one_request() for _ in range(concurrency)))
+
+        start = time.perf_counter()
+        latencies = asyncio.run(run_all())
+        return latencies, time.perf_counter() - start
+
+    results = []
+    for name, sync_view, async_view, path in (
+        ('transactions_list', views.transactions_list, views.transactions_list_async, '/transactions/'),
+        ('transaction_charts', views.transaction_charts, views.transaction_charts_async, '/transactions/charts'),
+    ):
+        # warm up imports and caches outside the timed runs
+        sync_view(make_request(RequestFactory(), path))
+        results.append(_summary(f'{name} (sync)', *run_sync(sync_view, path)))
+        results.append(_summary(f'{name} (async)', *run_async(async_view, path)))
+    return results
+
+
+@benchmark('cache-backends', needs_user=False)
+def cache_backends(user=None, operations=2000, **options):
+    """LocMemCache vs. FileBasedCache vs. SQLiteCache, in operations per second"""
+    from django.core.cache.backends.filebased import FileBasedCache
+    from django.core.cache.backends.locmem import LocMemCache
+    from tracker.sqlite_cache import SQLiteCache
+
+    row_html = '<tr><td>Jan. 1, 2024</td>' * 10
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        backends = {
+            'LocMemCache': LocMemCache('benchmark', {'OPTIONS': {'MAX_ENTRIES': operations * 2}}),
+            'FileBasedCache': FileBasedCache(f'{directory}/files', {'OPTIONS': {'MAX_ENTRIES': operations * 2}}),
+            'SQLiteCache': SQLiteCache(f'{directory}/cache.sqlite3', {'OPTIONS': {'MAX_ENTRIES': operations * 2}}),
+        }
+        for name, backend in backends.items():
+            keys = [f'row:{i}' for i in range(operations)]
+            pages = [keys[i:i + 20] for i in range(0, operations, 20)]
+            backend.set('version', 1)
+
+            timings = {
+                'set': _timed(lambda: [backend.set(key, row_html) for key in keys]),
+                'get': _timed(lambda: [backend.get(key) for key in keys]),
+                'get_many (20)': _timed(lambda: [backend.get_many(page) for page in pages]),
+                'set_many (20)': _timed(lambda: [backend.set_many(dict.fromkeys(page, row_html)) for page in pages]),
+                'incr': _timed(lambda: [backend.incr('version') for _ in keys]),
+            }
+            results.append(name)
+            for operation, seconds in timings.items():
+                count = len(pages) if 'many' in operation else operations
+                results.append(f"    {operation:<16} {count / seconds:>12,.0f} ops/s")
+    return results
+
+
+@benchmark('page-sizes')
+def page_sizes(user, viewport_rows=20, scroll_rows=500, velocity=40, **options):
+    """Requests to fill a screen and scroll 500 rows, fixed vs. hinted page sizes"""
+    import re
+    from tracker import views
+
+    def fetch(view, path, hints):
+        request = RequestFactory().get(path, headers={'HX-Request': 'true', **hints})
+        request.user = user
+        request.htmx = HtmxDetails(request)
+        content = view(request).content.decode()
+        next_cursor = re.search(r'\?after=([\w.-]+)', content)
+        return content.count('data-pk='), next_cursor and next_cursor.group(1)
+
+    def scroll(hints, scroll_hints):
+        start = time.perf_counter()
+        loaded, next_cursor = fetch(views.transactions_list, '/transactions/', hints)
+        requests = 1
+        # the last row fetches the next page as soon as it's revealed
+        while next_cursor and loaded <= viewport_rows:
+            rows, next_cursor = fetch(views.get_transactions, f'/get-transactions/?after={next_cursor}', hints)
+            loaded, requests = loaded + rows, requests + 1
+        to_fill = requests
+        while next_cursor and loaded <= viewport_rows + scroll_rows:
+            rows, next_cursor = fetch(views.get_transactions, f'/get-transactions/?after={next_cursor}', scroll_hints)
+            loaded, requests = loaded + rows, requests + 1
+        return to_fill, requests, time.perf_counter() - start
+
+    hints = {'X-Viewport-Rows': str(viewport_rows), 'X-Scroll-Velocity': '0'}
+    results = []
+    for label, first_hints, scroll_hints in (
+        ('fixed PAGE_SIZE', {}, {}),
+        ('viewport hint', hints, hints),
+        (f'viewport + {velocity} rows/s', hints, {**hints, 'X-Scroll-Velocity': str(velocity)}),
+    ):
+        to_fill, requests, seconds = scroll(first_hints, scroll_hints)
+        results.append(
+            f"{label:<28} fill screen {to_fill:4} requests   "
+            f"+{scroll_rows} rows {requests:4} requests   {seconds * 1000:8.1f}ms"
+        )
+    return results
+
+
+@benchmark('money-fields')
+def money_fields(user, repeat=5, **options):
+    """Reading and summing amounts as integer cents vs. the old DecimalField"""
+    from django.db.models import DecimalField, ExpressionWrapper, F, FloatField, Sum, Value
+    from django.db.models.functions import Cast
+    from tracker.models import Transaction
+
+    transactions = Transaction.objects.filter(user=user).order_by()
+    # what the DecimalField column did: a float in SQLite, converted to a
+    # quantized Decimal on every read
+    as_decimal = Cast(
+        ExpressionWrapper(F('amount') / Value(100.0), output_field=FloatField()),
+        output_field=DecimalField(max_digits=10, decimal_places=2),
+    )
+    count = transactions.count()
+
+    def best(func):
+        return min(_timed(func) for _ in range(repeat))
+
+    timings = {
+        'read (cents)': best(lambda: list(transactions.values_list('amount', flat=True))),
+        'read (decimal)': best(lambda: list(
+            transactions.annotate(legacy=as_decimal).values_list('legacy', flat=True)
+        )),
+        'sum (cents)': best(lambda: transactions.aggregate(total=Sum('amount'))),
+        'sum (decimal)': best(lambda: transactions.annotate(legacy=as_decimal).aggregate(
+            total=Sum('legacy')
+        )),
+    }
+    return [
+        f"{label:<28} {seconds * 1000:8.1f}ms   {count / seconds:>12,.0f} rows/s"
+        for label, seconds in timings.items()
+    ]
+
+
+@benchmark('pivot', needs_user=False)
+def pivot(user=None, years=10, categories=200, per_cell=4, repeat=3, **options):
+    """Category x month report over 10 years x 200 categories: one GROUP BY vs. a query per month"""
+    import datetime
+    import random
+    from django.db import transaction
+    from django.db.models import Sum
+    from tracker import views
+    from tracker.caching import CATEGORIES, bump_data_version
+    from tracker.fields import from_cents
+    from tracker.managers import signed_amount
+    from tracker.models import Category, Transaction, User
+    from tracker.reports import Pivot
+
+    def best(func):
+        return min(_timed(func) for _ in range(repeat))
+
+    first_month = datetime.date.today().replace(day=1)
+    months = []
+    for _ in range(years * 12):
+        months.append(first_month)
+        first_month = (first_month - datetime.timedelta(days=1)).replace(day=1)
+
+    # a throwaway data set, rolled back at the end
+    with transaction.atomic():
+        owner = User.objects.create(username='pivot-benchmark')
+        created = Category.objects.bulk_create(
+            Category(name=f'pivot-benchmark-{i}') for i in range(categories)
+        )
+        bump_data_version(CATEGORIES)
+        Transaction.objects.bulk_create(
+            (
+                Transaction(
+                    user=owner,
+                    category=category,
+                    type=random.choice(('income', 'expense')),
+                    amount=from_cents(random.randint(100, 100000)),
+                    date=month + datetime.timedelta(days=random.randrange(28)),
+                )
+                for month in months
+                for category in created
+                for _ in range(per_cell)
+            ),
+            batch_size=5000,
+        )
+        transactions = Transaction.objects.filter(user=owner)
+        count = transactions.count()
+
+        def per_month():
+            for month in months:
+                end = (month + datetime.timedelta(days=31)).replace(day=1)
+                list(
+                    transactions.filter(date__gte=month, date__lt=end)
+                    .order_by().values('category').annotate(total=Sum(signed_amount()))
+                )
+
+        def page():
+            request = RequestFactory().get('/transactions/pivot', headers={'HX-Request': 'true'})
+            request.user = owner
+            request.htmx = HtmxDetails(request)
+            return views.pivot_report(request).content
+
+        timings = {
+            'pivot (one GROUP BY)': best(lambda: Pivot.from_queryset(transactions)),
+            'a query per month': best(per_month),
+            'report page (rendered)': best(page),
+        }
+        transaction.set_rollback(True)
+    bump_data_version(CATEGORIES)
+
+    return [f"{count:,} transactions, {categories} categories x {len(months)} months"] + [
+        f"{label:<28} {seconds * 1000:8.1f}ms" for label, seconds in timings.items()
+    ]
+
+
+@benchmark('anomalies', needs_user=False)
+def anomalies(user=None, users=100, per_user=10_000, workers=4, **options):
+    """Anomaly scoring of 1M transactions: NumPy windows, serially and on a process pool, vs. a Python loop"""
+    import math
+    from concurrent.futures import ProcessPoolExecutor
+    import numpy as np
+    from tracker.anomalies import MAD_SCALE, find_anomalies
+    from tracker.frames import TYPE_CODES
+
+    # columns like fetch_columns() returns, a year of transactions per user
+    rng = np.random.default_rng(0)
+    frames = []
+    for offset in range(users):
+        ids = np.arange(per_user, dtype=np.int64) + offset * per_user
+        frames.append({
+            'ids': ids,
+            'days': np.sort(rng.integers(20000, 20365, per_user)).astype(np.int32),
+            'cents': rng.lognormal(8, 1, per_user).astype(np.int64),
+            'types': rng.choice(list(TYPE_CODES.values()), per_user).astype(np.int8),
+            'categories': rng.integers(1, 20, per_user).astype(np.int32),
+        })
+    window = 30
+
+    def python_loop(columns):
+        # what it takes one expense at a time
+        history, flagged = {}, []
+        for pk, cents, type, category in zip(
+            columns['ids'].tolist(), columns['cents'].tolist(),
+            columns['types'].tolist(), columns['categories'].tolist(),
+        ):
+            if type != TYPE_CODES['expense']:
+                continue
+            previous = history.setdefault(category, [])
+            value = math.log(max(cents, 1))
+            if len(previous) >= window:
+                recent = previous[-window:]
+                median = statistics.median(recent)
+                mad = statistics.median(abs(x - median) for x in recent) * MAD_SCALE
+                flagged.append(bool(mad) and (value - median) / mad > 3.5)
+            previous.append(value)
+
+    serial = _timed(lambda: [find_anomalies(columns, window=window) for columns in frames])
+    chunks = [frames[i::workers] for i in range(workers)]
+    with ProcessPoolExecutor(workers) as pool:
+        # started before the clock, as the detect_anomalies pool is reused for every chunk
+        list(pool.map(_find_anomalies_in_chunk, [[]] * workers))
+        pooled = _timed(lambda: list(pool.map(_find_anomalies_in_chunk, chunks)))
+    loop = _timed(python_loop, frames[0]) * users
+
+    return [f"{users * per_user:,} transactions, {users} users"] + [
+        f"{label:<28} {seconds * 1000:8.1f}ms"
+        for label, seconds in {
+            'NumPy, serial': serial,
+            f'NumPy, {workers} processes': pooled,
+            'Python loop (extrapolated)': loop,
+        }.items()
+    ]
+
+
+def _find_anomalies_in_chunk(chunk):
+    # a pool worker's share of the anomalies benchmark
+    from tracker.anomalies import find_anomalies
+    return [len(find_anomalies(columns, window=30)) for columns in chunk]
@@ -0,0 +1,137 @@
+"""
+Time buckets for the charts. A series over a few weeks is drawn by day, and
+longer ones by week, month or quarter: choose_granularity() picks the finest
+granularity that fits a date range into a point budget, so a chart over
+several years ships a few hundred points rather than thousands.
+
+Series are bucketed where they are summed - in SQL with DateBucket(), or
+over a TransactionFrame's days with truncate_days() - and line charts can
+be bucketed a little finer than the budget, then downsampled with lttb(),
+which keeps the peaks and troughs that plain averaging flattens.
+"""
+import datetime
+import numpy as np
+from django.conf import settings
+from django.db.models import Max, Min
+from django.db.models.functions import Trunc
+
+GRANULARITIES = ('day', 'week', 'month', 'quarter')
+
+# SQLite date() modifiers for each granularity; {0} is the date column
+SQLITE_TRUNCATE = {
+    'day': "date({0})",
+    'week': "date({0}, '-' || ((CAST(strftime('%%w', {0}) AS INTEGER) + 6) %% 7) || ' days')",
+    'month': "date({0}, 'start of month')",
+    'quarter': (
+        "date({0}, 'start of month', "
+        "'-' || ((CAST(strftime('%%m', {0}) AS INTEGER) - 1) %% 3) || ' months')"
+    ),
+}
+
+
+class DateBucket(Trunc):
+    """
+    Trunc() of a DateField to a day, week (starting on Monday), month or
+    quarter. On SQLite it uses the built-in date functions rather than
+    Django's django_date_trunc(), a Python function called for every row.
+    """
+
+    def __init__(self, expression, kind, **extra):
+        if kind not in GRANULARITIES:
+            raise ValueError(f"unknown granularity {kind!r}")
+        super().__init__(expression, kind, **extra)
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        sql, params = compiler.compile(self.lhs)
+        template = SQLITE_TRUNCATE[self.kind]
+        return template.format(sql), tuple(params) * template.count('{0}')
+
+
+def bucket_count(start, end, kind):
+    """The number of `kind` buckets that start..end (inclusive) touches."""
+    if kind == 'day':
+        return (end - start).days + 1
+    if kind == 'week':
+        return (end - start + datetime.timedelta(days=start.weekday())).days // 7 + 1
+    months = (end.year - start.year) * 12 + end.month - start.month
+    if kind == 'month':
+        return months + 1
+    return ((end.month - 1) // 3 - (start.month - 1) // 3 + (end.year - start.year) * 4) + 1
+
+
+def choose_granularity(start, end, max_points=None):
+    """
+    Returns the finest granularity that covers start..end in at most
+    max_points buckets (settings.CHART_MAX_POINTS by default), or the
+    coarsest one if none does.
+    """
+    if max_points is None:
+        max_points = settings.CHART_MAX_POINTS
+    if start is None or end is None:
+        return GRANULARITIES[0]
+    for kind in GRANULARITIES:
+        if bucket_count(start, end, kind) <= max_points:
+            return kind
+    return GRANULARITIES[-1]
+
+
+def granularity_for(queryset, max_points=None, field='date'):
+    """choose_granularity() for the date range of a queryset - one Min/Max query."""
+    bounds = queryset.aggregate(start=Min(field), end=Max(field))
+    return choose_granularity(bounds['start'], bounds['end'], max_points)
+
+
+def truncate_days(days, kind):
+    """
+    DateBucket() for an array of days since 1970-01-01 (a TransactionFrame's
+    days): each day's bucket, as the number of its first day.
+    """
+    if kind == 'day':
+        return days
+    if kind == 'week':
+        # 1970-01-01 was a Thursday, three days after a Monday
+        return days - (days + 3) % 7
+    months = days.astype('datetime64[D]').astype('datetime64[M]')
+    if kind == 'quarter':
+        months = months - months.astype(np.int64) % 3
+    return months.astype('datetime64[D]').astype(days.dtype)
+
+
+def lttb(x, y, max_points):
+    """
+    Largest-Triangle-Three-Buckets downsampling: returns the indices of at
+    most max_points points of the line (x, y) that keep its visual shape.
+    The first and last points are always kept, unless max_points is 1.
+    """
+    if max_points < 1:
+        raise ValueError(f"max_points must be at least 1, not {max_points}")
+    n = len(x)
+    if max_points >= n:
+        return np.arange(n)
+    if max_points < 3:
+        # no room for a bucket between the ends
+        return np.array([0, n - 1][:max_points])
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+
+    # max_points - 2 buckets between the two fixed end points
+    edges = np.floor(np.arange(max_points - 1) * ((n - 2) / (max_points - 2))).astype(int) + 1
+    edges[-1] = n - 1
+    selected = np.empty(max_points, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+
+    previous = 0
+    for i in range(max_points - 2):
+        start, end = edges[i], edges[i + 1]
+        # the next bucket's average, or the last point after the final bucket
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        next_x, next_y = x[end:next_end].mean(), y[end:next_end].mean()
+        # twice the area of the triangle each candidate makes with its neighbours
+        areas = np.abs(
+            (x[previous] - next_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (next_y - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        selected[i + 1] = previous
+    return selected
+
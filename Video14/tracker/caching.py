@@ -0,0 +1,255 @@
+import hashlib
+import time
+from functools import wraps
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.http import QueryDict
+from django.middleware.csrf import get_token
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.safestring import mark_safe
+from django.views.decorators.http import condition
+from tracker.models import Anomaly
+from tracker.paging import page_size
+
+# bump this whenever the row or list templates change, so old fragments and
+# ETags are never served
+TEMPLATE_VERSION = 11
+
+# data version shared by every user, bumped when a category changes
+CATEGORIES = 'categories'
+
+
+def anomalies_owner(user_pk):
+    # data version of a user's anomaly flags, which change without a write
+    return f"anomalies:{user_pk}"
+
+
+def row_cache_key(transaction):
+    # updated_at changes on every save, so an edited row always gets a fresh key
+    return (
+        f"transaction-row:{TEMPLATE_VERSION}:"
+        f"{transaction.pk}:{transaction.updated_at.timestamp()}"
+    )
+
+
+def render_transaction_rows(transactions):
+    """
+    Returns a list of (transaction, row_html) pairs for a page of transactions.
+    Rows are fetched from the cache in one get_many call, and only the misses
+    are rendered (and written back with a single set_many).
+    """
+    transactions = list(transactions)
+    keys = [row_cache_key(transaction) for transaction in transactions]
+    cached_rows = cache.get_many(keys)
+
+    misses = [
+        (transaction, key) for transaction, key in zip(transactions, keys)
+        if key not in cached_rows
+    ]
+    anomalies = row_anomalies([transaction for transaction, _ in misses])
+    missing = {}
+    for transaction, key in misses:
+        missing[key] = cached_rows[key] = str(render_to_string(
+            'tracker/partials/transaction-row.html',
+            {'transaction': transaction, 'anomaly': anomalies.get(transaction.pk)}
+        ))
+    rows = [
+        (transaction, mark_safe(cached_rows[key]))
+        for transaction, key in zip(transactions, keys)
+    ]
+
+    if missing:
+        cache.set_many(missing, settings.ROW_CACHE_TIMEOUT)
+    return rows
+
+
+def row_anomalies(transactions):
+    """
+    Returns the Anomaly to show on each expense's row, by pk, from one query:
+    its own unusual-amount flag, or else its day's unusual-day flag.
+    """
+    expenses = [transaction for transaction in transactions if transaction.type == 'expense']
+    if not expenses:
+        return {}
+    flags = Anomaly.objects.filter(
+        Q(transaction__in=[transaction.pk for transaction in expenses])
+        | Q(
+            kind=Anomaly.DAILY,
+            user__in={transaction.user_id for transaction in expenses},
+            date__in={transaction.date for transaction in expenses},
+        )
+    )
+    by_transaction, by_day = {}, {}
+    for flag in flags:
+        if flag.transaction_id is None:
+            by_day[flag.user_id, flag.date] = flag
+        else:
+            by_transaction[flag.transaction_id] = flag
+    return {
+        transaction.pk: by_transaction.get(transaction.pk)
+        or by_day.get((transaction.user_id, transaction.date))
+        for transaction in expenses
+    }
+
+
+def delete_transaction_row(transaction):
+    cache.delete(row_cache_key(transaction))
+
+
+def data_version_key(owner):
+    return f"data-version:{owner}"
+
+
+def get_data_version(owner):
+    """
+    Returns the current data version for a user id (or CATEGORIES).
+    A missing counter is seeded from the clock rather than 0, so a counter
+    lost to eviction never repeats a version an old ETag was built from.
+    """
+    key = data_version_key(owner)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_data_version(owner):
+    key = data_version_key(owner)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), timeout=None)
+        return cache.get(key)
+
+
+def normalized_params(querydict):
+    # order-insensitive, and an empty field is the same as a missing one
+    return sorted(
+        (key, sorted(value for value in querydict.getlist(key) if value))
+        for key in querydict
+        if any(querydict.getlist(key))
+    )
+
+
+def totals_cache_key(owner, transaction_filter):
+    data = transaction_filter.data or QueryDict()
+    params = [
+        (key, values) for key, values in normalized_params(data)
+        if key in transaction_filter.filters
+    ]
+    return f"totals:{owner}:{hashlib.md5(repr(params).encode()).hexdigest()}"
+
+
+def get_totals(owner, transaction_filter):
+    """
+    Returns (income, expenses) for a filtered queryset. The result is cached
+    along with the data version it was aggregated at, so that a write can
+    adjust it (see apply_totals_delta) instead of aggregating again.
+    """
+    key = totals_cache_key(owner, transaction_filter)
+    version = get_data_version(owner)
+    cached = cache.get(key)
+    if cached is not None and cached[0] == version:
+        return cached[1], cached[2]
+
+    income, expenses = transaction_filter.qs.get_totals()
+    # a write that landed during the aggregate may or may not be in it
+    if get_data_version(owner) == version:
+        cache.set(key, (version, income, expenses), settings.TOTALS_CACHE_TIMEOUT)
+    return income, expenses
+
+
+def cached_totals(owner, transaction_filter):
+    """
+    The cached (version, income, expenses) for the filter at the current
+    data version, or None. Read before a write, it is what apply_totals_delta
+    adjusts: totals already in the cache before the write can't include it,
+    while totals cached after it was committed - but before its version bump
+    - might.
+    """
+    cached = cache.get(totals_cache_key(owner, transaction_filter))
+    if cached is None or cached[0] != get_data_version(owner):
+        return None
+    return cached
+
+
+def apply_totals_delta(owner, transaction_filter, before, removed=None, added=None):
+    """
+    Adjusts the totals for a single write. `before` is what cached_totals()
+    returned before the write, and `removed`/`added` are the (type, amount)
+    pairs the filter selected before and after it (None when it didn't select
+    the transaction). Returns the new (income, expenses), or None when there
+    were no cached totals or another write has landed in between.
+    """
+    if before is None:
+        return None
+    version, income, expenses = before
+    new_version = get_data_version(owner)
+    if new_version != version + 1:
+        return None
+
+    totals = {'income': income, 'expense': expenses}
+    if removed is not None:
+        totals[removed[0]] -= removed[1]
+    if added is not None:
+        totals[added[0]] += added[1]
+
+    income, expenses = totals['income'], totals['expense']
+    key = totals_cache_key(owner, transaction_filter)
+    cache.set(key, (new_version, income, expenses), settings.TOTALS_CACHE_TIMEOUT)
+    return income, expenses
+
+
+def conditional(etag_func):
+    """
+    condition(etag_func=...) for the views' successful responses only: a
+    cancelled request's 204 or a timeout's 503 is sent without the ETag, so
+    it never validates as the page that ETag stands for.
+    """
+    def decorator(view_func):
+        view = condition(etag_func=etag_func)(view_func)
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            response = view(request, *args, **kwargs)
+            if response.status_code not in (200, 304):
+                response.headers.pop('ETag', None)
+                response.headers.pop('Last-Modified', None)
+            return response
+        return wrapper
+    return decorator
+
+
+def transactions_etag(request, *args, **kwargs):
+    """
+    ETag for the list, scroll and chart views. It is built from data versions
+    held in the cache, so validating it never touches the Transaction table.
+    """
+    if not request.user.is_authenticated:
+        return None
+
+    parts = [
+        request.path,
+        request.user.pk,
+        get_data_version(request.user.pk),
+        get_data_version(CATEGORIES),
+        get_data_version(anomalies_owner(request.user.pk)),
+        normalized_params(request.GET),
+        TEMPLATE_VERSION,
+        bool(request.htmx),
+        request.htmx.trigger,
+        request.htmx.history_restore_request,
+        # how many rows the client hints ask for
+        page_size(request),
+        page_size(request, first=True),
+        # default ranges, like the comparison's "this month", move with the date
+        timezone.localdate(),
+    ]
+    if not request.htmx or request.htmx.history_restore_request:
+        # full pages embed the CSRF token, which changes when the secret rotates
+        get_token(request)
+        parts.append(request.META['CSRF_COOKIE'])
+    return hashlib.md5(repr(parts).encode()).hexdigest()
@@ -0,0 +1,115 @@
+"""
+Categories are read on nearly every page (filter checkboxes, the transaction
+form's radio buttons, validating both, CSV imports), but rarely change.
+
+Each process keeps them in memory, tagged with the shared CATEGORIES data
+version. Saving or deleting a category bumps that version, so every worker
+reloads on its next access - checking costs a cache read, not a query.
+"""
+import threading
+from django import forms
+from django.core.exceptions import ValidationError
+from django.forms.models import ModelChoiceIterator
+from django_filters.fields import ModelMultipleChoiceField as FilterMultipleChoiceField
+from tracker.caching import CATEGORIES, get_data_version
+from tracker.models import Category
+
+_lock = threading.Lock()
+# replaced whole, never updated in place: a thread reading it without the
+# lock sees either the old maps or the new ones, never a mix
+_loaded = {'version': None, 'categories': (), 'by_pk': {}, 'by_name': {}}
+
+
+def _load():
+    global _loaded
+    # read the version first: if a category changes while we load, the
+    # version we store is already out of date and the next access reloads
+    version = get_data_version(CATEGORIES)
+    loaded = _loaded
+    if loaded['version'] == version:
+        return loaded
+
+    with _lock:
+        if _loaded['version'] != version:
+            categories = tuple(Category.objects.order_by('pk'))
+            _loaded = {
+                'version': version,
+                'categories': categories,
+                'by_pk': {category.pk: category for category in categories},
+                'by_name': {category.name: category for category in categories},
+            }
+        return _loaded
+
+
+def get_categories():
+    return _load()['categories']
+
+
+def categories_by_pk():
+    return _load()['by_pk']
+
+
+def categories_by_name():
+    return _load()['by_name']
+
+
+class CategoryChoiceIterator(ModelChoiceIterator):
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ("", self.field.empty_label)
+        for category in get_categories():
+            yield self.choice(category)
+
+    def __len__(self):
+        return len(get_categories()) + (1 if self.field.empty_label is not None else 0)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(get_categories())
+
+
+def _lookup(value):
+    if isinstance(value, Category):
+        value = value.pk
+    try:
+        return categories_by_pk()[int(value)]
+    except (KeyError, ValueError, TypeError):
+        return None
+
+
+class CategoryChoiceField(forms.ModelChoiceField):
+    """ModelChoiceField over all categories, served from the in-memory cache"""
+    iterator = CategoryChoiceIterator
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('queryset', Category.objects.all())
+        super().__init__(**kwargs)
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        category = _lookup(value)
+        if category is None:
+            raise ValidationError(
+                self.error_messages['invalid_choice'],
+                code='invalid_choice',
+                params={'value': value},
+            )
+        return category
+
+
+class CategoryMultipleChoiceField(FilterMultipleChoiceField):
+    """The filter's ModelMultipleChoiceField, served from the in-memory cache"""
+    iterator = CategoryChoiceIterator
+
+    def _check_values(self, value):
+        categories = []
+        for pk in set(value):
+            category = _lookup(pk)
+            if category is None:
+                raise ValidationError(
+                    self.error_messages['invalid_choice'],
+                    code='invalid_choice',
+                    params={'value': pk},
+                )
+            categories.append(category)
+        return categories
@@ -1,32 +1,44 @@
-import plotly.express as px
-from django.db.models import Sum
-from tracker.models import Category
+import plotly.graph_objects as go
+from django.conf import settings
+from tracker.bucketing import granularity_for, lttb
+from tracker.categories import categories_by_pk
 
 
-def plot_income_expenses_bar_chart(qs):
+def to_div(fig):
+    # plotly.js itself is loaded once, by the base template
+    return fig.to_html(full_html=False, include_plotlyjs=False)
+
+def plot_income_expenses_bar_chart(frame):
     x_vals = ['Income', 'Expenditure']
 
     # sum up the total income and expenditure
-    total_income = qs.filter(type='income').aggregate(
-        total=Sum('amount')
-    )['total']
-    total_expenses = qs.filter(type='expense').aggregate(
-        total=Sum('amount')
-    )['total']
+    total_income, total_expenses = frame.totals()
 
-    fig = px.bar(x=x_vals, y=[total_income, total_expenses])
+    fig = go.Figure(go.Bar(x=x_vals, y=[float(total_income), float(total_expenses)]))
 
     return fig
 
-def plot_category_pie_chart(qs):
-    count_per_category = (
-        qs.order_by('category').values('category')
-        .annotate(total=Sum('amount'))
-    )
-    category_pks = count_per_category.values_list('category', flat=True).order_by('category')
-    categories = Category.objects.filter(pk__in=category_pks).order_by('pk').values_list('name', flat=True)
-    total_amounts = count_per_category.order_by('category').values_list('total', flat=True)
+def plot_category_pie_chart(frame):
+    category_pks, income, expenses = frame.by_category()
+    categories = [categories_by_pk()[pk].name for pk in category_pks.tolist()]
+    total_amounts = (income + expenses) / 100
 
-    fig = px.pie(values=total_amounts, names=categories)
+    fig = go.Figure(go.Pie(values=total_amounts, labels=categories))
     fig.update_layout(title_text="Total Amount per Category")
+    return fig
+
+def plot_running_balance_chart(qs):
+    # bucketed finer than the chart's budget, then downsampled so the dips stay visible
+    kind = granularity_for(qs, settings.CHART_MAX_POINTS * settings.CHART_OVERSAMPLE)
+    rows = list(qs.running_balance(kind))
+    buckets = [row['bucket'] for row in rows]
+    balances = [float(row['balance']) for row in rows]
+    keep = lttb([bucket.toordinal() for bucket in buckets], balances, settings.CHART_MAX_POINTS)
+
+    fig = go.Figure(go.Scatter(
+        x=[buckets[i] for i in keep],
+        y=[balances[i] for i in keep],
+        mode='lines',
+    ))
+    fig.update_layout(title_text=f"Running Balance (by {kind})")
     return fig
\ No newline at end of file
@@ -0,0 +1,97 @@
+import asyncio
+from functools import wraps
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.views import redirect_to_login
+from django.db import close_old_connections
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
+from django.utils.http import quote_etag
+from tracker.caching import transactions_etag
+from tracker.timeouts import current_budget
+
+
+def _in_own_connection(func):
+    # runs in a worker thread: the request's query budget (if any) is carried
+    # over in its context, but must be applied to this thread's connection
+    budget = current_budget()
+
+    def run():
+        # worker threads are reused across requests, and so is each one's
+        # connection - like a request thread, it is dropped when it is broken
+        # or older than CONN_MAX_AGE
+        close_old_connections()
+        try:
+            if budget is None:
+                return func()
+            budget.install()
+            try:
+                return func()
+            finally:
+                budget.uninstall()
+        finally:
+            close_old_connections()
+    return run
+
+
+async def gather_queries(*funcs):
+    """
+    Runs independent, synchronous ORM callables concurrently and returns their
+    results in order. Each callable runs in its own worker thread, and therefore
+    on its own database connection, so the wall-clock time tracks the slowest
+    query rather than the sum of them.
+
+    This assumes SQLite, where readers don't block each other and a
+    connection is a file handle. On a database server every worker thread
+    holds a connection of its own, which the server's connection limit (or a
+    pooler) has to allow for.
+    """
+    if not settings.CONCURRENT_QUERIES:
+        return [await sync_to_async(func)() for func in funcs]
+
+    return await asyncio.gather(*(
+        sync_to_async(_in_own_connection(func), thread_sensitive=False)()
+        for func in funcs
+    ))
+
+
+def _authenticate_and_etag(request, *args, **kwargs):
+    if not request.user.is_authenticated:
+        return False, None
+    return True, transactions_etag(request, *args, **kwargs)
+
+
+def async_transactions_view(view_func):
+    """
+    Async equivalent of stacking login_required, cache_control, vary_on_headers
+    and condition(etag_func=transactions_etag) - on Django 4.2 those decorators
+    only wrap sync views.
+    """
+    @wraps(view_func)
+    async def wrapper(request, *args, **kwargs):
+        # the lazy request.user hits the database, so resolve it off the event loop
+        is_authenticated, etag = await sync_to_async(_authenticate_and_etag)(
+            request, *args, **kwargs
+        )
+        if not is_authenticated:
+            return redirect_to_login(request.get_full_path())
+
+        etag = quote_etag(etag)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = await view_func(request, *args, **kwargs)
+
+        # like caching.conditional(), only successful responses get the ETag
+        if request.method in ('GET', 'HEAD') and response.status_code in (200, 304):
+            response.headers.setdefault('ETag', etag)
+        patch_vary_headers(response, (
+            'HX-Request', 'HX-Trigger', 'HX-History-Restore-Request',
+            'X-Viewport-Rows', 'X-Scroll-Velocity',
+        ))
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    return wrapper
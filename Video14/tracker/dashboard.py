@@ -0,0 +1,111 @@
+"""
+Panels of the dashboard on the index page. The page itself is only a shell:
+each panel is loaded by its own request (hx-trigger="load"), so the panels
+render in parallel and a slow one never holds up the others. Rendered panels
+are cached per user under the user's data version, each with its own timeout.
+"""
+import datetime
+import numpy as np
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils import timezone
+from tracker.caching import CATEGORIES, TEMPLATE_VERSION, get_data_version
+from tracker.categories import categories_by_pk
+from tracker.fields import from_cents
+from tracker.frames import get_frame
+from tracker.models import Transaction
+from tracker.paging import ORDERING
+from tracker.singleflight import coalesce
+
+PANELS = {}
+
+SPARKLINE_DAYS = 30
+SPARKLINE_WIDTH, SPARKLINE_HEIGHT = 300, 60
+
+
+def panel(name, timeout):
+    def register(func):
+        func.timeout = timeout
+        func.template = f'tracker/partials/panels/{name}.html'
+        PANELS[name] = func
+        return func
+    return register
+
+
+def panel_cache_key(name, user_pk):
+    # the date is part of the key - panels cover "this month" and "the last 30 days"
+    return (
+        f"panel:{name}:{TEMPLATE_VERSION}:{user_pk}:{get_data_version(user_pk)}:"
+        f"{get_data_version(CATEGORIES)}:{timezone.localdate().isoformat()}"
+    )
+
+
+def render_panel(name, user):
+    """
+    Returns the panel's HTML. A cached copy is used until the user's data
+    changes or the panel's timeout passes, and concurrent renders of the same
+    panel (several tabs) share one computation.
+    """
+    func = PANELS[name]
+    key = panel_cache_key(name, user.pk)
+    html = cache.get(key)
+    if html is None:
+        html = coalesce(key, lambda: render_to_string(func.template, func(user)))
+        cache.set(key, html, func.timeout)
+    return html
+
+
+@panel('month-to-date', timeout=60 * 60)
+def month_to_date(user):
+    today = timezone.localdate()
+    income, expenses = get_frame(user.pk).filter(start=today.replace(day=1), end=today).totals()
+    return {
+        'month': today,
+        'total_income': income,
+        'total_expenses': expenses,
+        'net_income': income - expenses,
+    }
+
+
+@panel('top-categories', timeout=60 * 60)
+def top_categories(user, count=5):
+    today = timezone.localdate()
+    frame = get_frame(user.pk).filter(type='expense', start=today.replace(day=1), end=today)
+    category_pks, _, expenses = frame.by_category()
+    top = np.argsort(-expenses, kind='stable')[:count]
+    categories = categories_by_pk()
+    return {
+        'month': today,
+        'categories': [
+            (categories.get(int(category_pks[i])), from_cents(expenses[i])) for i in top
+        ],
+    }
+
+
+@panel('recent-transactions', timeout=60 * 10)
+def recent_transactions(user, count=5):
+    transactions = (
+        Transaction.objects.filter(user=user).select_related('category').order_by(*ORDERING)
+    )
+    return {'transactions': transactions[:count]}
+
+
+@panel('trend', timeout=60 * 60)
+def trend(user):
+    today = timezone.localdate()
+    start = today - datetime.timedelta(days=SPARKLINE_DAYS - 1)
+    values = get_frame(user.pk).daily(start, today).tolist()
+
+    low, high = min(values), max(values)
+    step = SPARKLINE_WIDTH / (SPARKLINE_DAYS - 1)
+    points = []
+    for day, value in enumerate(values):
+        scaled = (value - low) / (high - low) if high != low else 0.5
+        points.append(f"{day * step:.1f},{SPARKLINE_HEIGHT - scaled * SPARKLINE_HEIGHT:.1f}")
+    return {
+        'start': start,
+        'net_income': from_cents(sum(values)),
+        'points': ' '.join(points),
+        'width': SPARKLINE_WIDTH,
+        'height': SPARKLINE_HEIGHT,
+    }
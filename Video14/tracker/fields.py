@@ -0,0 +1,82 @@
+from decimal import Decimal, InvalidOperation
+from django import forms
+from django.core.exceptions import ValidationError
+from django.db import models
+from django.db.models import lookups
+from django.utils.translation import gettext_lazy as _
+
+CENT = Decimal('0.01')
+
+
+def from_cents(cents):
+    # numpy integers, and aggregates such as a median that can land between
+    # two cents, are rounded to a whole cent first
+    if not isinstance(cents, int):
+        cents = round(cents)
+    return Decimal(cents).scaleb(-2)
+
+
+class MoneyField(models.BigIntegerField):
+    """
+    An amount of money stored as a whole number of cents, and exposed as a
+    Decimal with two places. Sums, comparisons and range filters run on
+    integers in the database, and a Sum() over the field comes back as a
+    Decimal too, since aggregates take on the field of their source.
+    """
+    description = _("Money amount (stored in cents)")
+    default_error_messages = {
+        'invalid': _('“%(value)s” value must be a decimal number.'),
+    }
+
+    def __init__(self, *args, max_digits=10, **kwargs):
+        # only limits what forms accept - the column holds 18 digits
+        self.max_digits = max_digits
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if self.max_digits != 10:
+            kwargs['max_digits'] = self.max_digits
+        return name, path, args, kwargs
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return value
+        return from_cents(value)
+
+    def to_python(self, value):
+        if value is None or isinstance(value, Decimal) and value.as_tuple().exponent == -2:
+            return value
+        try:
+            # floats via str(), so 0.1 is 0.10 rather than 0.1000000000000000055...
+            return Decimal(str(value) if isinstance(value, float) else value).quantize(CENT)
+        except (InvalidOperation, TypeError, ValueError):
+            raise ValidationError(
+                self.error_messages['invalid'], code='invalid', params={'value': value}
+            )
+
+    def get_prep_value(self, value):
+        value = models.Field.get_prep_value(self, value)
+        if value is None:
+            return None
+        return int(self.to_python(value).scaleb(2))
+
+    def formfield(self, **kwargs):
+        return models.Field.formfield(self, **{
+            'form_class': forms.DecimalField,
+            'max_digits': self.max_digits,
+            'decimal_places': 2,
+            **kwargs,
+        })
+
+
+# IntegerField's own lt/gte lookups round a float right-hand side up to a whole
+# number, which for cents would turn amount__lt=0.3 into amount__lt=1.00
+for lookup in (
+    lookups.Exact,
+    lookups.GreaterThan,
+    lookups.GreaterThanOrEqual,
+    lookups.LessThan,
+    lookups.LessThanOrEqual,
+):
+    MoneyField.register_lookup(lookup)
@@ -1,8 +1,13 @@
 import django_filters
 from django import forms
+from tracker.categories import CategoryMultipleChoiceField
 from tracker.models import Transaction, Category
 
 
+class CategoryFilter(django_filters.ModelMultipleChoiceFilter):
+    field_class = CategoryMultipleChoiceField
+
+
 class TransactionFilter(django_filters.FilterSet):
     transaction_type = django_filters.ChoiceFilter(
         choices=Transaction.TRANSACTION_TYPE_CHOICES,
@@ -25,7 +30,7 @@ class TransactionFilter(django_filters.FilterSet):
         widget=forms.DateInput(attrs={"type": "date"}),
     )
 
-    category = django_filters.ModelMultipleChoiceFilter(
+    category = CategoryFilter(
         queryset=Category.objects.all(),
         widget=forms.CheckboxSelectMultiple()
     )
@@ -33,3 +38,17 @@ class TransactionFilter(django_filters.FilterSet):
     class Meta:
         model = Transaction
         fields = ("transaction_type", "start_date", "end_date", "category")
+
+    def filter_frame(self, frame):
+        """Applies the same filters as .qs to a TransactionFrame."""
+        if not self.is_bound:
+            return frame
+        # like .qs, filter on the fields that are valid and ignore the rest
+        self.form.is_valid()
+        data = self.form.cleaned_data
+        return frame.filter(
+            type=data.get("transaction_type") or None,
+            start=data.get("start_date"),
+            end=data.get("end_date"),
+            categories=[category.pk for category in data.get("category") or ()],
+        )
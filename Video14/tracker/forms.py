@@ -1,12 +1,11 @@
 from django import forms
-from tracker.models import Transaction, Category
+from tracker.categories import CategoryChoiceField
+from tracker.models import Transaction
+from tracker.reports import PERIODS, preceding_period, preset_periods
 
 
 class TransactionForm(forms.ModelForm):
-    category = forms.ModelChoiceField(
-        queryset=Category.objects.all(),
-        widget=forms.RadioSelect()
-    )
+    category = CategoryChoiceField(widget=forms.RadioSelect())
 
     def clean_amount(self):
         amount = self.cleaned_data['amount']
@@ -14,6 +13,13 @@ class TransactionForm(forms.ModelForm):
             raise forms.ValidationError("Amount must be a positive number")
         return amount
 
+    def _get_validation_exclusions(self):
+        # the category field has already been checked against the cached
+        # categories, so skip the model's own ForeignKey existence query
+        exclude = super()._get_validation_exclusions()
+        exclude.add('category')
+        return exclude
+
     class Meta:
         model = Transaction
         fields = (
@@ -24,4 +30,58 @@ class TransactionForm(forms.ModelForm):
         )
         widgets = {
             'date': forms.DateInput(attrs={'type': 'date'})
-        }
\ No newline at end of file
+        }
+
+
+class PeriodComparisonForm(forms.Form):
+    period = forms.ChoiceField(
+        choices=[*PERIODS.items(), ('custom', 'Custom periods')],
+        required=False,
+        label='Compare',
+    )
+    current_start = forms.DateField(
+        required=False, label='From', widget=forms.DateInput(attrs={'type': 'date'})
+    )
+    current_end = forms.DateField(
+        required=False, label='To', widget=forms.DateInput(attrs={'type': 'date'})
+    )
+    previous_start = forms.DateField(
+        required=False, label='Against, from', widget=forms.DateInput(attrs={'type': 'date'})
+    )
+    previous_end = forms.DateField(
+        required=False, label='To', widget=forms.DateInput(attrs={'type': 'date'})
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if cleaned_data.get('period') != 'custom':
+            return cleaned_data
+
+        current = cleaned_data.get('current_start'), cleaned_data.get('current_end')
+        previous = cleaned_data.get('previous_start'), cleaned_data.get('previous_end')
+        if None in current:
+            raise forms.ValidationError("Choose the start and end of the period to compare")
+        if previous.count(None) == 1:
+            raise forms.ValidationError("Choose both ends of the period to compare against, or neither")
+        for start, end in (current, previous):
+            if start is not None and start > end:
+                raise forms.ValidationError("A period can't end before it starts")
+        return cleaned_data
+
+    def periods(self):
+        """
+        The (current, previous) pair of (start, end) dates to compare. Custom
+        periods without a previous one are compared with the period of the
+        same length just before. An empty or invalid form compares this month
+        with last month.
+        """
+        if not self.is_bound or not self.is_valid():
+            return preset_periods('month')
+        data = self.cleaned_data
+        if data['period'] != 'custom':
+            return preset_periods(data['period'] or 'month')
+
+        current = data['current_start'], data['current_end']
+        if data['previous_start'] is None:
+            return current, preceding_period(current)
+        return current, (data['previous_start'], data['previous_end'])
@@ -0,0 +1,206 @@
+"""
+Columnar copies of a user's transactions for charts and reports. A
+TransactionFrame is built by one values_list() query into NumPy arrays - the
+date as days since 1970-01-01, the amount in cents, the type as a small
+integer code and the category pk - and every grouping, rolling window and
+running total after that is vectorized, with no further queries and no
+DataFrames.
+
+Frames are cached per user under the user's data version, so the charts,
+the dashboard panels and any filter of them share one fetch until the user's
+transactions change.
+"""
+import datetime
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import BigIntegerField, CharField
+from django.db.models.functions import Cast
+from tracker import snapshots
+from tracker.bucketing import truncate_days
+from tracker.caching import get_data_version
+from tracker.fields import from_cents
+from tracker.models import Transaction
+from tracker.singleflight import coalesce
+
+EPOCH = datetime.date(1970, 1, 1)
+
+TYPES = tuple(value for value, _ in Transaction.TRANSACTION_TYPE_CHOICES)
+TYPE_CODES = {value: code for code, value in enumerate(TYPES)}
+INCOME, EXPENSE = TYPE_CODES['income'], TYPE_CODES['expense']
+
+
+def to_day(date):
+    return (date - EPOCH).days
+
+
+def to_date(day):
+    return EPOCH + datetime.timedelta(days=int(day))
+
+
+def fetch_columns(queryset):
+    """
+    Returns the ids, days, cents, types and categories of the transactions
+    as arrays in (date, id) order, from one query.
+    """
+    # ISO date strings and the cents straight from the columns: NumPy parses
+    # the strings far faster than it converts a date object per row, and
+    # neither needs a Decimal per row
+    rows = list(
+        queryset.order_by('date', 'id').values_list(
+            'id',
+            Cast('date', CharField()),
+            Cast('amount', BigIntegerField()),
+            'type',
+            'category_id',
+        )
+    )
+    ids, dates, cents, types, categories = zip(*rows) if rows else ((),) * 5
+    return {
+        'ids': np.array(ids, dtype=np.int64),
+        'days': np.array(dates, dtype='datetime64[D]').astype(np.int32),
+        'cents': np.array(cents, dtype=np.int64),
+        'types': np.fromiter((TYPE_CODES[value] for value in types), np.int8, len(types)),
+        'categories': np.array(categories, dtype=np.int32),
+    }
+
+
+class TransactionFrame:
+    """
+    Parallel arrays with one entry per transaction, in (date, id) order:
+    days (int32), cents (int64), types (int8, see TYPE_CODES) and
+    categories (int32, the category pk).
+    """
+
+    def __init__(self, days, cents, types, categories):
+        self.days = days
+        self.cents = cents
+        self.types = types
+        self.categories = categories
+
+    @classmethod
+    def from_queryset(cls, queryset):
+        columns = fetch_columns(queryset)
+        del columns['ids']
+        return cls(**columns)
+
+    def __len__(self):
+        return len(self.days)
+
+    def select(self, mask):
+        return TransactionFrame(
+            self.days[mask], self.cents[mask], self.types[mask], self.categories[mask]
+        )
+
+    def filter(self, type=None, start=None, end=None, categories=None):
+        """
+        Returns the transactions of one type, between two dates (inclusive)
+        and in any of the given category pks. Arguments left as None, and an
+        empty list of categories, don't filter.
+        """
+        mask = np.ones(len(self), dtype=bool)
+        if type is not None:
+            mask &= self.types == TYPE_CODES[type]
+        if start is not None:
+            mask &= self.days >= to_day(start)
+        if end is not None:
+            mask &= self.days <= to_day(end)
+        if categories:
+            mask &= np.isin(self.categories, np.asarray(categories, dtype=np.int32))
+        return self.select(mask)
+
+    def signed_cents(self):
+        """Income as positive amounts, expenses as negative ones."""
+        return np.where(self.types == EXPENSE, -self.cents, self.cents)
+
+    def totals(self):
+        """Returns (income, expenses) as Decimals, like get_totals()."""
+        income = self.cents[self.types == INCOME].sum()
+        expenses = self.cents[self.types == EXPENSE].sum()
+        return from_cents(income), from_cents(expenses)
+
+    def months(self):
+        """Each transaction's month, as datetime64[M]."""
+        return self.days.astype('datetime64[D]').astype('datetime64[M]')
+
+    def _group(self, keys):
+        # sums in int64 cents - exact, unlike bincount()'s float weights
+        groups, inverse = np.unique(keys, return_inverse=True)
+        income = np.zeros(len(groups), np.int64)
+        expenses = np.zeros(len(groups), np.int64)
+        is_income = self.types == INCOME
+        is_expense = self.types == EXPENSE
+        np.add.at(income, inverse[is_income], self.cents[is_income])
+        np.add.at(expenses, inverse[is_expense], self.cents[is_expense])
+        return groups, income, expenses
+
+    def by_month(self):
+        """Returns (months, income, expenses) in cents, for months that have transactions."""
+        return self._group(self.months())
+
+    def by_bucket(self, kind):
+        """
+        Returns (buckets, income, expenses) in cents, for the days, weeks,
+        months or quarters (see tracker/bucketing.py) that have transactions.
+        Buckets are the days since 1970-01-01 that they start on.
+        """
+        return self._group(truncate_days(self.days, kind))
+
+    def by_category(self):
+        """Returns (category pks, income, expenses) in cents, ordered by pk."""
+        return self._group(self.categories)
+
+    def daily(self, start, end):
+        """The net amount in cents of every day from start to end, zero on days without transactions."""
+        first = to_day(start)
+        net = np.zeros(to_day(end) - first + 1, np.int64)
+        inside = (self.days >= first) & (self.days < first + len(net))
+        np.add.at(net, self.days[inside] - first, self.signed_cents()[inside])
+        return net
+
+    def rolling(self, start, end, window):
+        """The net amount in cents over the `window` days ending on each day from start to end."""
+        net = self.daily(start - datetime.timedelta(days=window - 1), end)
+        running = np.concatenate(([0], np.cumsum(net)))
+        return running[window:] - running[:-window]
+
+    def cumulative(self):
+        """
+        Returns (days, balance): each day with transactions, and the running
+        net amount in cents at the end of it.
+        """
+        balance = np.cumsum(self.signed_cents())
+        # the frame is in date order, so a day's last row holds its closing balance
+        last = np.flatnonzero(np.diff(self.days, append=np.iinfo(np.int32).max))
+        return self.days[last], balance[last]
+
+
+def frame_cache_key(user_pk, version):
+    return f"frame:{user_pk}:{version}"
+
+
+def get_frame(user_pk):
+    """
+    Returns the TransactionFrame of all of a user's transactions: from their
+    snapshot if they have one (see tracker/snapshots.py), otherwise built
+    once per data version. Concurrent builds for the same user share one
+    query, and users with enough transactions get a snapshot built for next
+    time.
+    """
+    frame = snapshots.load_frame(user_pk)
+    if frame is not None:
+        return frame
+
+    # read the version first: a write during the build leaves the frame under
+    # a version that is already out of date, rather than a stale current one
+    key = frame_cache_key(user_pk, get_data_version(user_pk))
+    frame = cache.get(key)
+    if frame is None:
+        frame = coalesce(
+            key, lambda: TransactionFrame.from_queryset(Transaction.objects.filter(user_id=user_pk))
+        )
+        cache.set(key, frame, settings.FRAME_CACHE_TIMEOUT)
+    if len(frame) >= settings.SNAPSHOT_MIN_TRANSACTIONS and snapshots.enabled():
+        if not snapshots.has_snapshot(user_pk):
+            snapshots.run_in_background(snapshots.rebuild, user_pk)
+    return frame
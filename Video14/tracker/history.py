@@ -0,0 +1,128 @@
+"""
+htmx keeps snapshots of the pages it pushed onto the history stack in
+localStorage. When a snapshot is missing, going back or forward makes it
+request the URL again with an HX-History-Restore-Request header and swap the
+response into the whole <body>. Those requests are answered from a small
+per-user cache of the full pages the views rendered recently.
+"""
+import hashlib
+from functools import wraps
+from inspect import iscoroutinefunction
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.utils import timezone
+from tracker.caching import CATEGORIES, TEMPLATE_VERSION, anomalies_owner, get_data_version
+from tracker.metrics import counter, incr
+
+RESTORED = counter('history.restored')
+STORED = counter('history.stored')
+
+
+def is_partial(request):
+    """
+    True for htmx requests that swap part of a page. A history restore is an
+    htmx request too, but it needs the full page.
+    """
+    return bool(request.htmx) and not request.htmx.history_restore_request
+
+
+def _page_key(request):
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f"history-page:{request.user.pk}:{path}"
+
+
+def _pages_key(user_pk):
+    return f"history-pages:{user_pk}"
+
+
+def _validator(request):
+    # a page is stale once the data, the categories, the anomaly flags, the
+    # templates or the date (for pages with default ranges) change; the CSRF
+    # token it embeds must also still be the current one
+    get_token(request)
+    return [
+        TEMPLATE_VERSION,
+        timezone.localdate(),
+        get_data_version(request.user.pk),
+        get_data_version(CATEGORIES),
+        get_data_version(anomalies_owner(request.user.pk)),
+        request.META['CSRF_COOKIE'],
+    ]
+
+
+def get_page(request):
+    """Returns the cached full page for the request's URL, or None."""
+    if not request.user.is_authenticated:
+        return None
+    cached = cache.get(_page_key(request))
+    if cached is None or cached[0] != _validator(request):
+        return None
+    return cached[1]
+
+
+def store_page(request, response):
+    """Caches a full page, keeping only the user's settings.HISTORY_PAGES most recent."""
+    if not request.user.is_authenticated:
+        return
+    key = _page_key(request)
+    timeout = settings.HISTORY_PAGE_TIMEOUT
+    cache.set(key, (_validator(request), response.content), timeout)
+
+    pages_key = _pages_key(request.user.pk)
+    pages = [page for page in cache.get(pages_key, []) if page != key]
+    pages.append(key)
+    if len(pages) > settings.HISTORY_PAGES:
+        cache.delete_many(pages[:-settings.HISTORY_PAGES])
+        pages = pages[-settings.HISTORY_PAGES:]
+    cache.set(pages_key, pages, timeout)
+
+
+def _should_store(request, response):
+    return (
+        request.method == 'GET'
+        and response.status_code == 200
+        and not response.streaming
+        and not is_partial(request)
+        and len(response.content) <= settings.HISTORY_PAGE_MAX_BYTES
+    )
+
+
+def restorable(view_func):
+    """
+    Answers history-restore requests for a view from the page cache, and
+    caches the full pages the view renders. On a miss the view renders the
+    full page itself (views check is_partial() rather than request.htmx).
+    """
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def async_wrapper(request, *args, **kwargs):
+            if request.htmx.history_restore_request:
+                content = await sync_to_async(get_page)(request)
+                if content is not None:
+                    incr(RESTORED)
+                    return HttpResponse(content)
+
+            response = await view_func(request, *args, **kwargs)
+            if _should_store(request, response):
+                await sync_to_async(store_page)(request, response)
+                incr(STORED)
+            return response
+        return async_wrapper
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if request.htmx.history_restore_request:
+            content = get_page(request)
+            if content is not None:
+                incr(RESTORED)
+                return HttpResponse(content)
+
+        response = view_func(request, *args, **kwargs)
+        if _should_store(request, response):
+            store_page(request, response)
+            incr(STORED)
+        return response
+    return wrapper
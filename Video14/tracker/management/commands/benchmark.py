@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+from tracker.benchmarks import BENCHMARKS
+from tracker.models import User
+
+
+class Command(BaseCommand):
+    help = "Runs one of the benchmarks in tracker.benchmarks"
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', choices=sorted(BENCHMARKS))
+        parser.add_argument('--username', default='bugbytes')
+        parser.add_argument('--concurrency', type=int, default=20)
+
+    def handle(self, *args, **options):
+        benchmark = BENCHMARKS[options.pop('name')]
+        user = User.objects.filter(username=options.pop('username')).first()
+        if benchmark.needs_user and not user:
+            raise CommandError(
+                "User not found - create some data with generate_transactions first"
+            )
+
+        self.stdout.write(benchmark.__doc__)
+        for line in benchmark(user, **options):
+            self.stdout.write(line)
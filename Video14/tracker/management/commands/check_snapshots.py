@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+from tracker import snapshots
+from tracker.models import User
+
+
+class Command(BaseCommand):
+    help = "Compares users' columnar snapshots with the Transaction table"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', help="Only this user")
+
+    def handle(self, *args, **options):
+        users = User.objects.all()
+        if options['username']:
+            users = users.filter(username=options['username'])
+
+        failed = 0
+        for user in users:
+            if not snapshots.has_snapshot(user.pk):
+                continue
+            problems = snapshots.verify(user.pk)
+            if problems:
+                failed += 1
+            self.stdout.write(f"{user.username:<24} {'; '.join(problems) or 'ok'}")
+
+        if failed:
+            raise CommandError(
+                f"{failed} snapshot(s) don't match the database - run rebuild_snapshots"
+            )
@@ -0,0 +1,50 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from tracker import anomalies
+from tracker.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Flags expenses and days of spending far outside users' usual ones. "
+        "With --every, keeps running and rescans users whose transactions changed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', help="Only this user")
+        parser.add_argument(
+            '--changed', action='store_true',
+            help="Skip users whose transactions haven't changed since their last scan",
+        )
+        parser.add_argument(
+            '--every', type=float, metavar='SECONDS',
+            help="Scan again every SECONDS, only users whose transactions changed",
+        )
+        parser.add_argument('--workers', type=int, help="Processes (default: ANOMALY_WORKERS)")
+        parser.add_argument('--chunk-size', type=int, help="Users per task (default: ANOMALY_CHUNK_SIZE)")
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('pk')
+        if options['username']:
+            users = users.filter(username=options['username'])
+            if not users:
+                raise CommandError("User not found")
+
+        changed_only = options['changed']
+        while True:
+            started = time.perf_counter()
+            changes = anomalies.detect(
+                list(users.values_list('pk', flat=True)),
+                workers=options['workers'],
+                chunk_size=options['chunk_size'],
+                changed_only=changed_only,
+            )
+            flagged = sum(1 for count in changes.values() if count)
+            self.stdout.write(
+                f"{len(changes)} user(s) scanned, {flagged} with changed flags, "
+                f"in {time.perf_counter() - started:.2f}s"
+            )
+            if options['every'] is None:
+                return
+            changed_only = True
+            time.sleep(options['every'])
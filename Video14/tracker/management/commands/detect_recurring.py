@@ -0,0 +1,46 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from tracker import recurring
+from tracker.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Finds recurring transactions (rent, salary, subscriptions) and updates them "
+        "with the transactions saved since the last scan. With --every, keeps running."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', help="Only this user")
+        parser.add_argument(
+            '--full', action='store_true',
+            help="Rescan every transaction - also notices deleted ones",
+        )
+        parser.add_argument(
+            '--every', type=float, metavar='SECONDS',
+            help="Update again every SECONDS, from the transactions saved since",
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('pk')
+        if options['username']:
+            users = users.filter(username=options['username'])
+            if not users:
+                raise CommandError("User not found")
+
+        full = options['full']
+        while True:
+            started = time.perf_counter()
+            extended = found = 0
+            for user_pk in users.values_list('pk', flat=True):
+                user_extended, user_found = recurring.update_series(user_pk, full=full)
+                extended += user_extended
+                found += user_found
+            self.stdout.write(
+                f"{extended} series extended, {found} found, "
+                f"in {time.perf_counter() - started:.2f}s"
+            )
+            if options['every'] is None:
+                return
+            full = False
+            time.sleep(options['every'])
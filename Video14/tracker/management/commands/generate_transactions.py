@@ -1,12 +1,16 @@
 import random
 from faker import Faker
 from django.core.management.base import BaseCommand
+from tracker.caching import bump_data_version
 from tracker.models import User, Transaction, Category
 
 
 class Command(BaseCommand):
     help = "Generates transactions for testing"
 
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=20)
+
     def handle(self, *args, **options):
         fake = Faker()
 
@@ -33,11 +37,17 @@ class Command(BaseCommand):
 
         categories = Category.objects.all()
         types = [x[0] for x in Transaction.TRANSACTION_TYPE_CHOICES]
-        for i in range(20):
-            Transaction.objects.create(
+        transactions = [
+            Transaction(
                 category=random.choice(categories),
                 user=user,
-                amount=random.uniform(1, 2500),
+                amount=round(random.uniform(1, 2500), 2),
                 date=fake.date_between(start_date='-1y', end_date='today'),
                 type=random.choice(types)
             )
+            for i in range(options['count'])
+        ]
+        Transaction.objects.bulk_create(transactions, batch_size=1000)
+
+        # bulk_create doesn't send post_save, so bump the data version by hand
+        bump_data_version(user.pk)
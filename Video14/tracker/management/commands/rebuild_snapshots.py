@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from tracker import snapshots
+from tracker.models import User
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the columnar snapshots of users' transactions from the database"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', help="Only this user, however few transactions they have")
+        parser.add_argument(
+            '--min-transactions', type=int, default=None,
+            help="Users with at least this many transactions (default: SNAPSHOT_MIN_TRANSACTIONS)",
+        )
+
+    def handle(self, *args, **options):
+        if not snapshots.enabled():
+            raise CommandError("Snapshots are switched off (SNAPSHOT_DIR, or no fcntl)")
+
+        users = User.objects.annotate(transactions=Count('transaction'))
+        if options['username']:
+            users = users.filter(username=options['username'])
+            if not users:
+                raise CommandError("User not found")
+        else:
+            minimum = options['min_transactions']
+            if minimum is None:
+                minimum = settings.SNAPSHOT_MIN_TRANSACTIONS
+            users = users.filter(transactions__gte=minimum)
+
+        for user in users:
+            snapshots.rebuild(user.pk)
+            self.stdout.write(f"{user.username:<24} {user.transactions} transactions")
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from tracker import metrics
+# importing these registers the counters of every module they use
+import tracker.middleware  # noqa: F401
+import tracker.views  # noqa: F401
+
+
+class Command(BaseCommand):
+    help = "Prints the application's counters"
+
+    def handle(self, *args, **options):
+        for name, value in metrics.get_metrics().items():
+            self.stdout.write(f"{name:<32} {value}")
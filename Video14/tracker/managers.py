@@ -1,4 +1,16 @@
 from django.db import models 
+from tracker.aggregates import Median, Percentile, RunningSum, StdDev
+from tracker.bucketing import DateBucket
+from tracker.fields import MoneyField
+
+
+def signed_amount():
+    """The amount, negated for expenses - summed, it is income minus expenses."""
+    return models.Case(
+        models.When(type='expense', then=-models.F('amount')),
+        default=models.F('amount'),
+        output_field=MoneyField(),
+    )
 
 
 class TransactionQuerySet(models.QuerySet):
@@ -16,4 +28,81 @@ class TransactionQuerySet(models.QuerySet):
     def get_total_income(self):
         return self.get_income().aggregate(
             total=models.Sum('amount')
-        )['total'] or 0
\ No newline at end of file
+        )['total'] or 0
+
+    def get_totals(self):
+        """Returns (income, expenses) from a single aggregate query."""
+        totals = self.aggregate(
+            income=models.Sum('amount', filter=models.Q(type='income')),
+            expenses=models.Sum('amount', filter=models.Q(type='expense')),
+        )
+        return totals['income'] or 0, totals['expenses'] or 0
+
+    def category_stats(self):
+        """
+        Returns a row per category and type with the count, total, median,
+        90th percentile and standard deviation of the amounts, from a single
+        query computed in the database.
+        """
+        return (
+            self.order_by()
+            .values('category', 'type')
+            .annotate(
+                count=models.Count('id'),
+                total=models.Sum('amount'),
+                median=Median('amount'),
+                p90=Percentile('amount', 0.9),
+                stddev=StdDev('amount'),
+            )
+            .order_by('category', 'type')
+        )
+
+    def compare_periods(self, current, previous):
+        """
+        Returns a row per category and type with the sum of the amounts in
+        the `current` and in the `previous` period - each a (start, end) pair
+        of dates, both inclusive. One query: each period is a conditional
+        SUM(CASE WHEN date BETWEEN ...) over the rows of either period, rather
+        than an aggregate pass per period.
+        """
+        def in_period(period):
+            return models.Case(
+                models.When(date__range=period, then=models.F('amount')),
+                default=models.Value(0),
+                output_field=MoneyField(),
+            )
+
+        return (
+            self.filter(models.Q(date__range=current) | models.Q(date__range=previous))
+            .order_by()
+            .values('category', 'type')
+            .annotate(
+                current=models.Sum(in_period(current)),
+                previous=models.Sum(in_period(previous)),
+            )
+            .order_by('category', 'type')
+        )
+
+    def running_balance(self, kind='day'):
+        """
+        Returns a row per day, week, month or quarter (`kind`, see
+        tracker/bucketing.py) that has transactions,
+        in date order: the bucket's first day, its income minus expenses
+        ('net'), and the running total of those up to and including it
+        ('balance'). One query - the running total is a window function.
+        """
+        signed = signed_amount()
+        bucket = models.F('date') if kind == 'day' else DateBucket('date', kind)
+        return (
+            self.order_by()
+            .annotate(bucket=bucket)
+            .values('bucket')
+            .annotate(net=models.Sum(signed))
+            # a separate annotate(), or the window would be grouped by too
+            .annotate(
+                balance=models.Window(
+                    RunningSum(models.Sum(signed)), order_by=models.F('bucket').asc()
+                ),
+            )
+            .order_by('bucket')
+        )
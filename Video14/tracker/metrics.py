@@ -0,0 +1,28 @@
+from django.core.cache import cache
+
+# names of every counter, registered by the modules that increment them
+COUNTERS = []
+
+
+def counter(name):
+    COUNTERS.append(name)
+    return name
+
+
+def metric_key(name):
+    return f"metrics:{name}"
+
+
+def incr(name, delta=1):
+    key = metric_key(name)
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        # evicted between add() and incr()
+        cache.set(key, delta, timeout=None)
+
+
+def get_metrics():
+    values = cache.get_many([metric_key(name) for name in COUNTERS])
+    return {name: values.get(metric_key(name), 0) for name in COUNTERS}
@@ -0,0 +1,74 @@
+import math
+from django.conf import settings
+from tracker import metrics
+from tracker.ratelimit import get_semaphore, take_token
+from tracker.responses import render_alert
+
+for url_name in settings.RATE_LIMITS:
+    for reason in ('concurrency', 'user', 'global'):
+        metrics.counter(f'ratelimit.rejected.{url_name}.{reason}')
+
+
+class RateLimitMiddleware:
+    """
+    Applies settings.RATE_LIMITS to the expensive views, by URL name: a cap
+    on concurrent requests per process, then a per-user and a global token
+    bucket. Rejected requests get a 429 with a Retry-After header.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            return self.get_response(request)
+        finally:
+            semaphore = getattr(request, '_rate_limit_semaphore', None)
+            if semaphore is not None:
+                semaphore.release()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        url_name = request.resolver_match.url_name
+        limits = settings.RATE_LIMITS.get(url_name)
+        if limits is None or not self.applies(request, limits):
+            return None
+
+        semaphore = get_semaphore(url_name, limits['concurrency'])
+        if not semaphore.acquire(blocking=False):
+            return self.reject(request, url_name, 'concurrency', retry_after=1)
+        request._rate_limit_semaphore = semaphore
+
+        if request.user.is_authenticated:
+            client = f'user:{request.user.pk}'
+        else:
+            client = f"ip:{request.META.get('REMOTE_ADDR')}"
+
+        for reason, key in (
+            ('user', f'ratelimit:{url_name}:{client}'),
+            ('global', f'ratelimit:{url_name}'),
+        ):
+            retry_after = take_token(key, *limits[reason])
+            if retry_after:
+                return self.reject(request, url_name, reason, retry_after)
+        return None
+
+    def applies(self, request, limits):
+        # a view can limit only the requests that do the expensive work, and
+        # let through the cheap ones around it (the form, an htmx redirect hop)
+        if request.method not in limits.get('methods', (request.method,)):
+            return False
+        return limits.get('htmx', True) or not request.htmx
+
+    def reject(self, request, url_name, reason, retry_after):
+        metrics.incr(f'ratelimit.rejected.{url_name}.{reason}')
+
+        retry_after = math.ceil(retry_after)
+        response = render_alert(
+            request,
+            'tracker/partials/rate-limited.html',
+            {'title': 'Too Many Requests', 'retry_after': retry_after},
+            status=429,
+        )
+        response['Retry-After'] = str(retry_after)
+        return response
+
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-19 14:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tracker", "0003_transaction_updated_at"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(
+                fields=["user", "-date", "-id"], name="transaction_user_date_id"
+            ),
+        ),
+    ]
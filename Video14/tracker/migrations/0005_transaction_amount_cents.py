@@ -0,0 +1,62 @@
+# Generated by Django 4.2 on 2026-10-19 15:20
+
+from django.db import migrations, models
+from django.db.models import ExpressionWrapper, F, Value
+from django.db.models.functions import Cast, Round
+import tracker.fields
+
+
+def amount_to_cents(apps, schema_editor):
+    Transaction = apps.get_model("tracker", "Transaction")
+    # rounded, because SQLite keeps decimals as floats (0.29 * 100 = 28.999...)
+    Transaction.objects.update(
+        amount_cents=Cast(
+            Round(F("amount") * Value(100, output_field=models.DecimalField())),
+            output_field=models.BigIntegerField(),
+        )
+    )
+
+
+def cents_to_amount(apps, schema_editor):
+    Transaction = apps.get_model("tracker", "Transaction")
+    Transaction.objects.update(
+        amount=Cast(
+            ExpressionWrapper(F("amount_cents") / Value(100.0), output_field=models.FloatField()),
+            output_field=models.DecimalField(max_digits=10, decimal_places=2),
+        )
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tracker", "0004_transaction_user_date_id"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="transaction",
+            name="amount_cents",
+            field=tracker.fields.MoneyField(null=True),
+        ),
+        # nullable first, so that reversing can add the column back before filling it
+        migrations.AlterField(
+            model_name="transaction",
+            name="amount",
+            field=models.DecimalField(decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.RunPython(amount_to_cents, cents_to_amount),
+        migrations.RemoveField(
+            model_name="transaction",
+            name="amount",
+        ),
+        migrations.RenameField(
+            model_name="transaction",
+            old_name="amount_cents",
+            new_name="amount",
+        ),
+        migrations.AlterField(
+            model_name="transaction",
+            name="amount",
+            field=tracker.fields.MoneyField(),
+        ),
+    ]
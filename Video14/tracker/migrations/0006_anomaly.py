@@ -0,0 +1,60 @@
+# Generated by Django 4.2 on 2026-10-19 16:05
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tracker", "0005_transaction_amount_cents"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Anomaly",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[("amount", "Unusual amount"), ("daily", "Unusual day")],
+                        max_length=6,
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("score", models.FloatField()),
+                ("detected_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "transaction",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="tracker.transaction",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "Anomalies",
+                "indexes": [
+                    models.Index(fields=["user", "date"], name="anomaly_user_date")
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 4.2 on 2026-10-19 17:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import tracker.fields
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tracker", "0006_anomaly"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RecurringSeries",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "type",
+                    models.CharField(
+                        choices=[("income", "Income"), ("expense", "Expense")],
+                        max_length=7,
+                    ),
+                ),
+                (
+                    "period",
+                    models.CharField(
+                        choices=[
+                            ("weekly", "Weekly"),
+                            ("monthly", "Monthly"),
+                            ("annual", "Annual"),
+                        ],
+                        max_length=7,
+                    ),
+                ),
+                ("amount", tracker.fields.MoneyField()),
+                ("occurrences", models.PositiveIntegerField()),
+                ("first_date", models.DateField()),
+                ("last_date", models.DateField()),
+                ("next_date", models.DateField()),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "category",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="tracker.category",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "Recurring series",
+                "indexes": [
+                    models.Index(
+                        fields=["user", "next_date"], name="recurring_user_next_date"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from .fields import MoneyField
 from .managers import TransactionQuerySet
 
 class User(AbstractUser):
@@ -25,8 +26,9 @@ class Transaction(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     category = models.ForeignKey(Category, on_delete=models.CASCADE)
     type = models.CharField(max_length=7, choices=TRANSACTION_TYPE_CHOICES)
-    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    amount = MoneyField()
     date = models.DateField()
+    updated_at = models.DateTimeField(auto_now=True)
 
     objects = TransactionQuerySet.as_manager()
 
@@ -35,3 +37,77 @@ class Transaction(models.Model):
 
     class Meta:
         ordering = ['-date']   
+        indexes = [
+            # keyset pagination of a user's list (see tracker/paging.py)
+            models.Index(fields=['user', '-date', '-id'], name='transaction_user_date_id'),
+        ]
+
+
+class Anomaly(models.Model):
+    """
+    A flag raised by tracker/anomalies.py: an expense far outside its
+    category's recent amounts, or a day whose total spending is far outside
+    the days before it (with no transaction).
+    """
+    AMOUNT = 'amount'
+    DAILY = 'daily'
+    KIND_CHOICES = (
+        (AMOUNT, 'Unusual amount'),
+        (DAILY, 'Unusual day'),
+    )
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    kind = models.CharField(max_length=6, choices=KIND_CHOICES)
+    transaction = models.ForeignKey(Transaction, on_delete=models.CASCADE, null=True, blank=True)
+    date = models.DateField()
+    # robust z-score: how many (MAD-scaled) deviations above the median
+    score = models.FloatField()
+    detected_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.get_kind_display()} on {self.date} for {self.user} ({self.score:.1f})"
+
+    class Meta:
+        verbose_name_plural = 'Anomalies'
+        indexes = [
+            # the daily flags of the days on a page of the list
+            models.Index(fields=['user', 'date'], name='anomaly_user_date'),
+        ]
+
+
+class RecurringSeries(models.Model):
+    """
+    Transactions that repeat - rent, salary, subscriptions - found by
+    tracker/recurring.py: the same type and category, a similar amount, and
+    a weekly, monthly or annual rhythm.
+    """
+    WEEKLY = 'weekly'
+    MONTHLY = 'monthly'
+    ANNUAL = 'annual'
+    PERIOD_CHOICES = (
+        (WEEKLY, 'Weekly'),
+        (MONTHLY, 'Monthly'),
+        (ANNUAL, 'Annual'),
+    )
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    category = models.ForeignKey(Category, on_delete=models.CASCADE)
+    type = models.CharField(max_length=7, choices=Transaction.TRANSACTION_TYPE_CHOICES)
+    period = models.CharField(max_length=7, choices=PERIOD_CHOICES)
+    # the latest amount: a subscription's price may change
+    amount = MoneyField()
+    occurrences = models.PositiveIntegerField()
+    first_date = models.DateField()
+    last_date = models.DateField()
+    next_date = models.DateField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.get_period_display()} {self.type} of {self.amount} ({self.category}) by {self.user}"
+
+    class Meta:
+        verbose_name_plural = 'Recurring series'
+        indexes = [
+            # a user's upcoming payments
+            models.Index(fields=['user', 'next_date'], name='recurring_user_next_date'),
+        ]
@@ -0,0 +1,96 @@
+"""
+Infinite-scroll page sizes chosen from client hints. transactions.js sends
+the number of rows that fit in the viewport (X-Viewport-Rows) and how fast
+the list is being scrolled, in rows per second (X-Scroll-Velocity), with
+every htmx request. It also keeps the viewport rows in a cookie, so the
+first page of a full page load can be sized too.
+
+Pages are addressed by keyset cursors in both directions, which lets the
+windowed list in transactions.js drop rows far off-screen and fetch them
+back later.
+"""
+import datetime
+import math
+from django.conf import settings
+from django.db.models import Q
+
+VIEWPORT_ROWS_COOKIE = 'viewport_rows'
+
+
+def _hint(value):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    if not math.isfinite(value) or value < 0:
+        return None
+    return value
+
+
+def page_size(request, first=False):
+    """
+    Returns how many rows to send. The first page fills the viewport; later
+    pages cover a screenful or the rows scrolled past in
+    settings.PAGE_LOOKAHEAD_SECONDS, whichever is more. Both leave
+    settings.PAGE_OVERSCAN_ROWS below the fold, so the row that fetches the
+    next page isn't revealed as soon as it's swapped in.
+    """
+    viewport_rows = _hint(request.headers.get('X-Viewport-Rows'))
+    if viewport_rows is None:
+        viewport_rows = _hint(request.COOKIES.get(VIEWPORT_ROWS_COOKIE))
+    if viewport_rows is None:
+        return settings.PAGE_SIZE
+
+    rows = viewport_rows
+    if not first:
+        velocity = _hint(request.headers.get('X-Scroll-Velocity')) or 0
+        rows = max(rows, velocity * settings.PAGE_LOOKAHEAD_SECONDS)
+    rows += settings.PAGE_OVERSCAN_ROWS
+
+    # round up to a multiple of PAGE_SIZE: few distinct sizes keep ETags reusable
+    size = math.ceil(rows / settings.PAGE_SIZE) * settings.PAGE_SIZE
+    return max(settings.PAGE_SIZE_MIN, min(settings.PAGE_SIZE_MAX, size))
+
+
+# a total order, so every row has a unique position to page from
+ORDERING = ('-date', '-id')
+
+
+def make_cursor(transaction):
+    return f"{transaction.date.isoformat()}.{transaction.pk}"
+
+
+def parse_cursor(value):
+    """Returns (date, pk) for a cursor made by make_cursor(), or None."""
+    try:
+        date, pk = value.split('.')
+        return datetime.date.fromisoformat(date), int(pk)
+    except (AttributeError, ValueError):
+        return None
+
+
+def get_rows(queryset, size, after=None, before=None):
+    """
+    Returns (transactions, has_more): up to `size` transactions in list order,
+    starting from the top, or just after or before a (date, pk) cursor. The
+    cursor is a keyset position, so pages don't shift when rows are added or
+    deleted, and each page is an index range scan rather than an OFFSET. One
+    extra row is fetched to tell whether more follow.
+    """
+    if before is not None:
+        date, pk = before
+        queryset = queryset.filter(
+            Q(date__gt=date) | Q(date=date, id__gt=pk)
+        ).order_by('date', 'id')
+    else:
+        if after is not None:
+            date, pk = after
+            queryset = queryset.filter(Q(date__lt=date) | Q(date=date, id__lt=pk))
+        queryset = queryset.order_by(*ORDERING)
+
+    transactions = list(queryset[:size + 1])
+    has_more = len(transactions) > size
+    transactions = transactions[:size]
+    if before is not None:
+        transactions.reverse()
+    return transactions, has_more
@@ -0,0 +1,39 @@
+import math
+import threading
+import time
+from django.core.cache import cache
+
+_semaphores = {}
+_semaphores_lock = threading.Lock()
+
+
+def take_token(key, rate, burst):
+    """
+    Token bucket stored in the cache: `rate` tokens per second, holding at most
+    `burst`. Returns 0 when a token was taken, otherwise the number of seconds
+    until one will be available.
+
+    The read-modify-write isn't atomic, so concurrent requests may occasionally
+    both take the last token - fine for shedding load, which is all it is for.
+    """
+    now = time.time()
+    tokens, updated = cache.get(key, (burst, now))
+    tokens = min(burst, tokens + (now - updated) * rate)
+
+    # once the bucket has had time to refill, the entry can simply expire
+    timeout = math.ceil(burst / rate) + 1
+    if tokens >= 1:
+        cache.set(key, (tokens - 1, now), timeout)
+        return 0
+
+    cache.set(key, (tokens, now), timeout)
+    return (1 - tokens) / rate
+
+
+def get_semaphore(url_name, size):
+    # one per process - it bounds how many of this process's threads run the view
+    with _semaphores_lock:
+        semaphore = _semaphores.get((url_name, size))
+        if semaphore is None:
+            semaphore = _semaphores[(url_name, size)] = threading.BoundedSemaphore(size)
+        return semaphore
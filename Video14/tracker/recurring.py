@@ -0,0 +1,236 @@
+"""
+Recurring transactions - rent, salary, subscriptions - found in a user's
+history and kept up to date as new transactions arrive.
+
+Discovery clusters a user's transactions by type, category and amount: in
+each category, a cluster takes the amounts up to
+settings.RECURRING_AMOUNT_TOLERANCE above its smallest one. The intervals
+between the dates in each cluster are then tested against the PERIODS, for
+every cluster at once over flat NumPy arrays of intervals labelled by
+cluster. A cluster is a series when it has settings.RECURRING_MIN_OCCURRENCES
+transactions and settings.RECURRING_MIN_MATCH of its intervals are within a
+period's slack.
+
+Updates are incremental. A scan remembers when it started, and the next one
+only reads the transactions saved since. A transaction that continues a
+series - the same type and category, a similar amount, around the next
+expected date - extends it, and only the categories that have other new or
+edited transactions are discovered again. Deleted transactions are only
+noticed by a full scan (detect_recurring --full), which also runs whenever
+a user's watermark has been lost from the cache.
+"""
+import datetime
+import numpy as np
+from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from tracker import snapshots
+from tracker.fields import from_cents
+from tracker.frames import TYPES, fetch_columns, to_date
+from tracker.models import RecurringSeries, Transaction
+
+# period: (typical interval in days, slack in days either side)
+PERIODS = {
+    RecurringSeries.WEEKLY: (7, 1),
+    RecurringSeries.MONTHLY: (30.44, 3),
+    RecurringSeries.ANNUAL: (365.25, 7),
+}
+
+
+def next_date(period, last, first):
+    """The date after `last` in a series that started on `first`."""
+    if period == RecurringSeries.WEEKLY:
+        return last + datetime.timedelta(days=7)
+    # on the first date's day of the month, or the month's last day if shorter
+    if period == RecurringSeries.MONTHLY:
+        return last + relativedelta(months=1, day=first.day)
+    return last + relativedelta(years=1, month=first.month, day=first.day)
+
+
+def _cluster(types, categories, cents, tolerance):
+    """
+    A cluster label for each transaction. Clusters never span a type or
+    category, and no amount in one is more than `tolerance` above its
+    smallest.
+    """
+    # type and category far apart on one axis, with the log amount below them
+    keys = (types.astype(float) * 1e6 + categories) * 1e3 + np.log(np.maximum(cents, 1))
+    order = np.argsort(keys, kind='stable')
+    keys = keys[order]
+    width = np.log1p(tolerance)
+
+    # a step per cluster rather than per transaction
+    starts = []
+    start = 0
+    while start < len(keys):
+        starts.append(start)
+        start = int(np.searchsorted(keys, keys[start] + width, side='right'))
+    sizes = np.diff(starts + [len(keys)])
+    labels = np.empty(len(keys), dtype=np.int64)
+    labels[order] = np.repeat(np.arange(len(starts)), sizes)
+    return labels
+
+
+def find_series(columns, tolerance=None, min_occurrences=None, min_match=None):
+    """
+    Returns the series in the columns (see frames.fetch_columns) as dicts of
+    type, category (pk), period, cents (the latest amount), occurrences,
+    first_date, last_date and next_date.
+    """
+    tolerance = tolerance or settings.RECURRING_AMOUNT_TOLERANCE
+    min_occurrences = min_occurrences or settings.RECURRING_MIN_OCCURRENCES
+    min_match = min_match or settings.RECURRING_MIN_MATCH
+    if not len(columns['ids']):
+        return []
+
+    labels = _cluster(columns['types'], columns['categories'], columns['cents'], tolerance)
+    # by cluster, then date
+    order = np.lexsort((columns['ids'], columns['days'], labels))
+    labels, days = labels[order], columns['days'][order]
+    clusters = labels.max() + 1
+    occurrences = np.bincount(labels, minlength=clusters)
+
+    same = labels[1:] == labels[:-1]
+    intervals = np.diff(days)[same]
+    interval_labels = labels[1:][same]
+    matches = np.array([
+        np.bincount(interval_labels, weights=np.abs(intervals - days_apart) <= slack, minlength=clusters)
+        for days_apart, slack in PERIODS.values()
+    ])
+    share = matches / np.maximum(occurrences - 1, 1)
+    best = share.argmax(axis=0)
+    found = np.flatnonzero((occurrences >= min_occurrences) & (share.max(axis=0) >= min_match))
+
+    # the first and last transaction of each cluster, in the sorted arrays
+    last = np.append(np.flatnonzero(~same), len(labels) - 1)
+    first = last - occurrences + 1
+    periods = list(PERIODS)
+    series = []
+    for cluster in found.tolist():
+        newest, oldest = order[last[cluster]], order[first[cluster]]
+        period = periods[best[cluster]]
+        first_date, last_date = to_date(columns['days'][oldest]), to_date(columns['days'][newest])
+        series.append({
+            'type': TYPES[columns['types'][newest]],
+            'category': int(columns['categories'][newest]),
+            'period': period,
+            'cents': int(columns['cents'][newest]),
+            'occurrences': int(occurrences[cluster]),
+            'first_date': first_date,
+            'last_date': last_date,
+            'next_date': next_date(period, last_date, first_date),
+        })
+    return series
+
+
+def _new_series(user_pk, found):
+    return RecurringSeries(
+        user_id=user_pk,
+        category_id=found['category'],
+        type=found['type'],
+        period=found['period'],
+        amount=from_cents(found['cents']),
+        occurrences=found['occurrences'],
+        first_date=found['first_date'],
+        last_date=found['last_date'],
+        next_date=found['next_date'],
+    )
+
+
+def _continues(series, type, category, cents, date):
+    """True if the transaction is the series' next occurrence."""
+    tolerance = settings.RECURRING_AMOUNT_TOLERANCE
+    expected = Transaction._meta.get_field('amount').get_prep_value(series.amount)
+    low, high = expected / (1 + tolerance), expected * (1 + tolerance)
+    _, slack = PERIODS[series.period]
+    return (
+        series.type == type
+        and series.category_id == category
+        and low <= cents <= high
+        and abs((date - series.next_date).days) <= slack
+    )
+
+
+def watermark_key(user_pk):
+    return f"recurring-scanned:{user_pk}"
+
+
+def _columns(user_pk, queryset):
+    # the snapshot, when the whole history is wanted and there is one
+    if queryset is None:
+        columns = snapshots.load_columns(user_pk)
+        if columns is not None:
+            return columns
+        queryset = Transaction.objects.filter(user_id=user_pk)
+    return fetch_columns(queryset)
+
+
+def _rediscover(user_pk, groups=None):
+    """
+    Replaces the user's series - all of them, or those of the (type,
+    category) groups - with those found in their transactions. Returns the
+    number of series found.
+    """
+    existing = RecurringSeries.objects.filter(user_id=user_pk)
+    queryset = None
+    if groups is not None:
+        in_groups = Q()
+        for type, category in groups:
+            in_groups |= Q(type=type, category_id=category)
+        existing = existing.filter(in_groups)
+        queryset = Transaction.objects.filter(in_groups, user_id=user_pk)
+
+    found = find_series(_columns(user_pk, queryset))
+    with transaction.atomic():
+        existing.delete()
+        RecurringSeries.objects.bulk_create(_new_series(user_pk, series) for series in found)
+    return len(found)
+
+
+def update_series(user_pk, full=False):
+    """
+    Brings a user's series up to date with the transactions saved since
+    their last scan - or all of them, with full or on a first scan. Returns
+    (series extended, series found by discovery).
+    """
+    # before reading: a transaction saved during the scan is read again next time
+    started = timezone.now()
+    watermark = None if full else cache.get(watermark_key(user_pk))
+    if watermark is None:
+        found = _rediscover(user_pk)
+        cache.set(watermark_key(user_pk), started, timeout=None)
+        return 0, found
+
+    new = fetch_columns(Transaction.objects.filter(user_id=user_pk, updated_at__gte=watermark))
+    series = list(RecurringSeries.objects.filter(user_id=user_pk))
+    extended, groups = {}, set()
+    for type, category, cents, day in zip(
+        new['types'].tolist(), new['categories'].tolist(), new['cents'].tolist(), new['days'].tolist()
+    ):
+        type, date = TYPES[type], to_date(day)
+        match = next((s for s in series if _continues(s, type, category, cents, date)), None)
+        if match is None:
+            # a new series, or an edit to an old transaction: look at the category again
+            groups.add((type, category))
+            continue
+        match.occurrences += 1
+        match.amount = from_cents(cents)
+        match.last_date = date
+        match.next_date = next_date(match.period, date, match.first_date)
+        extended[match.pk] = match
+
+    # those in a group being discovered again are replaced anyway
+    extended = [s for s in extended.values() if (s.type, s.category_id) not in groups]
+    if extended:
+        # bulk_update() doesn't apply auto_now
+        for s in extended:
+            s.updated_at = timezone.now()
+        RecurringSeries.objects.bulk_update(
+            extended, ['occurrences', 'amount', 'last_date', 'next_date', 'updated_at']
+        )
+    found = _rediscover(user_pk, groups) if groups else 0
+    cache.set(watermark_key(user_pk), started, timeout=None)
+    return len(extended), found
@@ -0,0 +1,203 @@
+"""
+Reports over a user's transactions.
+
+The category x month pivot report: a row per category, a column per month,
+and in each cell the category's income minus expenses for that month, with
+row and column totals. It is one GROUP BY category, month query - never a
+query per cell or per month - pivoted into a 2D array of cents with NumPy.
+
+The period comparison: this month against last month, this year against
+last year, or any two periods, per category and type, with the change and
+the percentage change. Both periods come from a single query, and the result
+is cached under the user's data version.
+"""
+import csv
+import datetime
+import io
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import BigIntegerField, CharField, Sum
+from django.db.models.functions import Cast
+from django.utils import timezone
+from django.utils.safestring import mark_safe
+from tracker.bucketing import DateBucket
+from tracker.caching import CATEGORIES, get_data_version
+from tracker.categories import categories_by_pk
+from tracker.fields import from_cents
+from tracker.managers import signed_amount
+from tracker.models import Transaction
+from tracker.singleflight import coalesce
+
+CELL = '<td class="text-right">{}</td>'
+
+
+class Pivot:
+    """
+    categories (in name order) x months (first days, in date order, with no
+    gaps), with cells, row_totals, column_totals and total in cents.
+    """
+
+    def __init__(self, categories, months, cells):
+        self.categories = categories
+        self.months = months
+        self.cells = cells
+        self.row_totals = cells.sum(axis=1)
+        self.column_totals = cells.sum(axis=0)
+        self.total = int(cells.sum())
+
+    @classmethod
+    def from_queryset(cls, queryset):
+        rows = list(
+            queryset.order_by()
+            # text dates, which NumPy parses far faster than date objects
+            .values_list('category', Cast(DateBucket('date', 'month'), CharField()))
+            .annotate(total=Cast(Sum(signed_amount()), BigIntegerField()))
+        )
+        if not rows:
+            return cls([], [], np.zeros((0, 0), np.int64))
+
+        category_pks, months, totals = zip(*rows)
+        months = np.array(months, dtype='datetime64[D]').astype('datetime64[M]')
+        first = months.min()
+        columns = (months - first).astype(np.int64)
+        pks, row_of = np.unique(np.array(category_pks, dtype=np.int64), return_inverse=True)
+
+        cells = np.zeros((len(pks), columns.max() + 1), np.int64)
+        cells[row_of, columns] = totals
+
+        by_pk = categories_by_pk()
+        categories = [by_pk[pk] for pk in pks.tolist()]
+        order = sorted(range(len(categories)), key=lambda row: categories[row].name)
+        month_dates = (first + np.arange(cells.shape[1])).astype('datetime64[D]').astype(object)
+        return cls([categories[row] for row in order], list(month_dates), cells[order])
+
+    def rows(self):
+        """(category, amounts, total) for each row, as Decimals."""
+        for category, cells, total in zip(self.categories, self.cells.tolist(), self.row_totals.tolist()):
+            yield category, [from_cents(cents) for cents in cells], from_cents(total)
+
+    def html_rows(self):
+        """
+        (category, cells, total) for each row, with the row's cells already
+        joined into <td> elements: the template loops over the rows only, as a
+        Django template loop over every cell of a 10-year report takes seconds.
+        Empty cells are left blank.
+        """
+        for category, amounts, total in self.rows():
+            cells = ''.join(CELL.format(amount if amount else '') for amount in amounts)
+            # safe: nothing but formatted numbers
+            yield category, mark_safe(cells), total
+
+    def totals(self):
+        """(amounts, total) of the totals row, as Decimals."""
+        return [from_cents(cents) for cents in self.column_totals.tolist()], from_cents(self.total)
+
+    def to_csv(self):
+        output = io.StringIO()
+        writer = csv.writer(output)
+        writer.writerow(['Category', *(month.strftime('%Y-%m') for month in self.months), 'Total'])
+        for category, amounts, total in self.rows():
+            writer.writerow([category.name, *amounts, total])
+        amounts, total = self.totals()
+        writer.writerow(['Total', *amounts, total])
+        return output.getvalue()
+
+
+PERIODS = {
+    'month': 'This month vs. last month',
+    'year': 'This year vs. last year',
+}
+
+
+def preset_periods(name, today=None):
+    """(current, previous) (start, end) pairs for one of PERIODS."""
+    today = today or timezone.localdate()
+    if name == 'month':
+        start = today.replace(day=1)
+        end = (start + datetime.timedelta(days=31)).replace(day=1) - datetime.timedelta(days=1)
+    elif name == 'year':
+        start, end = today.replace(month=1, day=1), today.replace(month=12, day=31)
+    else:
+        raise ValueError(f"unknown period {name!r}")
+    previous_end = start - datetime.timedelta(days=1)
+    previous_start = previous_end.replace(day=1) if name == 'month' else previous_end.replace(month=1, day=1)
+    return (start, end), (previous_start, previous_end)
+
+
+def preceding_period(period):
+    """The period as long as `period` that ends the day before it starts."""
+    start, end = period
+    previous_end = start - datetime.timedelta(days=1)
+    return previous_end - (end - start), previous_end
+
+
+def _change(current, previous, **row):
+    change = current - previous
+    # no percentage from nothing
+    percent = round(change / previous * 100, 1) if previous else None
+    return {**row, 'current': current, 'previous': previous, 'change': change, 'percent': percent}
+
+
+class Comparison:
+    """
+    The current and previous periods side by side. rows are dicts of
+    category, type, current, previous, change and percent (the change as a
+    percentage of previous, None if previous is 0) - income first, then
+    expenses, each in category name order. totals has the same for
+    'income', 'expense' and 'net' (income minus expenses).
+    """
+
+    def __init__(self, current, previous, rows):
+        self.current = current
+        self.previous = previous
+        self.rows = rows
+        sums = {}
+        for type in ('income', 'expense'):
+            of_type = [row for row in rows if row['type'] == type]
+            sums[type] = (
+                sum((row['current'] for row in of_type), from_cents(0)),
+                sum((row['previous'] for row in of_type), from_cents(0)),
+            )
+        self.totals = {type: _change(*pair) for type, pair in sums.items()}
+        self.totals['net'] = _change(
+            sums['income'][0] - sums['expense'][0], sums['income'][1] - sums['expense'][1]
+        )
+
+    @classmethod
+    def from_queryset(cls, queryset, current, previous):
+        by_pk = categories_by_pk()
+        rows = [
+            _change(
+                row['current'], row['previous'], category=by_pk[row['category']], type=row['type']
+            )
+            for row in queryset.compare_periods(current, previous)
+        ]
+        rows.sort(key=lambda row: (row['type'] != 'income', row['category'].name))
+        return cls(current, previous, rows)
+
+
+def comparison_cache_key(user_pk, current, previous):
+    return (
+        f"comparison:{user_pk}:{get_data_version(user_pk)}:{get_data_version(CATEGORIES)}:"
+        f"{current[0]}:{current[1]}:{previous[0]}:{previous[1]}"
+    )
+
+
+def compare_periods(user_pk, current, previous):
+    """
+    The Comparison of a user's transactions over two periods. It is cached
+    under the data versions, so it is computed once per write rather than
+    once per request, and concurrent requests for it share one query.
+    """
+    key = comparison_cache_key(user_pk, current, previous)
+    comparison = cache.get(key)
+    if comparison is None:
+        comparison = coalesce(
+            key,
+            lambda: Comparison.from_queryset(
+                Transaction.objects.filter(user_id=user_pk), current, previous
+            ),
+        )
+        cache.set(key, comparison, settings.COMPARISON_CACHE_TIMEOUT)
+    return comparison
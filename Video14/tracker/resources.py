@@ -1,12 +1,35 @@
 from import_export import resources, fields
 from tracker.models import Transaction, Category
-from import_export.widgets import ForeignKeyWidget
+from import_export.widgets import DecimalWidget, ForeignKeyWidget
+from tracker.categories import categories_by_name
+
+
+class CategoryWidget(ForeignKeyWidget):
+    """Looks categories up by name in the in-memory category cache"""
+
+    def __init__(self):
+        super().__init__(Category, field='name')
+
+    def clean(self, value, row=None, **kwargs):
+        if not value:
+            return None
+        try:
+            return categories_by_name()[value]
+        except KeyError:
+            raise ValueError(f"Category '{value}' does not exist")
 
 class TransactionResource(resources.ModelResource):
+    # MoneyField is a BigIntegerField underneath, which import_export would
+    # otherwise treat as a whole number
+    amount = fields.Field(
+        column_name='amount',
+        attribute='amount',
+        widget=DecimalWidget()
+    )
     category = fields.Field(
         column_name='category',
         attribute='category',
-        widget=ForeignKeyWidget(Category, field='name')
+        widget=CategoryWidget()
     )
 
     def after_init_instance(self, instance, new, row, **kwargs):
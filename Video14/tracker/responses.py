@@ -0,0 +1,15 @@
+from django.shortcuts import render
+from django_htmx.http import reswap, retarget
+
+
+def render_alert(request, alert_template, context, status):
+    """
+    Renders an error alert: into #alerts for HTMX requests, otherwise as a
+    full page.
+    """
+    if request.htmx:
+        response = render(request, alert_template, context, status=status)
+        return reswap(retarget(response, '#alerts'), 'innerHTML')
+
+    context = {**context, 'alert_template': alert_template}
+    return render(request, 'tracker/error-page.html', context, status=status)
@@ -0,0 +1,30 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from tracker.caching import CATEGORIES, bump_data_version, delete_transaction_row
+from tracker.models import Category, Transaction
+from tracker.snapshots import record_write
+
+
+@receiver(post_save, sender=Transaction)
+def transaction_saved(sender, instance, **kwargs):
+    record_write(instance, bump_data_version(instance.user_id))
+
+
+@receiver(post_delete, sender=Transaction)
+def transaction_deleted(sender, instance, **kwargs):
+    delete_transaction_row(instance)
+    record_write(instance, bump_data_version(instance.user_id), deleted=True)
+
+
+@receiver(post_save, sender=Category)
+def category_saved(sender, instance, created, **kwargs):
+    # rows display the category name, so a rename must invalidate those rows
+    if not created:
+        Transaction.objects.filter(category=instance).update(updated_at=timezone.now())
+    bump_data_version(CATEGORIES)
+
+
+@receiver(post_delete, sender=Category)
+def category_deleted(sender, instance, **kwargs):
+    bump_data_version(CATEGORIES)
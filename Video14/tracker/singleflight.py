@@ -0,0 +1,228 @@
+"""
+Request coalescing: concurrent callers asking for the same expensive result
+wait for a single leader to compute it, then share that result.
+
+Within a process, followers wait on the leader's thread. Across processes on
+the same host, leaders serialise on a lock file in a directory private to the
+app. When other processes are queued behind the lock, the leader leaves its
+result next to it for them to read instead of recomputing, and the last
+process out removes it. The lock files themselves stay, and are pruned once
+they haven't been used for settings.SINGLEFLIGHT_LOCK_MAX_AGE seconds.
+"""
+import hashlib
+import os
+import pickle
+import stat
+import threading
+import time
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from tracker import metrics
+from tracker.caching import CATEGORIES, get_data_version, normalized_params
+from tracker.timeouts import QueryCancelled
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows - coalesce within the process only
+    fcntl = None
+
+COMPUTED = metrics.counter('singleflight.computed')
+COALESCED = metrics.counter('singleflight.coalesced')
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+_calls = {}
+_calls_lock = threading.Lock()
+
+# lock directories that check_lock_dir() has passed
+_checked_dirs = set()
+
+
+def request_key(request, endpoint):
+    # the data versions are part of the key, so a shared result is never stale
+    parts = [
+        request.user.pk,
+        endpoint,
+        normalized_params(request.GET),
+        get_data_version(request.user.pk),
+        get_data_version(CATEGORIES),
+    ]
+    return hashlib.md5(repr(parts).encode()).hexdigest()
+
+
+def coalesce(key, func):
+    """
+    Returns func(), making sure only one computation per key runs at a time
+    on this host. Exceptions raised by the leader are re-raised in followers.
+    """
+    with _calls_lock:
+        call = _calls.get(key)
+        is_leader = call is None
+        if is_leader:
+            call = _calls[key] = _Call()
+
+    if not is_leader:
+        metrics.incr(COALESCED)
+        call.done.wait()
+        if isinstance(call.error, QueryCancelled):
+            # the leader's own request was cancelled - that says nothing about ours
+            return coalesce(key, func)
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    try:
+        call.result = _compute_once_per_host(key, func)
+        return call.result
+    except Exception as error:
+        call.error = error
+        raise
+    finally:
+        with _calls_lock:
+            del _calls[key]
+        call.done.set()
+
+
+def _compute(func):
+    metrics.incr(COMPUTED)
+    return func()
+
+
+def check_lock_dir(lock_dir):
+    """
+    Creates the lock directory, private to this user, or makes sure an
+    existing one is: results are pickled there, and another user able to
+    write to it could plant one. Raises ImproperlyConfigured otherwise.
+    """
+    os.makedirs(lock_dir, mode=0o700, exist_ok=True)
+    info = os.lstat(lock_dir)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.geteuid():
+        raise ImproperlyConfigured(
+            f"SINGLEFLIGHT_LOCK_DIR {lock_dir} must be a directory owned by this user"
+        )
+    if info.st_mode & 0o077:
+        os.chmod(lock_dir, 0o700)
+    _checked_dirs.add(str(lock_dir))
+
+
+def _compute_once_per_host(key, func):
+    lock_dir = settings.SINGLEFLIGHT_LOCK_DIR
+    if fcntl is None or not lock_dir:
+        return _compute(func)
+    if str(lock_dir) not in _checked_dirs:
+        check_lock_dir(lock_dir)
+    _prune_now_and_then(lock_dir)
+
+    paths = {
+        kind: os.path.join(lock_dir, f'{key}.{kind}')
+        for kind in ('lock', 'waiters', 'result')
+    }
+    # the lock files stay between calls - unlinking one that another process
+    # has open would let it lock an orphaned inode - and are pruned by age
+    with open(paths['waiters'], 'a') as waiters, open(paths['lock'], 'a') as lock_file:
+        # in use: keeps prune() away from them
+        os.utime(paths['lock'])
+        os.utime(paths['waiters'])
+        # waiters hold a shared lock on the waiters file while they queue, so
+        # a leader only leaves its result when someone will read it
+        fcntl.flock(waiters, fcntl.LOCK_SH)
+        # blocks while a leader in another process computes the same key
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        fcntl.flock(waiters, fcntl.LOCK_UN)
+        # a result only counts if it was written under this very lock file
+        lock_id = _file_id(lock_file)
+        try:
+            shared = _read_fresh_result(paths['result'], lock_id)
+            if shared is not None:
+                metrics.incr(COALESCED)
+                result = shared[0]
+            else:
+                result = _compute(func)
+            if _others_queued(waiters):
+                if shared is None:
+                    _write_result(paths['result'], lock_id, result)
+            else:
+                _remove(paths['result'])
+            return result
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _file_id(f):
+    info = os.fstat(f.fileno())
+    return info.st_dev, info.st_ino
+
+
+def _others_queued(waiters):
+    try:
+        fcntl.flock(waiters, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return True
+    fcntl.flock(waiters, fcntl.LOCK_UN)
+    return False
+
+
+def _read_fresh_result(path, lock_id):
+    try:
+        if time.time() - os.path.getmtime(path) > settings.SINGLEFLIGHT_RESULT_TTL:
+            return None
+        with open(path, 'rb') as f:
+            written_under, result = pickle.load(f)
+    except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+        return None
+    return (result,) if written_under == lock_id else None
+
+
+def _write_result(path, lock_id, result):
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'wb') as f:
+        pickle.dump((lock_id, result), f)
+    os.replace(tmp_path, path)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+_next_prune = 0
+
+
+def _prune_now_and_then(lock_dir):
+    global _next_prune
+    now = time.time()
+    if now < _next_prune:
+        return
+    _next_prune = now + settings.SINGLEFLIGHT_LOCK_MAX_AGE
+    prune(lock_dir, settings.SINGLEFLIGHT_LOCK_MAX_AGE)
+
+
+def prune(lock_dir, max_age):
+    """
+    Removes the files of keys that haven't been asked for in max_age
+    seconds. A lock file that is held right now is kept, whatever its age.
+    """
+    cutoff = time.time() - max_age
+    for entry in os.scandir(lock_dir):
+        try:
+            if entry.stat().st_mtime >= cutoff:
+                continue
+            if entry.name.endswith('.lock'):
+                with open(entry.path, 'a') as lock_file:
+                    try:
+                        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:
+                        continue
+                    os.remove(entry.path)
+            else:
+                os.remove(entry.path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,382 @@
+"""
+On-disk columnar snapshots of heavy users' transactions. Each snapshot holds
+the columns of a TransactionFrame (and the transaction ids) as .npy files,
+which are opened with numpy.memmap: nothing is copied into the process, and
+every worker on the host shares the same pages through the page cache.
+
+Writes don't rewrite the snapshot. Each save or delete appends a fixed-width
+record to the snapshot's delta segment after its transaction commits, and
+readers apply the delta on top of the base columns. Once the delta has
+settings.SNAPSHOT_DELTA_MAX records, a background thread merges it into a
+new generation of the base columns.
+
+Every record carries the data version its write bumped the user to. A
+snapshot is only used if its base version and the versions in its delta
+account for every version up to the user's current one; a write that went
+around the signals (bulk_create, a rolled-back transaction, an evicted
+version counter) leaves a gap, and the snapshot is then rebuilt from the
+Transaction table in the background while readers use the database.
+
+Layout, per user under settings.SNAPSHOT_DIR:
+
+    <user>/CURRENT          the current generation number
+    <user>/<gen>/*.npy      the base columns, and meta.json with their version
+    <user>/<gen>.delta      records appended since <gen> was written
+    <user>/lock             held to append, and to switch generations
+    <user>/merge.lock       held by a merge or rebuild
+"""
+import json
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+import numpy as np
+from django.conf import settings
+from django.db import connections, transaction
+from tracker import frames
+from tracker.caching import get_data_version
+from tracker.models import Transaction
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows - snapshots are switched off
+    fcntl = None
+
+COLUMNS = ('ids', 'days', 'cents', 'types', 'categories')
+
+DELTA_RECORD = np.dtype([
+    ('version', '<i8'),
+    ('id', '<i8'),
+    ('day', '<i4'),
+    ('cents', '<i8'),
+    ('type', 'i1'),  # DELETED, or one of frames.TYPE_CODES
+    ('category', '<i4'),
+])
+DELETED = -1
+
+# bumped when the columns or DELTA_RECORD change; snapshots written in another
+# format are rebuilt rather than read
+FORMAT = 2
+
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+def enabled():
+    return fcntl is not None and bool(settings.SNAPSHOT_DIR)
+
+
+def _user_dir(user_pk):
+    return os.path.join(settings.SNAPSHOT_DIR, str(user_pk))
+
+
+def _current_generation(user_dir):
+    try:
+        with open(os.path.join(user_dir, 'CURRENT')) as f:
+            return int(f.read())
+    except (OSError, ValueError):
+        return None
+
+
+def has_snapshot(user_pk):
+    return enabled() and _current_generation(_user_dir(user_pk)) is not None
+
+
+@contextmanager
+def _locked(user_dir, name='lock', blocking=True):
+    """Yields whether the lock file was taken (always, when blocking)."""
+    with open(os.path.join(user_dir, name), 'a') as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _read_delta(path):
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        data = b''
+    # a record still being appended by another process is left for next time
+    usable = len(data) - len(data) % DELTA_RECORD.itemsize
+    return np.frombuffer(data[:usable], dtype=DELTA_RECORD)
+
+
+def _read_base(user_dir, generation):
+    base_dir = os.path.join(user_dir, str(generation))
+    columns = {
+        name: np.load(os.path.join(base_dir, f'{name}.npy'), mmap_mode='r')
+        for name in COLUMNS
+    }
+    with open(os.path.join(base_dir, 'meta.json')) as f:
+        meta = json.load(f)
+    # a snapshot in another format counts as missing every write
+    return columns, meta['version'] if meta.get('format') == FORMAT else None
+
+
+def _is_complete(base_version, delta, current_version):
+    if base_version is None:
+        return False
+    # every version after the base's must be in the delta, exactly once.
+    # Versions are seeded from the clock, so the gap to the current one can
+    # be huge - it is checked without an array as long as the gap.
+    newer = np.sort(delta['version'][delta['version'] > base_version])
+    if current_version < base_version or len(newer) != current_version - base_version:
+        return False
+    if not len(newer):
+        return True
+    return newer[0] == base_version + 1 and bool(np.all(np.diff(newer) == 1))
+
+
+def _apply(columns, delta):
+    """Returns the base columns with the delta's records applied, in (date, id) order."""
+    if not len(delta):
+        return columns
+    # the last record for each id wins
+    ids, last = np.unique(delta['id'][::-1], return_index=True)
+    latest = delta[::-1][last]
+    latest = latest[latest['type'] != DELETED]
+
+    keep = ~np.isin(columns['ids'], ids)
+    merged = {
+        name: np.concatenate((columns[name][keep], latest[field]))
+        for name, field in zip(
+            COLUMNS, ('id', 'day', 'cents', 'type', 'category')
+        )
+    }
+    order = np.lexsort((merged['ids'], merged['days']))
+    return {name: merged[name][order] for name in COLUMNS}
+
+
+def _to_frame(columns):
+    return frames.TransactionFrame(
+        columns['days'], columns['cents'], columns['types'], columns['categories']
+    )
+
+
+def _read(user_pk):
+    """
+    Returns (columns, base version, delta) of the user's current snapshot,
+    or None if they have none.
+    """
+    user_dir = _user_dir(user_pk)
+    # a merge may remove the generation we just looked up - look again
+    for _ in range(3):
+        generation = _current_generation(user_dir)
+        if generation is None:
+            return None
+        try:
+            columns, version = _read_base(user_dir, generation)
+        except FileNotFoundError:
+            continue
+        delta = _read_delta(os.path.join(user_dir, f'{generation}.delta'))
+        if _current_generation(user_dir) == generation:
+            return columns, version, delta
+    return None
+
+
+def load_columns(user_pk):
+    """
+    Returns the user's columns (see frames.fetch_columns) from their
+    snapshot, or None if they have no snapshot or it is missing writes - it
+    is then rebuilt in the background. A snapshot without pending writes is
+    used in place.
+    """
+    if not enabled():
+        return None
+    snapshot = _read(user_pk)
+    if snapshot is None:
+        return None
+    columns, base_version, delta = snapshot
+
+    if not _is_complete(base_version, delta, get_data_version(user_pk)):
+        run_in_background(rebuild, user_pk)
+        return None
+    if len(delta) >= settings.SNAPSHOT_DELTA_MAX:
+        run_in_background(merge, user_pk)
+    return _apply(columns, delta)
+
+
+def load_frame(user_pk):
+    """The user's TransactionFrame from their snapshot - see load_columns()."""
+    columns = load_columns(user_pk)
+    return None if columns is None else _to_frame(columns)
+
+
+def _write_generation(user_dir, generation, columns, version):
+    base_dir = os.path.join(user_dir, str(generation))
+    tmp_dir = f'{base_dir}.{os.getpid()}.{threading.get_ident()}.tmp'
+    # left behind by a merge that didn't finish - nothing reads it
+    shutil.rmtree(base_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    for name in COLUMNS:
+        np.save(os.path.join(tmp_dir, f'{name}.npy'), np.ascontiguousarray(columns[name]))
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+        json.dump({'version': int(version), 'format': FORMAT}, f)
+    os.replace(tmp_dir, base_dir)
+
+
+def _switch_generation(user_dir, new, delta_tail):
+    """Makes `new` current, carrying over the records appended since the merge started."""
+    with open(os.path.join(user_dir, f'{new}.delta'), 'wb') as f:
+        f.write(delta_tail.tobytes())
+    tmp_path = os.path.join(user_dir, f'CURRENT.{os.getpid()}.tmp')
+    with open(tmp_path, 'w') as f:
+        f.write(str(new))
+    os.replace(tmp_path, os.path.join(user_dir, 'CURRENT'))
+
+
+def _remove_generation(user_dir, generation):
+    # readers that have the old files mapped keep them until they're done
+    shutil.rmtree(os.path.join(user_dir, str(generation)), ignore_errors=True)
+    try:
+        os.remove(os.path.join(user_dir, f'{generation}.delta'))
+    except FileNotFoundError:
+        pass
+
+
+def _columns_from_db(user_pk):
+    return frames.fetch_columns(Transaction.objects.filter(user_id=user_pk))
+
+
+def rebuild(user_pk):
+    """
+    Writes a new snapshot of the user's transactions from the database.
+    Writers append to the delta under the lock it holds while it reads, so
+    every write that commits after the read - including one that was open
+    during it, whose version may be below the snapshot's - lands in the new
+    delta, which is applied whatever its versions.
+    """
+    if not enabled():
+        return
+    user_dir = _user_dir(user_pk)
+    os.makedirs(user_dir, exist_ok=True)
+    with _locked(user_dir, 'merge.lock'):
+        with _locked(user_dir):
+            old = _current_generation(user_dir)
+            new = (old or 0) + 1
+            version = get_data_version(user_pk)
+            _write_generation(user_dir, new, _columns_from_db(user_pk), version)
+            _switch_generation(user_dir, new, np.empty(0, dtype=DELTA_RECORD))
+        if old is not None:
+            _remove_generation(user_dir, old)
+
+
+def merge(user_pk):
+    """
+    Folds the delta segment into a new generation of the base columns.
+    Writers only wait while the generations are switched. A snapshot that is
+    missing writes is rebuilt instead.
+    """
+    if not enabled():
+        return
+    user_dir = _user_dir(user_pk)
+    with _locked(user_dir, 'merge.lock', blocking=False) as taken:
+        if not taken:
+            return  # already being merged or rebuilt
+        # nothing else switches generations while merge.lock is held
+        old = _current_generation(user_dir)
+        snapshot = _read(user_pk)
+        if snapshot is None:
+            return
+        columns, base_version, delta = snapshot
+        version = int(delta['version'].max(initial=base_version or 0))
+        complete = _is_complete(base_version, delta, version)
+        if complete:
+            _write_generation(user_dir, old + 1, _apply(columns, delta), version)
+            with _locked(user_dir):
+                tail = _read_delta(os.path.join(user_dir, f'{old}.delta'))[len(delta):]
+                _switch_generation(user_dir, old + 1, tail)
+            _remove_generation(user_dir, old)
+    # outside merge.lock, which rebuild() takes too
+    if not complete:
+        rebuild(user_pk)
+
+
+def _append(user_pk, record):
+    user_dir = _user_dir(user_pk)
+    if not os.path.isdir(user_dir):
+        return
+    with _locked(user_dir):
+        # read under the lock: a merge or rebuild may have just switched generations
+        generation = _current_generation(user_dir)
+        if generation is None:
+            return
+        with open(os.path.join(user_dir, f'{generation}.delta'), 'ab') as f:
+            f.write(record.tobytes())
+
+
+def record_write(instance, version, deleted=False):
+    """
+    Appends a saved or deleted transaction to its user's snapshot, once the
+    write commits. Whether the user has a snapshot is decided then, under
+    the snapshot's lock: a snapshot built while the write was open read the
+    table without its row, and gets the record.
+    """
+    if not enabled():
+        return
+    record = np.zeros(1, dtype=DELTA_RECORD)
+    record['version'] = version
+    record['id'] = instance.pk
+    if deleted:
+        record['type'] = DELETED
+    else:
+        # a date assigned as a string is only converted when the row is read back
+        record['day'] = frames.to_day(Transaction._meta.get_field('date').to_python(instance.date))
+        record['cents'] = Transaction._meta.get_field('amount').get_prep_value(instance.amount)
+        record['type'] = frames.TYPE_CODES[instance.type]
+        record['category'] = instance.category_id
+    transaction.on_commit(lambda: _append(instance.user_id, record))
+
+
+def run_in_background(task, user_pk):
+    """Runs task(user_pk) in a thread, unless it is already pending in this process."""
+    key = (task, user_pk)
+    with _pending_lock:
+        if key in _pending:
+            return
+        _pending.add(key)
+
+    def run():
+        try:
+            task(user_pk)
+        finally:
+            with _pending_lock:
+                _pending.discard(key)
+            connections.close_all()
+
+    threading.Thread(target=run, daemon=True).start()
+
+
+def verify(user_pk):
+    """
+    Compares the user's snapshot with the Transaction table. Returns a list
+    of problems, empty if the snapshot matches.
+    """
+    snapshot = _read(user_pk)
+    if snapshot is None:
+        return ['no snapshot']
+    columns, base_version, delta = snapshot
+    if base_version is None:
+        return ['written in an older format']
+    problems = []
+    if not _is_complete(base_version, delta, get_data_version(user_pk)):
+        problems.append('missing writes since it was built')
+    columns = _apply(columns, delta)
+    expected = _columns_from_db(user_pk)
+    if len(columns['ids']) != len(expected['ids']):
+        problems.append(
+            f"{len(columns['ids'])} transactions, the database has {len(expected['ids'])}"
+        )
+    else:
+        for name in COLUMNS:
+            differing = np.count_nonzero(columns[name] != expected[name])
+            if differing:
+                problems.append(f"{name} differs in {differing} transactions")
+    return problems
@@ -0,0 +1,253 @@
+"""
+A cache backend on a local SQLite file in WAL mode, shared by every worker
+process on the host - unlike LocMemCache, which each process keeps to itself.
+
+    CACHES = {
+        "default": {
+            "BACKEND": "tracker.sqlite_cache.SQLiteCache",
+            "LOCATION": "/path/to/cache.sqlite3",
+            "OPTIONS": {"MAX_ENTRIES": 100_000, "MAX_SIZE": 256 * 1024 * 1024},
+        }
+    }
+
+Integers that fit in 64 bits are stored natively so that incr() is a single
+atomic UPDATE, which the per-user data version counters rely on. Other
+values, larger integers included, are pickled. When
+the cache grows past MAX_ENTRIES (or MAX_SIZE bytes), the least recently read
+1/CULL_FREQUENCY of the entries are evicted.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+# reads only refresh an entry's LRU timestamp once it is this many seconds old,
+# so a hot key doesn't turn every read into a write
+ACCESS_RESOLUTION = 10
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS cache (
+        key TEXT PRIMARY KEY,
+        value BLOB NOT NULL,
+        expires REAL,
+        accessed REAL NOT NULL,
+        size INTEGER NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed);
+"""
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = str(location)
+        self._max_size = options.get('MAX_SIZE')
+        # how many writes a connection makes between checks of the cache size
+        self._cull_check_interval = max(1, min(100, self._max_entries // 100))
+        self._local = threading.local()
+
+    def _connection(self):
+        local = self._local
+        # connections can't be shared with a child process after a fork
+        if getattr(local, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(self._path, timeout=30, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.executescript(SCHEMA)
+            local.connection, local.pid, local.writes = connection, os.getpid(), 0
+        return local.connection
+
+    @staticmethod
+    def _encode(value):
+        # SQLite integers are 64-bit; a larger int would raise OverflowError
+        if type(value) is int and -2**63 <= value < 2**63:
+            return value
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _decode(value):
+        return value if isinstance(value, int) else pickle.loads(value)
+
+    @staticmethod
+    def _size(encoded):
+        return len(encoded) if isinstance(encoded, bytes) else 8
+
+    def _write(self, sql, rows):
+        connection = self._connection()
+        # one transaction per call, however many rows it writes
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            cursor = connection.executemany(sql, rows)
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+        self._local.writes += 1
+        if self._local.writes % self._cull_check_interval == 0:
+            self._cull(connection)
+        return cursor.rowcount
+
+    def _rows(self, items, timeout):
+        now, expires = time.time(), self.get_backend_timeout(timeout)
+        for key, value in items:
+            value = self._encode(value)
+            yield key, value, expires, now, self._size(value)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        # only overwrites an existing entry if it has expired
+        return bool(self._write(
+            """
+            INSERT INTO cache (key, value, expires, accessed, size) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (key) DO UPDATE SET
+                value = excluded.value, expires = excluded.expires,
+                accessed = excluded.accessed, size = excluded.size
+            WHERE cache.expires IS NOT NULL AND cache.expires <= excluded.accessed
+            """,
+            self._rows([(key, value)], timeout),
+        ))
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self._set_many({key: value}, timeout)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        self._set_many(
+            {self.make_and_validate_key(key, version=version): value
+             for key, value in data.items()},
+            timeout,
+        )
+        return []
+
+    def _set_many(self, data, timeout):
+        if data:
+            self._write(
+                "REPLACE INTO cache (key, value, expires, accessed, size) VALUES (?, ?, ?, ?, ?)",
+                self._rows(data.items(), timeout),
+            )
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._get_many([key]).get(key, default)
+
+    def get_many(self, keys, version=None):
+        made_keys = {self.make_and_validate_key(key, version=version): key for key in keys}
+        values = self._get_many(list(made_keys))
+        return {made_keys[key]: value for key, value in values.items()}
+
+    def _get_many(self, keys):
+        if not keys:
+            return {}
+        connection = self._connection()
+        now = time.time()
+        placeholders = ', '.join('?' * len(keys))
+        rows = connection.execute(
+            f"SELECT key, value, accessed FROM cache WHERE key IN ({placeholders}) "
+            "AND (expires IS NULL OR expires > ?)",
+            [*keys, now],
+        ).fetchall()
+
+        stale = [key for key, _, accessed in rows if accessed < now - ACCESS_RESOLUTION]
+        if stale:
+            connection.execute(
+                f"UPDATE cache SET accessed = ? WHERE key IN ({', '.join('?' * len(stale))})",
+                [now, *stale],
+            )
+        return {key: self._decode(value) for key, value, _ in rows}
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return bool(self._connection().execute(
+            "UPDATE cache SET expires = ? WHERE key = ? AND (expires IS NULL OR expires > ?)",
+            [self.get_backend_timeout(timeout), key, time.time()],
+        ).rowcount)
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        if -2**63 <= delta < 2**63:
+            row = self._connection().execute(
+                """
+                UPDATE cache SET value = value + ?
+                WHERE key = ? AND typeof(value) = 'integer' AND typeof(value + ?) = 'integer'
+                    AND (expires IS NULL OR expires > ?)
+                RETURNING value
+                """,
+                [delta, key, delta, time.time()],
+            ).fetchone()
+            if row is not None:
+                return row[0]
+        # missing, pickled, or about to outgrow 64 bits (SQLite would turn the
+        # sum into a float)
+        return self._incr_decoded(key, delta)
+
+    def _incr_decoded(self, key, delta):
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute(
+                "SELECT value FROM cache WHERE key = ? AND (expires IS NULL OR expires > ?)",
+                [key, time.time()],
+            ).fetchone()
+            if row is None:
+                raise ValueError("Key '%s' not found" % key)
+            value = self._decode(row[0]) + delta
+            encoded = self._encode(value)
+            connection.execute(
+                "UPDATE cache SET value = ?, size = ? WHERE key = ?",
+                [encoded, self._size(encoded), key],
+            )
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        return value
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return bool(self._connection().execute(
+            "DELETE FROM cache WHERE key = ?", [key]
+        ).rowcount)
+
+    def delete_many(self, keys, version=None):
+        keys = [self.make_and_validate_key(key, version=version) for key in keys]
+        if keys:
+            self._connection().execute(
+                f"DELETE FROM cache WHERE key IN ({', '.join('?' * len(keys))})", keys
+            )
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._connection().execute(
+            "SELECT 1 FROM cache WHERE key = ? AND (expires IS NULL OR expires > ?)",
+            [key, time.time()],
+        ).fetchone() is not None
+
+    def clear(self):
+        self._connection().execute("DELETE FROM cache")
+
+    def _cull(self, connection):
+        connection.execute("DELETE FROM cache WHERE expires <= ?", [time.time()])
+        count, size = connection.execute(
+            "SELECT count(*), coalesce(sum(size), 0) FROM cache"
+        ).fetchone()
+
+        over_entries = count > self._max_entries
+        over_size = self._max_size is not None and size > self._max_size
+        if not (over_entries or over_size):
+            return
+        if self._cull_frequency == 0:
+            return self.clear()
+
+        connection.execute(
+            "DELETE FROM cache WHERE key IN "
+            "(SELECT key FROM cache ORDER BY accessed LIMIT ?)",
+            [max(1, count // self._cull_frequency)],
+        )
+
+    def close(self, **kwargs):
+        # connections are kept per thread for the life of the process
+        pass
@@ -1,7 +1,22 @@
 import pytest 
+from django.core.cache import cache
 from tracker.factories import TransactionFactory, UserFactory
 
 
+@pytest.fixture(autouse=True)
+def clear_cache(settings, tmp_path_factory):
+    # keep the tests away from the development cache file, snapshots and
+    # the singleflight lock directory
+    settings.CACHES = {
+        'default': {
+            **settings.CACHES['default'],
+            'LOCATION': tmp_path_factory.getbasetemp() / 'cache.sqlite3',
+        }
+    }
+    settings.SNAPSHOT_DIR = tmp_path_factory.mktemp('snapshots')
+    settings.SINGLEFLIGHT_LOCK_DIR = tmp_path_factory.mktemp('singleflight')
+    cache.clear()
+
 @pytest.fixture
 def transactions():
     return TransactionFactory.create_batch(20)
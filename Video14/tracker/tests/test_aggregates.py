@@ -0,0 +1,76 @@
+import statistics
+from decimal import Decimal
+import pytest
+from django.db.models import F, Q, RowRange, Window
+from tracker.aggregates import Median, Percentile, StdDev
+from tracker.factories import TransactionFactory
+from tracker.models import Transaction
+
+
+def _cents(amounts):
+    return [int(amount * 100) for amount in amounts]
+
+
+@pytest.mark.django_db
+def test_category_stats_match_python(user_transactions, django_assert_num_queries):
+    with django_assert_num_queries(1):
+        stats = list(Transaction.objects.category_stats())
+
+    for row in stats:
+        amounts = _cents(
+            Transaction.objects.filter(category=row['category'], type=row['type'])
+            .values_list('amount', flat=True)
+        )
+        assert row['count'] == len(amounts)
+        assert row['total'] == Decimal(sum(amounts)).scaleb(-2)
+        assert row['median'] == Decimal(round(statistics.median(amounts))).scaleb(-2)
+        if len(amounts) > 1:
+            stddev = statistics.stdev(amounts)
+            assert row['stddev'] == Decimal(round(stddev)).scaleb(-2)
+        else:
+            assert row['stddev'] is None
+
+
+@pytest.mark.django_db
+def test_percentile_interpolates_and_honours_filters(user):
+    for amount in (10, 20, 30, 40):
+        TransactionFactory(user=user, type='expense', amount=amount)
+    TransactionFactory(user=user, type='income', amount=1000)
+
+    result = Transaction.objects.aggregate(
+        p90=Percentile('amount', 0.9, filter=Q(type='expense')),
+        median=Median('amount', filter=Q(type='expense')),
+        everything=Median('amount'),
+        spread=StdDev('amount', filter=Q(type='income')),
+    )
+
+    assert result == {
+        'p90': Decimal('37.00'),
+        'median': Decimal('25.00'),
+        'everything': Decimal('30.00'),
+        'spread': None,
+    }
+
+
+def test_percentile_fraction_is_checked():
+    with pytest.raises(ValueError):
+        Percentile('amount', 1.5)
+
+
+@pytest.mark.django_db
+def test_aggregates_work_as_sliding_window_functions(user_transactions):
+    order = [F('date'), F('id')]
+    last_three = RowRange(start=-2, end=0)
+    rows = list(
+        Transaction.objects.annotate(
+            median=Window(Median('amount'), order_by=order, frame=last_three),
+            stddev=Window(StdDev('amount'), order_by=order, frame=last_three),
+        ).order_by('date', 'id')
+    )
+
+    amounts = _cents(row.amount for row in rows)
+    for i, row in enumerate(rows):
+        window = amounts[max(i - 2, 0):i + 1]
+        assert row.median == Decimal(round(statistics.median(window))).scaleb(-2)
+        if len(window) > 1:
+            assert row.stddev == Decimal(round(statistics.stdev(window))).scaleb(-2)
@@ -0,0 +1,151 @@
+import datetime
+import numpy as np
+import pytest
+from django.urls import reverse
+from tracker import anomalies
+from tracker.caching import anomalies_owner, get_data_version
+from tracker.factories import CategoryFactory, TransactionFactory
+from tracker.fields import from_cents
+from tracker.frames import EXPENSE, INCOME
+from tracker.models import Anomaly, Transaction
+
+START = datetime.date(2024, 1, 1)
+
+
+def _columns(cents, categories, days=None, types=None):
+    cents = np.array(cents, dtype=np.int64)
+    return {
+        'ids': np.arange(1, len(cents) + 1, dtype=np.int64),
+        'days': np.array(days if days is not None else range(len(cents)), dtype=np.int32),
+        'cents': cents,
+        'types': np.array(types if types is not None else [EXPENSE] * len(cents), dtype=np.int8),
+        'categories': np.array(categories, dtype=np.int16),
+    }
+
+
+def _usual(n, seed=0):
+    return np.random.default_rng(seed).integers(900, 1100, n)
+
+
+def test_robust_z_ignores_windows_without_spread():
+    windows = np.array([[1.0, 2.0, 3.0, 4.0, 5.0], [2.0, 2.0, 2.0, 2.0, 2.0]])
+    scores = anomalies.robust_z(np.array([3 + 1.4826 * 2, 100.0]), windows)
+    assert scores.tolist() == pytest.approx([2.0, 0.0])
+
+
+def test_amount_anomalies_are_scored_within_the_category():
+    cents = [*_usual(40), 50_000, *_usual(10, seed=1)]
+    # the second category only starts with the outlier: too little history
+    columns = _columns(cents, [1] * 40 + [2] * 11)
+
+    assert anomalies.amount_anomalies(columns, window=10, threshold=3.5) == []
+
+    columns = _columns(cents, [1] * 51)
+    flagged = anomalies.amount_anomalies(columns, window=10, threshold=3.5)
+    assert [(pk, day) for pk, day, _ in flagged] == [(41, 40)]
+    assert flagged[0][2] > 10
+
+
+def test_income_is_never_flagged():
+    cents = [*_usual(40), 50_000]
+    columns = _columns(cents, [1] * 41, types=[EXPENSE] * 40 + [INCOME])
+    assert anomalies.amount_anomalies(columns, window=10, threshold=3.5) == []
+
+
+def test_daily_anomalies_count_days_without_expenses():
+    # an expense every day, then a gap, then a day of many expenses
+    days = [*range(30), 35, 35, 35, 35, 35]
+    cents = [*_usual(30), 1000, 1000, 1000, 1000, 1000]
+    columns = _columns(cents, [1] * 35, days=days)
+
+    flagged = anomalies.daily_anomalies(columns, window=28, threshold=3.5)
+
+    assert [day for day, _ in flagged] == [35]
+
+
+@pytest.mark.django_db
+def test_detect_flags_touches_rows_and_bumps_the_version(
+    user, settings, django_capture_on_commit_callbacks
+):
+    settings.ANOMALY_WINDOW = 10
+    food = CategoryFactory(name='Food')
+    for i, amount in enumerate(_usual(40)):
+        TransactionFactory(user=user, category=food, type='expense', amount=from_cents(amount),
+                           date=START + datetime.timedelta(days=i))
+    outlier = TransactionFactory(user=user, category=food, type='expense', amount=500,
+                                 date=START + datetime.timedelta(days=40))
+    version = get_data_version(anomalies_owner(user.pk))
+    touched = outlier.updated_at
+
+    with django_capture_on_commit_callbacks(execute=True):
+        assert anomalies.detect([user.pk], workers=1)[user.pk] >= 1
+        # nothing changed since: skipped, and a full rescan changes nothing
+        assert anomalies.detect([user.pk], workers=1, changed_only=True) == {}
+        assert anomalies.detect([user.pk], workers=1) == {user.pk: 0}
+
+    flag = Anomaly.objects.get(kind=Anomaly.AMOUNT)
+    assert flag.transaction == outlier
+    assert flag.date == outlier.date
+    assert Transaction.objects.get(pk=outlier.pk).updated_at > touched
+    assert get_data_version(anomalies_owner(user.pk)) > version
+
+
+@pytest.mark.django_db
+def test_flags_go_away_when_the_expense_is_fixed(user):
+    found = {(Anomaly.AMOUNT, TransactionFactory(user=user, type='expense').pk, START): 5.0}
+    assert anomalies.save_anomalies(user.pk, found) == 1
+    assert anomalies.save_anomalies(user.pk, {}) == 1
+    assert not Anomaly.objects.exists()
+
+
+@pytest.mark.django_db
+def test_expense_deleted_since_the_scan_is_not_flagged(user):
+    kept, deleted = TransactionFactory.create_batch(2, user=user, type='expense')
+    found = {
+        (Anomaly.AMOUNT, kept.pk, kept.date): 5.0,
+        (Anomaly.AMOUNT, deleted.pk, deleted.date): 5.0,
+    }
+    deleted.delete()
+
+    assert anomalies.save_anomalies(user.pk, found) == 1
+    assert list(Anomaly.objects.values_list('transaction', flat=True)) == [kept.pk]
+
+@pytest.mark.django_db
+def test_chunks_are_scanned_on_the_pool(user, monkeypatch):
+    class InlinePool:
+        # the test database isn't visible from other processes
+        def __init__(self, workers, initializer):
+            self.workers = workers
+
+        def map(self, func, chunks):
+            scanned.append(len(chunks))
+            return map(func, chunks)
+
+        def shutdown(self):
+            pass
+
+    scanned = []
+    monkeypatch.setattr(anomalies, 'ProcessPoolExecutor', InlinePool)
+    other = TransactionFactory().user
+
+    changes = anomalies.detect([user.pk, other.pk], workers=2, chunk_size=1)
+
+    assert scanned == [2]
+    assert changes == {user.pk: 0, other.pk: 0}
+
+
+@pytest.mark.django_db
+def test_flagged_rows_get_a_badge(user, client):
+    TransactionFactory(user=user, type='expense', date=START)
+    amount = TransactionFactory(user=user, type='expense', date=START + datetime.timedelta(days=1))
+    TransactionFactory(user=user, type='income', date=START)
+    anomalies.save_anomalies(user.pk, {
+        (Anomaly.DAILY, None, START): 4.0,
+        (Anomaly.AMOUNT, amount.pk, amount.date): 6.0,
+    })
+    client.force_login(user)
+
+    content = client.get(reverse('transactions-list')).content.decode()
+
+    assert content.count('Unusual day') == 1
+    assert content.count('Unusual amount') == 1
@@ -0,0 +1,80 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from asgiref.sync import async_to_sync
+from django.db import connection
+from django.test import AsyncRequestFactory
+from django_htmx.middleware import HtmxDetails
+from tracker.concurrency import _in_own_connection, gather_queries
+from tracker.views import transaction_charts_async, transactions_list_async
+
+
+def make_request(user, path='/', **headers):
+    request = AsyncRequestFactory().get(path, headers=headers)
+    request.user = user
+    request.htmx = HtmxDetails(request)
+    return request
+
+
+def test_gather_queries_runs_callables_concurrently():
+    def slow(value):
+        time.sleep(0.2)
+        return value
+
+    start = time.perf_counter()
+    results = async_to_sync(gather_queries)(
+        lambda: slow(1), lambda: slow(2), lambda: slow(3)
+    )
+
+    assert results == [1, 2, 3]
+    assert time.perf_counter() - start < 0.5
+
+
+@pytest.mark.django_db(transaction=True)
+def test_worker_threads_reuse_their_connections():
+    def current():
+        connection.ensure_connection()
+        return connection.connection
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        first = pool.submit(_in_own_connection(current)).result()
+        second = pool.submit(_in_own_connection(current)).result()
+
+    assert first is second
+
+
+@pytest.mark.django_db(transaction=True)
+def test_async_transactions_list_shows_totals(user_transactions):
+    user = user_transactions[0].user
+    income_total = sum(t.amount for t in user_transactions if t.type == 'income')
+
+    response = async_to_sync(transactions_list_async)(make_request(user))
+
+    assert response.status_code == 200
+    assert f'${income_total:,.2f}' in response.content.decode()
+    assert 'ETag' in response.headers
+
+
+@pytest.mark.django_db(transaction=True)
+def test_async_transactions_list_returns_304(user_transactions):
+    user = user_transactions[0].user
+    request = make_request(user, **{'HX-Request': 'true'})
+    etag = async_to_sync(transactions_list_async)(request).headers['ETag']
+
+    request = make_request(user, **{'HX-Request': 'true', 'If-None-Match': etag})
+    response = async_to_sync(transactions_list_async)(request)
+
+    assert response.status_code == 304
+
+
+@pytest.mark.django_db(transaction=True)
+def test_async_charts_render_partial_for_htmx(user_transactions):
+    user = user_transactions[0].user
+
+    response = async_to_sync(transaction_charts_async)(
+        make_request(user, **{'HX-Request': 'true'})
+    )
+
+    content = response.content.decode()
+    assert 'id="charts-container"' in content
+    assert 'Transactions Charts' not in content
@@ -0,0 +1,100 @@
+import datetime
+import numpy as np
+import pytest
+from django.db import connection
+from django.db.models.functions import Trunc
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from tracker.bucketing import (
+    GRANULARITIES,
+    DateBucket,
+    bucket_count,
+    choose_granularity,
+    lttb,
+    truncate_days,
+)
+from tracker.factories import TransactionFactory
+from tracker.frames import get_frame, to_date
+from tracker.models import Transaction
+
+DATES = [
+    datetime.date(2020, 1, 1),
+    datetime.date(2020, 2, 29),
+    datetime.date(2020, 3, 31),
+    datetime.date(2021, 1, 3),  # a Sunday
+    datetime.date(2021, 1, 4),  # a Monday
+    datetime.date(2023, 12, 31),
+]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('kind', GRANULARITIES)
+def test_date_bucket_matches_trunc_in_sql_and_numpy(kind, user):
+    for date in DATES:
+        TransactionFactory(user=user, date=date)
+    transactions = Transaction.objects.filter(user=user).order_by('date')
+
+    with CaptureQueriesContext(connection) as queries:
+        buckets = list(transactions.values_list(DateBucket('date', kind), flat=True))
+    assert 'django_date_trunc' not in queries[0]['sql']
+
+    assert buckets == list(transactions.values_list(Trunc('date', kind), flat=True))
+    days = truncate_days(get_frame(user.pk).days, kind)
+    assert [to_date(day) for day in days] == buckets
+
+
+def test_granularity_is_the_finest_within_the_budget():
+    start = datetime.date(2020, 1, 1)
+
+    assert choose_granularity(start, datetime.date(2020, 3, 1), max_points=100) == 'day'
+    assert choose_granularity(start, datetime.date(2021, 1, 1), max_points=100) == 'week'
+    assert choose_granularity(start, datetime.date(2025, 1, 1), max_points=100) == 'month'
+    assert choose_granularity(start, datetime.date(2040, 1, 1), max_points=100) == 'quarter'
+    # too long even by quarter: the coarsest there is
+    assert choose_granularity(start, datetime.date(2040, 1, 1), max_points=10) == 'quarter'
+
+
+def test_bucket_counts_include_partial_buckets():
+    # a Sunday to the next Monday touches two weeks
+    assert bucket_count(datetime.date(2021, 1, 3), datetime.date(2021, 1, 4), 'week') == 2
+    assert bucket_count(datetime.date(2020, 3, 31), datetime.date(2020, 4, 1), 'month') == 2
+    assert bucket_count(datetime.date(2020, 3, 31), datetime.date(2020, 4, 1), 'quarter') == 2
+    assert bucket_count(datetime.date(2020, 1, 1), datetime.date(2020, 12, 31), 'quarter') == 4
+
+
+def test_lttb_keeps_the_ends_and_the_spikes():
+    x = np.arange(1000)
+    y = np.sin(x / 50)
+    y[500] = 10
+
+    keep = lttb(x, y, 50)
+
+    assert len(keep) == 50
+    assert keep[0] == 0 and keep[-1] == 999
+    assert 500 in keep
+    assert np.all(np.diff(keep) > 0)
+    assert lttb(x[:20], y[:20], 50).tolist() == list(range(20))
+
+
+def test_lttb_stays_within_budgets_too_small_for_a_bucket():
+    x = np.arange(100)
+    y = np.cos(x)
+
+    assert lttb(x, y, 2).tolist() == [0, 99]
+    assert lttb(x, y, 1).tolist() == [0]
+    with pytest.raises(ValueError):
+        lttb(x, y, 0)
+
+
+@pytest.mark.django_db
+def test_running_balance_chart_stays_within_the_budget(user, client, settings):
+    settings.CHART_MAX_POINTS = 10
+    settings.CHART_OVERSAMPLE = 2
+    for day in range(0, 365 * 3, 5):
+        TransactionFactory(user=user, date=datetime.date(2020, 1, 1) + datetime.timedelta(days=day))
+    client.force_login(user)
+
+    response = client.get(reverse('transactions-charts'))
+
+    # three years don't fit 20 months, so it's drawn by quarter, in 10 points
+    assert 'Running Balance (by quarter)' in response.content.decode()
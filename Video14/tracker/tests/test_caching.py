@@ -0,0 +1,186 @@
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from tracker.caching import (
+    apply_totals_delta,
+    bump_data_version,
+    cached_totals,
+    get_totals,
+    render_transaction_rows,
+    row_cache_key,
+    totals_cache_key,
+)
+from tracker.factories import TransactionFactory
+from tracker.filters import TransactionFilter
+from tracker.models import Transaction
+
+
+@pytest.mark.django_db
+def test_rows_are_cached_after_first_render(user_transactions):
+    transactions = Transaction.objects.select_related('category')[:5]
+    render_transaction_rows(transactions)
+
+    keys = [row_cache_key(t) for t in transactions]
+    assert len(cache.get_many(keys)) == 5
+
+
+@pytest.mark.django_db
+def test_cached_rows_do_not_query_the_category(user_transactions, django_assert_num_queries):
+    rendered = render_transaction_rows(Transaction.objects.select_related('category')[:5])
+    transactions = list(Transaction.objects.filter(pk__in=[t.pk for t, _ in rendered]))
+
+    # every row is now a cache hit, so rendering never touches transaction.category
+    with django_assert_num_queries(0):
+        render_transaction_rows(transactions)
+
+
+@pytest.mark.django_db
+def test_updated_transaction_is_not_served_stale(user, transaction_dict_params, client):
+    client.force_login(user)
+    transaction = Transaction.objects.get(user=user)
+    client.get(reverse('transactions-list'))
+
+    transaction_dict_params['amount'] = 1234
+    client.post(
+        reverse('update-transaction', kwargs={'pk': transaction.pk}),
+        transaction_dict_params
+    )
+
+    response = client.get(reverse('transactions-list'))
+    assert '1234.00' in response.content.decode()
+
+
+@pytest.mark.django_db
+def test_deleted_transaction_row_is_evicted(user, transaction_dict_params, client):
+    client.force_login(user)
+    transaction = Transaction.objects.get(user=user)
+    client.get(reverse('transactions-list'))
+    assert cache.get(row_cache_key(transaction)) is not None
+
+    client.delete(reverse('delete-transaction', kwargs={'pk': transaction.pk}))
+    assert cache.get(row_cache_key(transaction)) is None
+
+
+@pytest.mark.django_db
+def test_renaming_category_invalidates_rows(user, transaction_dict_params, client):
+    client.force_login(user)
+    transaction = Transaction.objects.get(user=user)
+    client.get(reverse('transactions-list'))
+
+    category = transaction.category
+    category.name = 'Renamed'
+    category.save()
+
+    response = client.get(reverse('transactions-list'))
+    assert 'Renamed' in response.content.decode()
+
+
+@pytest.mark.django_db
+def test_unchanged_list_returns_304_without_querying_transactions(user_transactions, client):
+    client.force_login(user_transactions[0].user)
+    url = reverse('transactions-list')
+    params = {'transaction_type': 'income'}
+
+    response = client.get(url, params)
+    etag = response.headers['ETag']
+    assert 'HX-Request' in response.headers['Vary']
+
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+
+    assert response.status_code == 304
+    assert not any('tracker_transaction' in q['sql'] for q in queries.captured_queries)
+
+
+@pytest.mark.django_db
+def test_etag_ignores_param_order_and_empty_values(user_transactions, client):
+    client.force_login(user_transactions[0].user)
+    url = reverse('get-transactions')
+
+    first = client.get(f'{url}?category=2&category=1&start_date=')
+    second = client.get(f'{url}?category=1&category=2')
+
+    assert first.headers['ETag'] == second.headers['ETag']
+
+
+@pytest.mark.django_db
+def test_etag_differs_for_htmx_requests(user_transactions, client):
+    client.force_login(user_transactions[0].user)
+    url = reverse('transactions-charts')
+
+    full_page = client.get(url)
+    partial = client.get(url, HTTP_HX_REQUEST='true')
+
+    assert full_page.headers['ETag'] != partial.headers['ETag']
+
+
+@pytest.mark.django_db
+def test_write_changes_etag(user, transaction_dict_params, client):
+    client.force_login(user)
+    url = reverse('transactions-list')
+    etag = client.get(url).headers['ETag']
+
+    client.post(reverse('create-transaction'), transaction_dict_params)
+
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+@pytest.mark.django_db
+def test_totals_delta_needs_the_version_it_was_cached_at(user_transactions):
+    user = user_transactions[0].user
+    transaction_filter = TransactionFilter({}, queryset=Transaction.objects.filter(user=user))
+    income, expenses = get_totals(user.pk, transaction_filter)
+    before = cached_totals(user.pk, transaction_filter)
+
+    # one write since the totals were cached - the delta applies
+    bump_data_version(user.pk)
+    assert apply_totals_delta(user.pk, transaction_filter, before, added=('income', 10)) == (
+        income + 10, expenses
+    )
+
+    # two writes - the second one isn't in the cached totals, so don't guess
+    before = cached_totals(user.pk, transaction_filter)
+    bump_data_version(user.pk)
+    bump_data_version(user.pk)
+    assert apply_totals_delta(user.pk, transaction_filter, before, added=('income', 10)) is None
+
+
+@pytest.mark.django_db
+def test_totals_cached_between_a_write_and_its_bump_are_not_counted_twice(user_transactions):
+    user = user_transactions[0].user
+    transaction_filter = TransactionFilter({}, queryset=Transaction.objects.filter(user=user))
+    income, expenses = get_totals(user.pk, transaction_filter)
+    before = cached_totals(user.pk, transaction_filter)
+
+    # the row is committed, and a list render aggregates it before the
+    # write's version bump runs
+    written = TransactionFactory.build(user=user, type='income', category=user_transactions[0].category)
+    Transaction.objects.bulk_create([written])
+    cache.delete(totals_cache_key(user.pk, transaction_filter))
+    assert get_totals(user.pk, transaction_filter) == (income + written.amount, expenses)
+    bump_data_version(user.pk)
+
+    assert apply_totals_delta(
+        user.pk, transaction_filter, before, added=('income', written.amount)
+    ) == (income + written.amount, expenses)
+    assert get_totals(user.pk, transaction_filter) == (income + written.amount, expenses)
+
+
+@pytest.mark.django_db
+def test_totals_are_not_cached_when_a_write_lands_during_the_aggregate(user_transactions, monkeypatch):
+    user = user_transactions[0].user
+    transaction_filter = TransactionFilter({}, queryset=Transaction.objects.filter(user=user))
+    aggregate = Transaction.objects.none().get_totals.__func__
+
+    def racing(qs):
+        bump_data_version(user.pk)
+        return aggregate(qs)
+
+    monkeypatch.setattr(type(Transaction.objects.none()), 'get_totals', racing)
+    get_totals(user.pk, transaction_filter)
+
+    assert cache.get(totals_cache_key(user.pk, transaction_filter)) is None
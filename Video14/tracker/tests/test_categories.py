@@ -0,0 +1,89 @@
+import pytest
+from tracker import categories as category_cache
+from tracker.categories import get_categories
+from tracker.factories import CategoryFactory
+from tracker.filters import TransactionFilter
+from tracker.forms import TransactionForm
+from tracker.models import Category, Transaction
+from tracker.resources import CategoryWidget
+
+
+@pytest.fixture
+def categories():
+    return CategoryFactory.create_batch(3)
+
+
+@pytest.mark.django_db
+def test_filter_form_renders_and_validates_without_queries(
+    categories, django_assert_num_queries
+):
+    get_categories()  # warm the cache
+    pks = [str(category.pk) for category in categories[:2]]
+
+    with django_assert_num_queries(0):
+        transaction_filter = TransactionFilter(
+            {'category': pks}, queryset=Transaction.objects.all()
+        )
+        assert transaction_filter.form.is_valid()
+        html = str(transaction_filter.form['category'])
+
+    assert all(category.name in html for category in categories)
+    assert set(transaction_filter.form.cleaned_data['category']) == set(categories[:2])
+
+
+@pytest.mark.django_db
+def test_transaction_form_validates_category_without_queries(
+    categories, django_assert_num_queries
+):
+    get_categories()
+    data = {'type': 'expense', 'amount': 10, 'date': '2024-01-01', 'category': categories[0].pk}
+
+    with django_assert_num_queries(0):
+        form = TransactionForm(data)
+        assert form.is_valid()
+        str(form['category'])
+
+    assert form.cleaned_data['category'] == categories[0]
+
+
+@pytest.mark.django_db
+def test_unknown_category_is_rejected(categories):
+    data = {'type': 'expense', 'amount': 10, 'date': '2024-01-01', 'category': 999999}
+    assert 'category' in TransactionForm(data).errors
+
+    transaction_filter = TransactionFilter({'category': ['999999']}, queryset=Transaction.objects.all())
+    assert not transaction_filter.form.is_valid()
+
+
+@pytest.mark.django_db
+def test_cache_reloads_after_category_changes(categories):
+    assert len(get_categories()) == 3
+
+    category = categories[0]
+    category.name = 'Renamed'
+    category.save()
+    Category.objects.create(name='New')
+
+    names = [category.name for category in get_categories()]
+    assert 'Renamed' in names and 'New' in names
+
+
+@pytest.mark.django_db
+def test_reload_leaves_what_readers_hold_intact(categories):
+    held = category_cache._load()
+
+    Category.objects.create(name='New')
+    reloaded = category_cache._load()
+
+    # a reader part way through the old maps keeps a consistent set of them
+    assert 'New' in reloaded['by_name'] and reloaded['version'] != held['version']
+    assert 'New' not in held['by_name']
+    assert len(held['categories']) == len(held['by_pk']) == 3
+
+@pytest.mark.django_db
+def test_import_widget_looks_up_category_by_name(categories):
+    widget = CategoryWidget()
+
+    assert widget.clean(categories[0].name) == categories[0]
+    with pytest.raises(ValueError):
+        widget.clean('Not a category')
@@ -0,0 +1,63 @@
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+from tracker.dashboard import PANELS
+from tracker.models import Transaction
+
+
+@pytest.mark.django_db
+def test_index_is_a_shell_that_loads_each_panel(user, client, django_assert_max_num_queries):
+    client.force_login(user)
+
+    # the session and the user, nothing else
+    with django_assert_max_num_queries(2):
+        response = client.get(reverse('index'))
+
+    content = response.content.decode()
+    for name in PANELS:
+        assert f'hx-get="{reverse("dashboard-panel", args=[name])}"' in content
+    assert content.count('hx-trigger="load"') == len(PANELS)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('name', list(PANELS))
+def test_panels_are_cached_until_the_data_changes(
+    name, user_transactions, client, django_assert_num_queries
+):
+    user = user_transactions[0].user
+    client.force_login(user)
+    url = reverse('dashboard-panel', args=[name])
+    first = client.get(url)
+    assert first.status_code == 200
+
+    # the session and the user only - the panel comes from the cache
+    with django_assert_num_queries(2):
+        assert client.get(url).content == first.content
+
+    Transaction.objects.create(
+        user=user,
+        category=user_transactions[0].category,
+        type='expense',
+        amount=1,
+        date=timezone.localdate(),
+    )
+    assert client.get(url).content != first.content
+
+
+@pytest.mark.django_db
+def test_month_to_date_panel_totals(user_transactions, client):
+    user = user_transactions[0].user
+    client.force_login(user)
+    today = timezone.localdate()
+    Transaction.objects.filter(user=user).update(date=today)
+
+    response = client.get(reverse('dashboard-panel', args=['month-to-date']))
+
+    income, _ = Transaction.objects.filter(user=user).get_totals()
+    assert f'${income:,.2f}' in response.content.decode()
+
+
+@pytest.mark.django_db
+def test_unknown_panel_is_404(user, client):
+    client.force_login(user)
+    assert client.get(reverse('dashboard-panel', args=['nope'])).status_code == 404
@@ -0,0 +1,97 @@
+import datetime
+import numpy as np
+import pytest
+from django.db.models import Sum
+from django.db.models.functions import TruncMonth
+from django.http import QueryDict
+from tracker.filters import TransactionFilter
+from tracker.frames import TransactionFrame, get_frame, to_date
+from tracker.models import Transaction
+
+
+def _frame(rows):
+    # (date, cents, type code, category) tuples, in date order
+    days, cents, types, categories = zip(*rows)
+    return TransactionFrame(
+        np.array(days, dtype='datetime64[D]').astype(np.int32),
+        np.array(cents, dtype=np.int64),
+        np.array(types, dtype=np.int8),
+        np.array(categories, dtype=np.int32),
+    )
+
+
+@pytest.mark.django_db
+def test_frame_matches_the_orm_aggregates(user_transactions):
+    user = user_transactions[0].user
+    frame = TransactionFrame.from_queryset(Transaction.objects.filter(user=user))
+
+    assert len(frame) == 20
+    assert frame.totals() == Transaction.objects.filter(user=user).get_totals()
+
+    months, income, expenses = frame.by_month()
+    by_month = dict(
+        Transaction.objects.filter(user=user, type='expense')
+        .annotate(month=TruncMonth('date')).order_by()
+        .values_list('month').annotate(total=Sum('amount'))
+    )
+    for month, cents in zip(months.astype(object), expenses.tolist()):
+        assert by_month.get(month, 0) * 100 == cents
+
+
+@pytest.mark.django_db
+def test_frame_is_one_query_and_cached_per_data_version(
+    user_transactions, django_assert_num_queries
+):
+    user = user_transactions[0].user
+    with django_assert_num_queries(1):
+        frame = get_frame(user.pk)
+    with django_assert_num_queries(0):
+        assert get_frame(user.pk).cents.tolist() == frame.cents.tolist()
+
+    Transaction.objects.filter(pk=user_transactions[0].pk).delete()
+    assert len(get_frame(user.pk)) == 19
+
+
+def test_grouping_rolling_and_cumulative_sums():
+    frame = _frame([
+        ('2024-01-30', 1000, 0, 1),
+        ('2024-01-31', 250, 1, 2),
+        ('2024-01-31', 150, 1, 1),
+        ('2024-02-02', 500, 1, 2),
+    ])
+
+    months, income, expenses = frame.by_month()
+    assert months.astype(str).tolist() == ['2024-01', '2024-02']
+    assert income.tolist() == [1000, 0]
+    assert expenses.tolist() == [400, 500]
+
+    categories, income, expenses = frame.by_category()
+    assert categories.tolist() == [1, 2]
+    assert income.tolist() == [1000, 0] and expenses.tolist() == [150, 750]
+
+    start, end = datetime.date(2024, 1, 30), datetime.date(2024, 2, 2)
+    assert frame.daily(start, end).tolist() == [1000, -400, 0, -500]
+    assert frame.rolling(start, end, window=2).tolist() == [1000, 600, -400, -500]
+
+    days, balance = frame.cumulative()
+    assert [to_date(day) for day in days] == [
+        start, datetime.date(2024, 1, 31), end
+    ]
+    assert balance.tolist() == [1000, 600, 100]
+
+
+@pytest.mark.django_db
+def test_filter_frame_matches_the_filtered_queryset(user_transactions):
+    user = user_transactions[0].user
+    transaction = user_transactions[0]
+    params = QueryDict(mutable=True)
+    params.update({'transaction_type': transaction.type, 'end_date': transaction.date})
+    params.setlist('category', [transaction.category_id])
+    # an invalid field is ignored, as it is by .qs
+    params['start_date'] = 'not a date'
+
+    transaction_filter = TransactionFilter(params, queryset=Transaction.objects.filter(user=user))
+    frame = transaction_filter.filter_frame(get_frame(user.pk))
+
+    assert len(frame) == transaction_filter.qs.count()
+    assert frame.totals() == transaction_filter.qs.get_totals()
@@ -0,0 +1,77 @@
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from tracker.history import RESTORED
+from tracker.metrics import get_metrics
+
+RESTORE_HEADERS = {'HTTP_HX_REQUEST': 'true', 'HTTP_HX_HISTORY_RESTORE_REQUEST': 'true'}
+
+
+@pytest.mark.django_db
+def test_history_restore_is_served_from_the_page_cache(user_transactions, client):
+    client.force_login(user_transactions[0].user)
+    page = client.get(reverse('transactions-list'))
+
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(reverse('transactions-list'), **RESTORE_HEADERS)
+
+    assert response.content == page.content
+    assert not any('tracker_transaction' in q['sql'] for q in queries)
+    assert get_metrics()[RESTORED] == 1
+
+
+@pytest.mark.django_db
+def test_history_restore_after_a_write_renders_the_full_page(user_transactions, client):
+    client.force_login(user_transactions[0].user)
+    client.get(reverse('transactions-list'))
+    client.delete(reverse('delete-transaction', kwargs={'pk': user_transactions[0].pk}))
+
+    response = client.get(reverse('transactions-list'), **RESTORE_HEADERS)
+
+    # a full page, not the container partial an htmx request would get
+    assert b'<html' in response.content
+    assert f'data-pk="{user_transactions[0].pk}"'.encode() not in response.content
+    assert get_metrics()[RESTORED] == 0
+
+
+@pytest.mark.django_db
+def test_history_restore_of_pushed_form_url_renders_list_with_form(user_transactions, client):
+    client.force_login(user_transactions[0].user)
+    transaction = user_transactions[0]
+    url = reverse('update-transaction', kwargs={'pk': transaction.pk})
+
+    response = client.get(url, **RESTORE_HEADERS)
+
+    content = response.content.decode()
+    assert '<html' in content
+    assert 'id="transaction-rows"' in content
+    assert f'hx-post="{url}"' in content
+
+
+@pytest.mark.django_db
+def test_only_recent_pages_are_kept(user_transactions, client, settings):
+    settings.HISTORY_PAGES = 2
+    client.force_login(user_transactions[0].user)
+
+    for transaction_type in ('income', 'expense', ''):
+        client.get(reverse('transactions-list'), {'transaction_type': transaction_type})
+
+    pages = cache.get(f'history-pages:{user_transactions[0].user.pk}')
+    assert len(pages) == 2
+    assert len(cache.get_many(pages)) == 2
+
+
+@pytest.mark.django_db
+def test_large_pages_are_not_kept(user_transactions, client, settings):
+    client.force_login(user_transactions[0].user)
+    page = client.get(reverse('transactions-charts'))
+    # plotly.js comes from the base template, not once per figure
+    assert len(page.content) < settings.HISTORY_PAGE_MAX_BYTES
+    cache.clear()
+
+    settings.HISTORY_PAGE_MAX_BYTES = len(page.content) - 1
+    client.get(reverse('transactions-charts'))
+
+    assert cache.get(f'history-pages:{user_transactions[0].user.pk}') is None
@@ -1,4 +1,8 @@
+from decimal import Decimal
 import pytest
+from django.core.exceptions import ValidationError
+from django.db import connection
+from tracker.factories import TransactionFactory
 from tracker.models import Transaction
 
 
@@ -26,4 +30,59 @@ def test_queryset_get_total_income_method(transactions):
 @pytest.mark.django_db
 def test_queryset_get_total_expenses_method(transactions):
     total_expenses = Transaction.objects.get_total_expenses()
-    assert total_expenses == sum(t.amount for t in transactions if t.type == 'expense')
\ No newline at end of file
+    assert total_expenses == sum(t.amount for t in transactions if t.type == 'expense')
+
+
+@pytest.mark.django_db
+def test_amount_is_stored_as_cents_and_read_as_decimal(user):
+    transaction = TransactionFactory(user=user, amount=0.29)
+
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT amount FROM tracker_transaction WHERE id = %s', [transaction.pk])
+        assert cursor.fetchone()[0] == 29
+
+    transaction.refresh_from_db()
+    assert transaction.amount == Decimal('0.29')
+    assert str(transaction.amount) == '0.29'
+
+
+@pytest.mark.django_db
+def test_amount_sums_and_ranges_are_exact(user):
+    for amount in ('0.10', '0.20', '0.30'):
+        TransactionFactory(user=user, type='income', amount=Decimal(amount))
+
+    transactions = Transaction.objects.filter(user=user)
+    assert transactions.get_total_income() == Decimal('0.60')
+    assert transactions.filter(amount__gte=Decimal('0.2'), amount__lt=0.3).count() == 1
+
+
+def test_amount_rejects_non_numbers():
+    field = Transaction._meta.get_field('amount')
+    with pytest.raises(ValidationError):
+        field.to_python('ten dollars')
+
+
+@pytest.mark.django_db
+def test_running_balance_by_day_and_month(user, django_assert_num_queries):
+    for date, type, amount in (
+        ('2024-01-05', 'income', 100),
+        ('2024-01-05', 'expense', 30),
+        ('2024-01-20', 'expense', 20),
+        ('2024-03-01', 'income', 5),
+    ):
+        TransactionFactory(user=user, date=date, type=type, amount=amount)
+    transactions = Transaction.objects.filter(user=user)
+
+    with django_assert_num_queries(1):
+        daily = list(transactions.running_balance())
+    assert [(str(row['bucket']), row['net'], row['balance']) for row in daily] == [
+        ('2024-01-05', 70, 70),
+        ('2024-01-20', -20, 50),
+        ('2024-03-01', 5, 55),
+    ]
+
+    monthly = transactions.running_balance('month')
+    assert [(str(row['bucket']), row['balance']) for row in monthly] == [
+        ('2024-01-01', 50),
+        ('2024-03-01', 55),
+    ]
\ No newline at end of file
@@ -0,0 +1,92 @@
+import pytest
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from tracker.models import Transaction
+from tracker.paging import ORDERING, get_rows, make_cursor, page_size, parse_cursor
+
+
+def _request(headers=None, cookies=None):
+    request = RequestFactory().get('/get-transactions/', headers=headers or {})
+    request.COOKIES.update(cookies or {})
+    return request
+
+
+def test_page_size_without_hints_is_the_default(settings):
+    assert page_size(_request()) == settings.PAGE_SIZE
+    assert page_size(_request({'X-Viewport-Rows': 'lots'})) == settings.PAGE_SIZE
+
+
+def test_page_size_fills_the_viewport_and_grows_with_scroll_velocity(settings):
+    settings.PAGE_SIZE = 5
+    settings.PAGE_OVERSCAN_ROWS = 5
+    settings.PAGE_LOOKAHEAD_SECONDS = 1
+
+    assert page_size(_request({'X-Viewport-Rows': '18'}), first=True) == 25
+    assert page_size(_request(cookies={'viewport_rows': '18'}), first=True) == 25
+    assert page_size(_request({'X-Viewport-Rows': '18', 'X-Scroll-Velocity': '40'})) == 45
+
+
+def test_page_size_stays_within_bounds(settings):
+    settings.PAGE_SIZE_MIN = 10
+    settings.PAGE_SIZE_MAX = 50
+
+    assert page_size(_request({'X-Viewport-Rows': '0'})) == 10
+    assert page_size(_request({'X-Viewport-Rows': '10', 'X-Scroll-Velocity': '1e9'})) == 50
+
+
+@pytest.mark.django_db
+def test_first_page_fills_the_viewport(user_transactions, client):
+    client.force_login(user_transactions[0].user)
+
+    response = client.get(reverse('transactions-list'), HTTP_X_VIEWPORT_ROWS='10')
+
+    content = response.content.decode()
+    fifteenth = Transaction.objects.order_by(*ORDERING)[14]
+    assert content.count('data-pk=') == 15
+    assert f'?after={make_cursor(fifteenth)}' in content
+
+
+@pytest.mark.django_db
+def test_pages_are_fetched_by_cursor_in_both_directions(user_transactions):
+    queryset = Transaction.objects.all()
+    ordered = list(queryset.order_by(*ORDERING))
+
+    first, has_more = get_rows(queryset, 8)
+    assert first == ordered[:8] and has_more
+
+    after = parse_cursor(make_cursor(first[-1]))
+    second, has_more = get_rows(queryset, 8, after=after)
+    assert second == ordered[8:16] and has_more
+
+    # upwards from the second page's first row: the same rows as the first page
+    before = parse_cursor(make_cursor(second[0]))
+    assert get_rows(queryset, 8, before=before) == (first, False)
+    assert get_rows(queryset, 5, before=before) == (first[3:], True)
+
+
+@pytest.mark.django_db
+def test_scroll_pages_never_count_or_offset(user_transactions, client):
+    client.force_login(user_transactions[0].user)
+    fifteenth = Transaction.objects.order_by(*ORDERING)[14]
+
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(
+            reverse('get-transactions'),
+            {'after': make_cursor(fifteenth)},
+            HTTP_X_VIEWPORT_ROWS='10',
+        )
+
+    content = response.content.decode()
+    # the last 5 of the 20 transactions, and nothing left to fetch
+    assert content.count('data-pk=') == 5
+    assert '?after=' not in content
+    assert response['X-Has-More'] == 'false'
+    assert not any('COUNT(' in q['sql'] or 'OFFSET' in q['sql'] for q in queries)
+
+
+def test_malformed_cursors_are_ignored():
+    assert parse_cursor(None) is None
+    assert parse_cursor('yesterday.1') is None
+    assert parse_cursor('2024-01-01') is None
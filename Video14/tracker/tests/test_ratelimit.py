@@ -0,0 +1,98 @@
+import pytest
+from django.urls import reverse
+from tracker import metrics
+from tracker.ratelimit import get_semaphore, take_token
+
+
+@pytest.fixture
+def export_limits(settings):
+    settings.RATE_LIMITS = {
+        'export': {'user': (0.01, 2), 'global': (100, 100), 'concurrency': 2},
+    }
+
+
+def test_token_bucket_allows_burst_then_reports_wait():
+    assert take_token('bucket', rate=1, burst=2) == 0
+    assert take_token('bucket', rate=1, burst=2) == 0
+
+    retry_after = take_token('bucket', rate=1, burst=2)
+    assert 0 < retry_after <= 1
+
+
+@pytest.mark.django_db
+def test_user_over_budget_gets_429_with_retry_after(export_limits, user, client):
+    client.force_login(user)
+    url = reverse('export')
+
+    assert client.get(url).status_code == 200
+    assert client.get(url).status_code == 200
+    response = client.get(url)
+
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) > 0
+    assert metrics.get_metrics()['ratelimit.rejected.export.user'] == 1
+
+
+@pytest.mark.django_db
+def test_rate_limited_htmx_request_gets_partial(export_limits, user, client):
+    client.force_login(user)
+    url = reverse('export')
+    for _ in range(2):
+        client.get(url)
+
+    response = client.get(url, HTTP_HX_REQUEST='true')
+
+    assert response.status_code == 429
+    assert response.headers['HX-Retarget'] == '#alerts'
+    assert '<html' not in response.content.decode()
+
+
+@pytest.mark.django_db
+def test_views_without_limits_are_not_throttled(export_limits, user, client):
+    client.force_login(user)
+
+    for _ in range(5):
+        assert client.get(reverse('import')).status_code == 200
+
+
+@pytest.mark.django_db
+def test_requests_are_shed_when_concurrency_is_exhausted(export_limits, user, client):
+    client.force_login(user)
+    semaphore = get_semaphore('export', 2)
+    semaphore.acquire()
+    semaphore.acquire()
+    try:
+        response = client.get(reverse('export'))
+    finally:
+        semaphore.release()
+        semaphore.release()
+
+    assert response.status_code == 429
+    assert client.get(reverse('export')).status_code == 200
+
+
+
+@pytest.mark.django_db
+def test_export_spends_one_token_for_the_htmx_hop_and_the_download(settings, user, client):
+    settings.RATE_LIMITS = {
+        'export': {
+            'user': (0.01, 2), 'global': (100, 100), 'concurrency': 2,
+            'methods': ('GET',), 'htmx': False,
+        },
+        'import': {
+            'user': (0.01, 1), 'global': (100, 100), 'concurrency': 2,
+            'methods': ('POST',),
+        },
+    }
+    client.force_login(user)
+    url = reverse('export')
+
+    for _ in range(2):
+        hop = client.get(url, HTTP_HX_REQUEST='true')
+        assert hop.status_code == 200 and 'HX-Redirect' in hop.headers
+        assert client.get(url).status_code == 200
+    assert client.get(url).status_code == 429
+
+    # the import form is free, only the upload is limited
+    for _ in range(3):
+        assert client.get(reverse('import')).status_code == 200
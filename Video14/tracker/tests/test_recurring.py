@@ -0,0 +1,130 @@
+import datetime
+import numpy as np
+import pytest
+from django.core.management import call_command
+from tracker import recurring
+from tracker.factories import CategoryFactory, TransactionFactory
+from tracker.frames import EXPENSE, INCOME, to_day
+from tracker.models import RecurringSeries
+from tracker.recurring import find_series, next_date, update_series
+
+START = datetime.date(2023, 1, 31)
+
+
+def _columns(*transactions):
+    """Columns of (type code, category, cents, date) tuples."""
+    transactions = sorted(transactions, key=lambda t: t[3])
+    types, categories, cents, dates = zip(*transactions)
+    return {
+        'ids': np.arange(1, len(transactions) + 1, dtype=np.int64),
+        'days': np.array([to_day(date) for date in dates], dtype=np.int32),
+        'cents': np.array(cents, dtype=np.int64),
+        'types': np.array(types, dtype=np.int8),
+        'categories': np.array(categories, dtype=np.int16),
+    }
+
+
+def _monthly(first, count):
+    dates = [first]
+    for _ in range(count - 1):
+        dates.append(next_date(RecurringSeries.MONTHLY, dates[-1], first))
+    return dates
+
+
+def test_next_dates_keep_the_day_of_the_month():
+    assert _monthly(START, 4) == [
+        START, datetime.date(2023, 2, 28), datetime.date(2023, 3, 31), datetime.date(2023, 4, 30),
+    ]
+    leap = datetime.date(2024, 2, 29)
+    assert next_date(RecurringSeries.ANNUAL, leap, leap) == datetime.date(2025, 2, 28)
+
+
+def test_series_are_found_among_other_transactions():
+    rng = np.random.default_rng(0)
+    rent = [(EXPENSE, 1, 100_000, date) for date in _monthly(START, 6)]
+    # a salary that varies a little
+    salary = [(INCOME, 2, 300_000 + i * 500, date) for i, date in enumerate(_monthly(START, 5))]
+    streaming = [(EXPENSE, 3, 1299, START + datetime.timedelta(weeks=i)) for i in range(8)]
+    insurance = [(EXPENSE, 3, 45_000, datetime.date(2019 + i, 3, 1)) for i in range(4)]
+    food = [
+        (EXPENSE, 4, int(cents), START + datetime.timedelta(days=int(day)))
+        for cents, day in zip(rng.integers(500, 20_000, 200), rng.integers(0, 180, 200))
+    ]
+
+    found = find_series(_columns(*rent, *salary, *streaming, *insurance, *food))
+
+    assert sorted((s['category'], s['period'], s['occurrences']) for s in found) == [
+        (1, RecurringSeries.MONTHLY, 6),
+        (2, RecurringSeries.MONTHLY, 5),
+        (3, RecurringSeries.ANNUAL, 4),
+        (3, RecurringSeries.WEEKLY, 8),
+    ]
+    salary = next(s for s in found if s['category'] == 2)
+    assert salary['cents'] == 302_000 and salary['type'] == 'income'
+    assert salary['next_date'] == datetime.date(2023, 6, 30)
+
+
+def test_amounts_outside_the_tolerance_are_not_a_series():
+    dates = _monthly(START, 6)
+    columns = _columns(*((EXPENSE, 1, 1000 if i % 2 else 2000, date) for i, date in enumerate(dates)))
+    assert find_series(columns) == []
+
+
+def _rent(user, category, dates, amount=1000):
+    return [
+        TransactionFactory(user=user, category=category, type='expense', amount=amount, date=date)
+        for date in dates
+    ]
+
+
+@pytest.mark.django_db
+def test_new_transactions_extend_series_without_a_rescan(user, monkeypatch):
+    housing = CategoryFactory(name='Housing')
+    dates = _monthly(START, 6)
+    _rent(user, housing, dates[:5])
+    assert update_series(user.pk) == (0, 1)
+    series = RecurringSeries.objects.get()
+    assert series.next_date == dates[5]
+
+    def rescan(*args, **kwargs):
+        raise AssertionError("rescanned")
+
+    monkeypatch.setattr(recurring, 'find_series', rescan)
+    _rent(user, housing, dates[5:])
+
+    assert update_series(user.pk) == (1, 0)
+    series.refresh_from_db()
+    assert (series.occurrences, series.last_date) == (6, dates[5])
+    assert series.next_date == datetime.date(2023, 7, 31)
+
+
+@pytest.mark.django_db
+def test_only_categories_with_other_new_transactions_are_rediscovered(user):
+    housing, bills = CategoryFactory(name='Housing'), CategoryFactory(name='Bills')
+    rent = _rent(user, housing, _monthly(START, 5))
+    update_series(user.pk)
+    series = RecurringSeries.objects.get()
+
+    _rent(user, bills, _monthly(START, 4), amount=30)
+    assert update_series(user.pk) == (0, 1)
+    assert RecurringSeries.objects.get(category=housing).pk == series.pk
+    assert RecurringSeries.objects.get(category=bills).occurrences == 4
+
+    # an edited rent payment isn't a new occurrence: its category is looked at again
+    rent[0].amount = 5000
+    rent[0].save()
+    update_series(user.pk)
+    assert RecurringSeries.objects.get(category=housing).occurrences == 4
+
+
+@pytest.mark.django_db
+def test_full_scans_notice_deleted_transactions(user):
+    rent = _rent(user, CategoryFactory(name='Housing'), _monthly(START, 4))
+    call_command('detect_recurring')
+    assert RecurringSeries.objects.count() == 1
+
+    rent[-1].delete()
+    call_command('detect_recurring')
+    assert RecurringSeries.objects.count() == 1
+    call_command('detect_recurring', '--full')
+    assert not RecurringSeries.objects.exists()
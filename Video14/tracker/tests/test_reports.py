@@ -0,0 +1,152 @@
+import csv
+import datetime
+from decimal import Decimal
+import pytest
+from django.urls import reverse
+from tracker.factories import CategoryFactory, TransactionFactory
+from tracker.forms import PeriodComparisonForm
+from tracker.models import Transaction
+from tracker.reports import Pivot, compare_periods, preset_periods
+
+
+@pytest.mark.django_db
+def test_pivot_matches_the_transactions(user_transactions, django_assert_num_queries):
+    transactions = Transaction.objects.all()
+    with django_assert_num_queries(2):  # the GROUP BY, and the categories
+        pivot = Pivot.from_queryset(transactions)
+
+    names = [category.name for category in pivot.categories]
+    assert names == sorted(names)
+    for category, amounts, total in pivot.rows():
+        for month, amount in zip(pivot.months, amounts):
+            in_month = [
+                t for t in user_transactions
+                if t.category == category and (t.date.year, t.date.month) == (month.year, month.month)
+            ]
+            assert amount == sum((t.amount if t.type == 'income' else -t.amount for t in in_month), Decimal(0))
+        assert total == sum(amounts, Decimal(0))
+
+    amounts, total = pivot.totals()
+    income, expenses = transactions.get_totals()
+    assert total == income - expenses
+    assert sum(amounts, Decimal(0)) == total
+
+
+@pytest.mark.django_db
+def test_pivot_months_have_no_gaps(user):
+    food, rent = CategoryFactory(name='Food'), CategoryFactory(name='Rent')
+    TransactionFactory(user=user, category=rent, type='expense', amount=500, date=datetime.date(2023, 11, 30))
+    TransactionFactory(user=user, category=food, type='income', amount=20, date=datetime.date(2024, 2, 1))
+
+    pivot = Pivot.from_queryset(Transaction.objects.filter(user=user))
+
+    assert pivot.months == [datetime.date(2023, 11, 1), datetime.date(2023, 12, 1),
+                            datetime.date(2024, 1, 1), datetime.date(2024, 2, 1)]
+    assert pivot.cells.tolist() == [[0, 0, 0, 2000], [-50000, 0, 0, 0]]
+    assert pivot.column_totals.tolist() == [-50000, 0, 0, 2000]
+    assert Pivot.from_queryset(Transaction.objects.none()).categories == []
+
+
+@pytest.mark.django_db
+def test_pivot_report_view_and_csv(user_transactions, client):
+    user = user_transactions[0].user
+    client.force_login(user)
+    params = {'transaction_type': 'expense'}
+
+    response = client.get(reverse('pivot-report'), params, HTTP_HX_REQUEST='true')
+    assert response.status_code == 200
+    assert 'id="pivot-table"' in response.content.decode()
+    assert 'tracker/partials/pivot-container.html' in [t.name for t in response.templates]
+
+    response = client.get(reverse('pivot-report-csv'), params)
+    assert response['Content-Type'] == 'text/csv'
+    rows = list(csv.reader(response.content.decode().splitlines()))
+    expenses = sum(t.amount for t in user_transactions if t.type == 'expense')
+    assert rows[0][0] == 'Category' and rows[-1][0] == 'Total'
+    assert Decimal(rows[-1][-1]) == -expenses
+
+
+@pytest.mark.django_db
+def test_compare_periods_is_one_query(user_transactions, django_assert_num_queries):
+    dates = sorted(t.date for t in user_transactions)
+    current, previous = (dates[10], dates[-1]), (dates[0], dates[9])
+    with django_assert_num_queries(1):
+        rows = list(Transaction.objects.compare_periods(current, previous))
+
+    for row in rows:
+        of_row = [t for t in user_transactions if (t.category_id, t.type) == (row['category'], row['type'])]
+        for name, (start, end) in (('current', current), ('previous', previous)):
+            assert row[name] == sum((t.amount for t in of_row if start <= t.date <= end), Decimal(0))
+
+
+@pytest.mark.django_db
+def test_comparison_changes_and_totals(user):
+    food, salary = CategoryFactory(name='Food'), CategoryFactory(name='Salary')
+    TransactionFactory(user=user, category=food, type='expense', amount=100, date=datetime.date(2024, 1, 10))
+    TransactionFactory(user=user, category=food, type='expense', amount=150, date=datetime.date(2024, 2, 10))
+    TransactionFactory(user=user, category=salary, type='income', amount=1000, date=datetime.date(2024, 2, 1))
+    current, previous = preset_periods('month', today=datetime.date(2024, 2, 20))
+
+    comparison = compare_periods(user.pk, current, previous)
+
+    assert (current, previous) == ((datetime.date(2024, 2, 1), datetime.date(2024, 2, 29)),
+                                   (datetime.date(2024, 1, 1), datetime.date(2024, 1, 31)))
+    assert [(row['category'].name, row['change'], row['percent']) for row in comparison.rows] == [
+        ('Salary', Decimal(1000), None),
+        ('Food', Decimal(50), Decimal('50.0')),
+    ]
+    assert comparison.totals['net']['current'] == Decimal(850)
+    assert comparison.totals['net']['previous'] == Decimal(-100)
+
+
+@pytest.mark.django_db
+def test_comparison_is_cached_until_a_write(user, django_assert_num_queries):
+    TransactionFactory(user=user, type='income', amount=10, date=datetime.date(2024, 2, 1))
+    periods = preset_periods('year', today=datetime.date(2024, 6, 1))
+    compare_periods(user.pk, *periods)
+
+    with django_assert_num_queries(0):
+        compare_periods(user.pk, *periods)
+
+    TransactionFactory(user=user, type='income', amount=5, date=datetime.date(2024, 3, 1))
+    assert compare_periods(user.pk, *periods).totals['income']['current'] == Decimal(15)
+
+
+def test_period_form_defaults_and_custom_periods():
+    assert PeriodComparisonForm().periods() == preset_periods('month')
+
+    form = PeriodComparisonForm({'period': 'custom', 'current_start': '2024-03-01', 'current_end': '2024-03-10'})
+    assert form.periods() == (
+        (datetime.date(2024, 3, 1), datetime.date(2024, 3, 10)),
+        (datetime.date(2024, 2, 20), datetime.date(2024, 2, 29)),
+    )
+
+    form = PeriodComparisonForm({'period': 'custom', 'current_start': '2024-03-10', 'current_end': '2024-03-01'})
+    assert not form.is_valid()
+    assert form.periods() == preset_periods('month')
+
+
+@pytest.mark.django_db
+def test_period_comparison_view(user_transactions, client):
+    client.force_login(user_transactions[0].user)
+    params = {'period': 'custom', 'current_start': '2000-01-01', 'current_end': '2100-01-01'}
+
+    response = client.get(reverse('period-comparison'), params, HTTP_HX_REQUEST='true')
+
+    assert response.status_code == 200
+    assert 'tracker/partials/comparison-container.html' in [t.name for t in response.templates]
+    income = sum(t.amount for t in user_transactions if t.type == 'income')
+    assert response.context['comparison'].totals['income']['current'] == income
+
+
+@pytest.mark.django_db
+def test_comparison_etag_changes_with_the_month(user, client, monkeypatch):
+    client.force_login(user)
+    monkeypatch.setattr('django.utils.timezone.localdate', lambda: datetime.date(2026, 10, 31))
+    etag = client.get(reverse('period-comparison'))['ETag']
+
+    monkeypatch.setattr('django.utils.timezone.localdate', lambda: datetime.date(2026, 11, 1))
+    response = client.get(reverse('period-comparison'), HTTP_IF_NONE_MATCH=etag)
+
+    assert response.status_code == 200
+    assert response.context['comparison'].current == (datetime.date(2026, 11, 1), datetime.date(2026, 11, 30))
@@ -0,0 +1,124 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from django.core.exceptions import ImproperlyConfigured
+from django.test import RequestFactory
+from tracker import metrics, singleflight
+from tracker.factories import TransactionFactory
+
+
+@pytest.fixture(autouse=True)
+def lock_dir(settings, tmp_path):
+    settings.SINGLEFLIGHT_LOCK_DIR = tmp_path
+    return tmp_path
+
+
+class SlowComputation:
+    def __init__(self):
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def __call__(self):
+        with self.lock:
+            self.calls += 1
+        time.sleep(0.2)
+        return {'chart': '<div></div>'}
+
+
+def test_concurrent_identical_calls_share_one_computation():
+    compute = SlowComputation()
+
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        results = list(pool.map(lambda _: singleflight.coalesce('key', compute), range(5)))
+
+    assert compute.calls == 1
+    assert all(result == {'chart': '<div></div>'} for result in results)
+    assert metrics.get_metrics()[singleflight.COALESCED] == 4
+
+
+def test_leader_errors_are_raised_in_followers():
+    def fail():
+        time.sleep(0.2)
+        raise ValueError("boom")
+
+    def call(_):
+        try:
+            singleflight.coalesce('failing', fail)
+        except ValueError as error:
+            return str(error)
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        assert list(pool.map(call, range(3))) == ['boom'] * 3
+
+
+def test_result_is_shared_through_the_lock_file(lock_dir):
+    # calling the per-host layer directly behaves like two separate processes
+    compute = SlowComputation()
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        results = list(pool.map(
+            lambda _: singleflight._compute_once_per_host('key', compute), range(2)
+        ))
+
+    assert compute.calls == 1
+    assert results[0] == results[1]
+    # the last one out removes the result; the lock files stay
+    assert sorted(path.name for path in lock_dir.iterdir()) == ['key.lock', 'key.waiters']
+
+
+def test_result_is_not_written_without_waiters(lock_dir, monkeypatch):
+    written = []
+    monkeypatch.setattr(singleflight, '_write_result', lambda *args: written.append(args))
+
+    assert singleflight._compute_once_per_host('key', lambda: 'csv') == 'csv'
+
+    assert written == []
+    assert not (lock_dir / 'key.result').exists()
+
+
+def test_result_written_under_another_lock_file_is_ignored(lock_dir):
+    singleflight._compute_once_per_host('key', lambda: 'old')
+    singleflight._write_result(str(lock_dir / 'key.result'), (0, 0), 'planted')
+
+    assert singleflight._compute_once_per_host('key', lambda: 'new') == 'new'
+
+
+def test_unused_lock_files_are_pruned(lock_dir):
+    singleflight._compute_once_per_host('old', lambda: 1)
+    for path in lock_dir.iterdir():
+        os.utime(path, (0, 0))
+    singleflight._compute_once_per_host('new', lambda: 1)
+
+    singleflight.prune(lock_dir, max_age=60)
+
+    assert sorted(path.name for path in lock_dir.iterdir()) == ['new.lock', 'new.waiters']
+
+
+def test_lock_dir_is_made_private(tmp_path):
+    lock_dir = tmp_path / 'singleflight'
+    lock_dir.mkdir(mode=0o755)
+
+    singleflight.check_lock_dir(lock_dir)
+
+    assert lock_dir.stat().st_mode & 0o777 == 0o700
+
+
+def test_lock_dir_must_be_a_directory_of_its_own(tmp_path):
+    (tmp_path / 'elsewhere').mkdir()
+    (tmp_path / 'singleflight').symlink_to(tmp_path / 'elsewhere')
+
+    with pytest.raises(ImproperlyConfigured):
+        singleflight.check_lock_dir(tmp_path / 'singleflight')
+
+
+@pytest.mark.django_db
+def test_request_key_changes_when_data_changes(user):
+    request = RequestFactory().get('/transactions/charts', {'transaction_type': 'income'})
+    request.user = user
+    key = singleflight.request_key(request, 'charts')
+
+    TransactionFactory(user=user)
+
+    assert singleflight.request_key(request, 'charts') != key
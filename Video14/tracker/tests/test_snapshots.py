@@ -0,0 +1,143 @@
+import datetime
+import numpy as np
+import pytest
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.urls import reverse
+from tracker import snapshots
+from tracker.caching import bump_data_version, data_version_key, get_data_version
+from tracker.factories import TransactionFactory
+from tracker.frames import TransactionFrame, fetch_columns, get_frame
+from tracker.models import Category, Transaction
+
+
+def _assert_matches_db(frame, user):
+    expected = TransactionFrame.from_queryset(Transaction.objects.filter(user=user))
+    for column in ('days', 'cents', 'types', 'categories'):
+        assert getattr(frame, column).tolist() == getattr(expected, column).tolist()
+
+
+@pytest.mark.django_db
+def test_frame_is_mapped_from_the_snapshot(user_transactions, django_assert_num_queries):
+    user = user_transactions[0].user
+    snapshots.rebuild(user.pk)
+
+    with django_assert_num_queries(0):
+        frame = get_frame(user.pk)
+
+    assert isinstance(frame.cents, np.memmap)
+    _assert_matches_db(frame, user)
+
+
+@pytest.mark.django_db
+def test_writes_are_appended_to_the_delta_on_commit(
+    user_transactions, django_capture_on_commit_callbacks
+):
+    user = user_transactions[0].user
+    snapshots.rebuild(user.pk)
+
+    with django_capture_on_commit_callbacks(execute=True) as callbacks:
+        TransactionFactory(user=user, date=datetime.date(2000, 1, 1))
+        updated = user_transactions[1]
+        updated.amount = 12.34
+        updated.save()
+        user_transactions[2].delete()
+
+    assert len(callbacks) == 3
+    _assert_matches_db(snapshots.load_frame(user.pk), user)
+    assert snapshots.verify(user.pk) == []
+
+
+@pytest.mark.django_db
+def test_write_open_during_the_first_build_reaches_the_snapshot(
+    user_transactions, django_capture_on_commit_callbacks, monkeypatch
+):
+    user = user_transactions[0].user
+
+    with django_capture_on_commit_callbacks(execute=True):
+        written = TransactionFactory(user=user, date=datetime.date(2000, 1, 1))
+        # the build reads the table before the write commits, without its row
+        monkeypatch.setattr(snapshots, '_columns_from_db', lambda pk: fetch_columns(
+            Transaction.objects.filter(user_id=pk).exclude(pk=written.pk)
+        ))
+        snapshots.rebuild(user.pk)
+        monkeypatch.undo()
+
+    _assert_matches_db(snapshots.load_frame(user.pk), user)
+    assert snapshots.verify(user.pk) == []
+
+
+@pytest.mark.django_db
+def test_merge_folds_the_delta_into_a_new_generation(
+    user_transactions, django_capture_on_commit_callbacks
+):
+    user = user_transactions[0].user
+    snapshots.rebuild(user.pk)
+    with django_capture_on_commit_callbacks(execute=True):
+        user_transactions[0].delete()
+
+    snapshots.merge(user.pk)
+
+    columns, _, delta = snapshots._read(user.pk)
+    assert len(delta) == 0 and len(columns['ids']) == 19
+    _assert_matches_db(snapshots.load_frame(user.pk), user)
+
+
+@pytest.mark.django_db
+def test_snapshot_missing_writes_is_not_used(user_transactions, monkeypatch):
+    user = user_transactions[0].user
+    snapshots.rebuild(user.pk)
+    scheduled = []
+    monkeypatch.setattr(snapshots, 'run_in_background', lambda *args: scheduled.append(args))
+
+    # bulk_create skips the signals, so the delta never hears of these
+    Transaction.objects.bulk_create(
+        TransactionFactory.build_batch(3, user=user, category=user_transactions[0].category)
+    )
+    bump_data_version(user.pk)
+
+    assert snapshots.load_frame(user.pk) is None
+    assert scheduled == [(snapshots.rebuild, user.pk)]
+    assert len(get_frame(user.pk)) == 23
+    assert 'missing writes since it was built' in snapshots.verify(user.pk)
+
+
+@pytest.mark.django_db
+def test_snapshot_is_rebuilt_after_its_version_counter_is_lost(user_transactions, monkeypatch):
+    user = user_transactions[0].user
+    snapshots.rebuild(user.pk)
+    scheduled = []
+    monkeypatch.setattr(snapshots, 'run_in_background', lambda *args: scheduled.append(args))
+
+    # the counter is seeded again from the clock, an hour of nanoseconds on
+    cache.set(data_version_key(user.pk), get_data_version(user.pk) + 3600 * 10**9, timeout=None)
+
+    assert snapshots.load_frame(user.pk) is None
+    assert scheduled == [(snapshots.rebuild, user.pk)]
+
+
+@pytest.mark.django_db
+def test_category_pks_beyond_16_bits(user_transactions, client, django_capture_on_commit_callbacks):
+    user = user_transactions[0].user
+    snapshots.rebuild(user.pk)
+    category = Category.objects.create(pk=40000, name='Large pk')
+
+    with django_capture_on_commit_callbacks(execute=True):
+        TransactionFactory(user=user, category=category)
+
+    assert 40000 in snapshots.load_frame(user.pk).categories.tolist()
+    snapshots.merge(user.pk)
+    _assert_matches_db(snapshots.load_frame(user.pk), user)
+    client.force_login(user)
+    assert client.get(reverse('transactions-charts')).status_code == 200
+
+
+@pytest.mark.django_db
+def test_snapshot_commands(user_transactions):
+    user = user_transactions[0].user
+    call_command('rebuild_snapshots', username=user.username)
+    call_command('check_snapshots')
+
+    Transaction.objects.filter(pk=user_transactions[0].pk).update(amount=999)
+    with pytest.raises(CommandError):
+        call_command('check_snapshots')
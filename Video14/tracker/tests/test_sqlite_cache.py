@@ -0,0 +1,78 @@
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from tracker.sqlite_cache import SQLiteCache
+
+
+@pytest.fixture
+def location(tmp_path):
+    return tmp_path / 'cache.sqlite3'
+
+
+@pytest.fixture
+def backend(location):
+    return SQLiteCache(location, {'OPTIONS': {'MAX_ENTRIES': 10}})
+
+
+def test_get_many_and_set_many(backend):
+    backend.set_many({'a': 1, 'b': [1, 2], 'c': '<tr></tr>'})
+
+    assert backend.get_many(['a', 'b', 'c', 'missing']) == {
+        'a': 1, 'b': [1, 2], 'c': '<tr></tr>'
+    }
+
+
+def test_add_only_sets_missing_or_expired_keys(backend):
+    assert backend.add('key', 1)
+    assert not backend.add('key', 2)
+
+    backend.set('expired', 1, timeout=0)
+    assert backend.add('expired', 2)
+    assert backend.get('expired') == 2
+
+
+def test_incr_is_atomic_across_threads(backend):
+    backend.set('version', 0)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda _: backend.incr('version'), range(400)))
+
+    assert backend.get('version') == 400
+
+
+def test_incr_missing_key_raises(backend):
+    with pytest.raises(ValueError):
+        backend.incr('missing')
+
+
+def test_ints_beyond_64_bits_are_pickled(backend):
+    backend.set_many({'big': 2**63, 'small': -2**63 - 1, 'edge': 2**63 - 1})
+
+    assert backend.get_many(['big', 'small', 'edge']) == {
+        'big': 2**63, 'small': -2**63 - 1, 'edge': 2**63 - 1
+    }
+    assert backend.incr('big') == 2**63 + 1
+    # the sum no longer fits: stored pickled rather than as a float
+    assert backend.incr('edge') == 2**63
+    assert backend.get('edge') == 2**63
+    assert backend.incr('edge', -1) == 2**63 - 1
+
+def test_writes_are_visible_to_other_instances(backend, location):
+    # separate instances (and connections) stand in for separate processes
+    other_process = SQLiteCache(location, {})
+    backend.set('data-version:1', 5)
+
+    assert other_process.incr('data-version:1') == 6
+    assert backend.get('data-version:1') == 6
+
+
+def test_least_recently_used_entries_are_evicted(backend):
+    backend.set('keep', 'value')
+    for i in range(20):
+        backend.set(f'key{i}', i)
+        # reads refresh the LRU timestamp of entries older than ACCESS_RESOLUTION
+        backend._connection().execute("UPDATE cache SET accessed = accessed - 60")
+        backend.get('keep')
+
+    assert backend.get('keep') == 'value'
+    assert backend.get('key0') is None
+    assert backend._connection().execute("SELECT count(*) FROM cache").fetchone()[0] <= 10
@@ -0,0 +1,84 @@
+import time
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test import RequestFactory
+from django.urls import reverse
+from tracker.timeouts import QueryBudget, QueryCancelled
+
+SLOW_QUERY = """
+    WITH RECURSIVE numbers(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM numbers)
+    SELECT count(*) FROM (SELECT n FROM numbers LIMIT 100000000)
+"""
+
+
+@pytest.mark.django_db
+def test_sqlite_statement_is_interrupted_when_budget_runs_out(user, settings):
+    settings.QUERY_TIME_BUDGETS = {'transactions-list': 0.1}
+    request = RequestFactory().get('/')
+    request.user = user
+    budget = QueryBudget(request, 'transactions-list')
+
+    start = time.monotonic()
+    budget.install()
+    try:
+        with pytest.raises(QueryCancelled) as cancelled:
+            with connection.cursor() as cursor:
+                cursor.execute(SLOW_QUERY)
+    finally:
+        budget.uninstall()
+
+    assert cancelled.value.reason == 'timeout'
+    assert time.monotonic() - start < 2
+
+
+@pytest.mark.django_db
+def test_view_over_budget_returns_timeout_alert(user_transactions, client, settings):
+    settings.QUERY_TIME_BUDGETS = {**settings.QUERY_TIME_BUDGETS, 'transactions-list': 0}
+    client.force_login(user_transactions[0].user)
+
+    response = client.get(reverse('transactions-list'), HTTP_HX_REQUEST='true')
+
+    assert response.status_code == 503
+    assert response.headers['HX-Retarget'] == '#alerts'
+
+
+@pytest.mark.django_db
+def test_superseded_request_is_cancelled(user_transactions, client):
+    user = user_transactions[0].user
+    client.force_login(user)
+    headers = {'HTTP_HX_REQUEST': 'true', 'HTTP_X_TAB_ID': 'tab1'}
+
+    # a newer request from the same tab has already arrived
+    cache.set(f'latest-request:{user.pk}:tab1:transactions-list', 200)
+    response = client.get(reverse('transactions-list'), HTTP_X_REQUEST_SEQ='100', **headers)
+
+    assert response.status_code == 204
+
+
+@pytest.mark.django_db
+def test_newest_request_is_served_and_recorded(user_transactions, client):
+    user = user_transactions[0].user
+    client.force_login(user)
+    headers = {'HTTP_HX_REQUEST': 'true', 'HTTP_X_TAB_ID': 'tab1'}
+
+    cache.set(f'latest-request:{user.pk}:tab1:transactions-list', 100)
+    response = client.get(reverse('transactions-list'), HTTP_X_REQUEST_SEQ='200', **headers)
+
+    assert response.status_code == 200
+    assert cache.get(f'latest-request:{user.pk}:tab1:transactions-list') == 200
+
+
+@pytest.mark.django_db
+def test_cancelled_responses_are_never_reused(user_transactions, client, settings):
+    user = user_transactions[0].user
+    client.force_login(user)
+    headers = {'HTTP_HX_REQUEST': 'true', 'HTTP_X_TAB_ID': 'tab1'}
+    cache.set(f'latest-request:{user.pk}:tab1:transactions-list', 200)
+    superseded = client.get(reverse('transactions-list'), HTTP_X_REQUEST_SEQ='100', **headers)
+    settings.QUERY_TIME_BUDGETS = {**settings.QUERY_TIME_BUDGETS, 'transactions-list': 0}
+    timed_out = client.get(reverse('transactions-list'), HTTP_HX_REQUEST='true')
+
+    for response in (superseded, timed_out):
+        assert 'ETag' not in response.headers
+        assert 'no-store' in response.headers['Cache-Control']
@@ -1,5 +1,7 @@
 from datetime import datetime, timedelta
 import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from tracker.models import Category, Transaction
 from pytest_django.asserts import assertTemplateUsed
@@ -157,3 +159,179 @@ def test_delete_transaction_request(user, transaction_dict_params, client):
     )
 
     assert Transaction.objects.filter(user=user).count() == 0
+
+
+@pytest.mark.django_db
+def test_transaction_rows_are_compact(user_transactions, client, settings):
+    settings.PAGE_SIZE = 20
+    client.force_login(user_transactions[0].user)
+
+    response = client.get(reverse('get-transactions'))
+    content = response.content.decode()
+
+    # rows reference the shared SVG sprite rather than inlining the paths
+    assert '<path' not in content
+    assert content.count('data-pk=') == 20
+    # the old markup was ~1.5KB per row
+    assert len(response.content) / 20 < 1500 / 5
+
+
+@pytest.mark.django_db
+def test_update_transaction_form_pushes_url(user, transaction_dict_params, client):
+    client.force_login(user)
+    transaction = Transaction.objects.first()
+    url = reverse('update-transaction', kwargs={'pk': transaction.pk})
+
+    response = client.get(url, HTTP_HX_REQUEST='true')
+
+    assert response.headers['HX-Push-Url'] == url
+
+
+def _transaction_queries(queries):
+    return [q['sql'] for q in queries if 'tracker_transaction' in q['sql']]
+
+
+@pytest.mark.django_db
+def test_create_transaction_returns_oob_row_and_totals(user_transactions, client):
+    user = user_transactions[0].user
+    client.force_login(user)
+    client.get(reverse('transactions-list'))  # caches the totals
+    category = user_transactions[0].category
+
+    with CaptureQueriesContext(connection) as queries:
+        response = client.post(
+            reverse('create-transaction'),
+            {'type': 'income', 'category': category.pk, 'date': '2024-01-01', 'amount': 100},
+            HTTP_HX_REQUEST='true',
+        )
+
+    transaction = Transaction.objects.get(user=user, amount=100, date='2024-01-01')
+    content = response.content.decode()
+    assert 'hx-swap-oob="afterbegin:#transaction-rows"' in content
+    assert f'data-pk="{transaction.pk}"' in content
+    assert 'id="transaction-totals" hx-swap-oob="true"' in content
+
+    # the totals come from the cached ones plus the new amount, not an aggregate
+    income, expenses = Transaction.objects.filter(user=user).get_totals()
+    assert response.context['total_income'] == income
+    assert response.context['total_expenses'] == expenses
+    sql = _transaction_queries(queries)
+    assert len(sql) == 2  # the insert, and whether the list's filter selects it
+    assert not any('SUM(' in q for q in sql)
+
+
+@pytest.mark.django_db
+def test_update_out_of_filter_removes_row(user_transactions, client):
+    user = user_transactions[0].user
+    client.force_login(user)
+    client.get(reverse('transactions-list'), {'transaction_type': 'income'})
+    transaction = Transaction.objects.filter(user=user, type='income').first()
+
+    response = client.post(
+        reverse('update-transaction', kwargs={'pk': transaction.pk}),
+        {'type': 'expense', 'category': transaction.category_id,
+         'date': transaction.date, 'amount': transaction.amount},
+        HTTP_HX_REQUEST='true',
+        HTTP_X_FILTER_QUERY='transaction_type=income',
+    )
+
+    content = response.content.decode()
+    assert f"delete:#transaction-rows tr[data-pk='{transaction.pk}']" in content
+    income, expenses = Transaction.objects.filter(user=user, type='income').get_totals()
+    assert response.context['total_income'] == income
+    assert response.context['total_expenses'] == expenses == 0
+
+
+@pytest.mark.django_db
+def test_update_replaces_row_in_place(user_transactions, client):
+    user = user_transactions[0].user
+    client.force_login(user)
+    transaction = user_transactions[0]
+
+    response = client.post(
+        reverse('update-transaction', kwargs={'pk': transaction.pk}),
+        {'type': transaction.type, 'category': transaction.category_id,
+         'date': transaction.date, 'amount': 4321},
+        HTTP_HX_REQUEST='true',
+    )
+
+    content = response.content.decode()
+    assert f"outerHTML:#transaction-rows tr[data-pk='{transaction.pk}']" in content
+    assert '4321' in content
+    assert content.count(f'data-pk="{transaction.pk}"') == 1
+
+
+@pytest.mark.django_db
+def test_update_replaces_the_rows_cursor_with_its_new_date(user_transactions, client):
+    user = user_transactions[0].user
+    client.force_login(user)
+    transaction = user_transactions[0]
+
+    response = client.post(
+        reverse('update-transaction', kwargs={'pk': transaction.pk}),
+        {'type': transaction.type, 'category': transaction.category_id,
+         'date': '2001-02-03', 'amount': transaction.amount},
+        HTTP_HX_REQUEST='true',
+    )
+
+    assert f'data-cursor="2001-02-03.{transaction.pk}"' in response.content.decode()
+    assert response.headers['HX-Push-Url'] == reverse('transactions-list')
+
+
+@pytest.mark.django_db
+def test_delete_transaction_removes_row_and_updates_totals(user_transactions, client):
+    user = user_transactions[0].user
+    client.force_login(user)
+    client.get(reverse('transactions-list'))
+    transaction = user_transactions[0]
+
+    response = client.delete(
+        reverse('delete-transaction', kwargs={'pk': transaction.pk}),
+        HTTP_HX_REQUEST='true',
+    )
+
+    assert f"delete:#transaction-rows tr[data-pk='{transaction.pk}']" in response.content.decode()
+    income, expenses = Transaction.objects.filter(user=user).get_totals()
+    assert response.context['total_income'] == income
+    assert response.context['total_expenses'] == expenses
+
+
+@pytest.mark.django_db
+def test_filter_change_only_returns_rows_and_totals(user_transactions, client, settings):
+    client.force_login(user_transactions[0].user)
+    params = {'transaction_type': 'income'}
+
+    container = client.get(reverse('transactions-list'), params, HTTP_HX_REQUEST='true')
+    response = client.get(
+        reverse('transactions-list'),
+        params,
+        HTTP_HX_REQUEST='true',
+        HTTP_HX_TRIGGER='filterform',
+    )
+
+    content = response.content.decode()
+    assert content.lstrip().startswith('<tbody id="transaction-rows">')
+    assert 'id="transaction-totals" hx-swap-oob="true"' in content
+    # the filter form, and its category checkboxes, are left alone
+    assert 'id="filterform"' not in content
+    assert 'type="checkbox"' not in content
+    assert len(response.content) < len(container.content) / 2
+
+    income, _ = Transaction.objects.filter(type='income').get_totals()
+    assert f'${income:,.2f}' in content
+    assert content.count('data-pk=') == min(
+        settings.PAGE_SIZE, Transaction.objects.filter(type='income').count()
+    )
+
+
+@pytest.mark.django_db
+def test_charts_include_the_running_balance(user_transactions, client):
+    client.force_login(user_transactions[0].user)
+
+    response = client.get(reverse('transactions-charts'), {'transaction_type': 'expense'})
+
+    content = response.content.decode()
+    assert 'Running Balance (by ' in content
+    # expenses only, so the balance only ever falls
+    total = Transaction.objects.filter(type='expense').get_total_expenses()
+    assert str(-float(total)) in content
@@ -0,0 +1,166 @@
+"""
+Per-endpoint query time budgets, and cooperative cancellation of requests
+that a newer request from the same browser tab has replaced.
+
+Filter forms use hx-sync="this:replace", so htmx drops a superseded response;
+static/js/transactions.js also tags those requests with X-Tab-Id and an
+increasing X-Request-Seq, which lets the server stop running their queries.
+"""
+import time
+from contextvars import ContextVar
+from functools import wraps
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connection
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control
+from tracker.responses import render_alert
+
+# how often a running query re-checks the cache for a newer request (seconds)
+SUPERSEDED_CHECK_INTERVAL = 0.05
+# SQLite VM instructions between progress handler calls
+SQLITE_PROGRESS_STEPS = 10000
+
+_current_budget = ContextVar('query_budget', default=None)
+
+
+class QueryCancelled(Exception):
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class QueryBudget:
+    def __init__(self, request, endpoint):
+        self.deadline = time.monotonic() + settings.QUERY_TIME_BUDGETS[endpoint]
+        self.reason = None
+        self.latest_key = None
+        self.next_check = 0
+
+        tab, seq = request.headers.get('X-Tab-Id'), request.headers.get('X-Request-Seq')
+        if tab and seq and seq.isdigit():
+            self.seq = int(seq)
+            self.latest_key = f'latest-request:{request.user.pk}:{tab}:{endpoint}'
+            if self.seq > cache.get(self.latest_key, 0):
+                cache.set(self.latest_key, self.seq, timeout=60 * 60)
+
+    def should_abort(self):
+        if self.reason:
+            return True
+
+        now = time.monotonic()
+        if now > self.deadline:
+            self.reason = 'timeout'
+        elif self.latest_key and now >= self.next_check:
+            self.next_check = now + SUPERSEDED_CHECK_INTERVAL
+            if cache.get(self.latest_key, 0) > self.seq:
+                self.reason = 'superseded'
+        return self.reason is not None
+
+    def install(self):
+        """Applies the budget to the current thread's database connection"""
+        connection.execute_wrappers.append(self._execute)
+        if connection.vendor == 'sqlite':
+            # aborts a running statement as soon as the handler returns non-zero
+            connection.ensure_connection()
+            connection.connection.set_progress_handler(
+                lambda: int(self.should_abort()), SQLITE_PROGRESS_STEPS
+            )
+        elif connection.vendor == 'postgresql':
+            remaining_ms = max(int((self.deadline - time.monotonic()) * 1000), 1)
+            with connection.cursor() as cursor:
+                cursor.execute('SET statement_timeout = %s', [remaining_ms])
+
+    def uninstall(self):
+        connection.execute_wrappers.remove(self._execute)
+        if connection.vendor == 'sqlite' and connection.connection is not None:
+            connection.connection.set_progress_handler(None, 0)
+        elif connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('RESET statement_timeout')
+
+    def _execute(self, execute, sql, params, many, context):
+        if self.should_abort():
+            raise QueryCancelled(self.reason)
+        try:
+            return execute(sql, params, many, context)
+        except DatabaseError as error:
+            self.check_cancelled(error)
+            raise
+
+    def check_cancelled(self, error):
+        """Raises QueryCancelled if the budget caused this database error"""
+        # SQLite reports an interrupt, PostgreSQL a cancelled statement (57014)
+        if getattr(error.__cause__, 'pgcode', None) == '57014':
+            self.reason = self.reason or 'timeout'
+        if self.reason:
+            raise QueryCancelled(self.reason) from error
+
+
+def current_budget():
+    return _current_budget.get()
+
+
+def cancelled_response(request, reason):
+    if reason == 'superseded':
+        # htmx has already dropped this request, so there is nothing to render
+        response = HttpResponse(status=204)
+    else:
+        response = render_alert(
+            request,
+            'tracker/partials/query-timeout.html',
+            {'title': 'Request Timed Out'},
+            status=503,
+        )
+    # neither stands for the page, so the browser must never reuse them
+    patch_cache_control(response, no_store=True)
+    return response
+
+
+def query_budget(endpoint):
+    """
+    Runs the view under the time budget settings.QUERY_TIME_BUDGETS[endpoint],
+    and stops its queries once a newer request from the same tab arrives.
+    Worker threads started with gather_queries() pick up the same budget.
+    """
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def async_wrapper(request, *args, **kwargs):
+                budget = QueryBudget(request, endpoint)
+                token = _current_budget.set(budget)
+                await sync_to_async(budget.install)()
+                try:
+                    try:
+                        return await view_func(request, *args, **kwargs)
+                    except DatabaseError as error:
+                        # an interrupt can also surface while rows are fetched
+                        budget.check_cancelled(error)
+                        raise
+                except QueryCancelled as cancelled:
+                    return cancelled_response(request, cancelled.reason)
+                finally:
+                    await sync_to_async(budget.uninstall)()
+                    _current_budget.reset(token)
+            return async_wrapper
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            budget = QueryBudget(request, endpoint)
+            token = _current_budget.set(budget)
+            budget.install()
+            try:
+                try:
+                    return view_func(request, *args, **kwargs)
+                except DatabaseError as error:
+                    # an interrupt can also surface while rows are fetched
+                    budget.check_cancelled(error)
+                    raise
+            except QueryCancelled as cancelled:
+                return cancelled_response(request, cancelled.reason)
+            finally:
+                budget.uninstall()
+                _current_budget.reset(token)
+        return wrapper
+    return decorator
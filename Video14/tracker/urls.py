@@ -1,10 +1,20 @@
+from django.conf import settings
 from django.urls import path
 from tracker import views
 
+# under ASGI the list and charts pages run their queries concurrently
+if settings.ASYNC_VIEWS:
+    transactions_list = views.transactions_list_async
+    transaction_charts = views.transaction_charts_async
+else:
+    transactions_list = views.transactions_list
+    transaction_charts = views.transaction_charts
+
 
 urlpatterns = [
     path("", views.index, name='index'),
-    path("transactions/", views.transactions_list, name='transactions-list'),
+    path('dashboard/<slug:name>/', views.dashboard_panel, name='dashboard-panel'),
+    path("transactions/", transactions_list, name='transactions-list'),
     path('transactions/create/', views.create_transaction, name='create-transaction'),
 
     path('transactions/<int:pk>/update/', views.update_transaction, name='update-transaction'),
@@ -12,7 +22,10 @@ urlpatterns = [
 
     path('get-transactions/', views.get_transactions, name='get-transactions'),
 
-    path('transactions/charts', views.transaction_charts, name='transactions-charts'),
+    path('transactions/charts', transaction_charts, name='transactions-charts'),
+    path('transactions/pivot', views.pivot_report, name='pivot-report'),
+    path('transactions/pivot.csv', views.pivot_report_csv, name='pivot-report-csv'),
+    path('transactions/compare', views.period_comparison, name='period-comparison'),
 
     path('transactions/export', views.export, name='export'),
     path('transactions/import', views.import_transactions, name='import'),
@@ -1,156 +1,423 @@
+from asgiref.sync import async_to_sync, sync_to_async
 from django.shortcuts import render, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_http_methods
-from django.core.paginator import Paginator
-from django.conf import settings
+from django.views.decorators.vary import vary_on_headers
+from django.views.decorators.cache import cache_control
 from tracker.models import Transaction
 from tracker.filters import TransactionFilter
-from tracker.forms import TransactionForm
-from django_htmx.http import retarget
-from tracker.charting import plot_income_expenses_bar_chart, plot_category_pie_chart
+from tracker.forms import PeriodComparisonForm, TransactionForm
+from django_htmx.http import push_url, retarget
+from tracker.charting import (
+    plot_category_pie_chart,
+    plot_income_expenses_bar_chart,
+    plot_running_balance_chart,
+    to_div,
+)
+from tracker.reports import Pivot, compare_periods
 from tracker.resources import TransactionResource
-from django.http import HttpResponse
+from tracker.caching import (
+    apply_totals_delta,
+    cached_totals,
+    conditional,
+    get_totals,
+    render_transaction_rows,
+    transactions_etag,
+)
+from tracker.concurrency import async_transactions_view, gather_queries
+from tracker.dashboard import PANELS, render_panel
+from tracker.frames import get_frame
+from tracker.history import is_partial, restorable
+from tracker.paging import get_rows, make_cursor, page_size, parse_cursor
+from tracker.singleflight import coalesce, request_key
+from tracker.timeouts import query_budget
+from django.http import Http404, HttpResponse, QueryDict
+from django.urls import reverse
 from tablib import Dataset
 
 # Create your views here.
 def index(request):
-    return render(request, 'tracker/index.html')
+    # only the shell - every panel is loaded and cached separately
+    return render(request, 'tracker/index.html', {'panels': PANELS})
 
 
 @login_required
-def transactions_list(request):
-    transaction_filter = TransactionFilter(
+@cache_control(private=True, no_cache=True)
+@query_budget('dashboard-panel')
+def dashboard_panel(request, name):
+    if name not in PANELS:
+        raise Http404
+    return HttpResponse(render_panel(name, request.user))
+
+
+def _list_template(request):
+    if not is_partial(request):
+        return 'tracker/transactions-list.html'
+    if request.htmx.trigger == 'filterform':
+        # a filter change only swaps the rows and the totals - the form is
+        # already on the page, and re-rendering it means every category choice
+        return 'tracker/partials/transactions-container.html#filter_results'
+    return 'tracker/partials/transactions-container.html'
+
+
+def _transaction_filter(request):
+    return TransactionFilter(
         request.GET,
         queryset=Transaction.objects.filter(user=request.user).select_related('category')
     )
-    paginator = Paginator(transaction_filter.qs, settings.PAGE_SIZE)
-    transaction_page = paginator.page(1) # default to 1 when this view is triggered
 
-    total_income = transaction_filter.qs.get_total_income()
-    total_expenses = transaction_filter.qs.get_total_expenses()
-    context = {
-        'transactions': transaction_page,
+
+def _first_page(request, qs):
+    # the first page is sized to fill the viewport in one request
+    transactions, has_more = get_rows(qs, page_size(request, first=True))
+    return transactions, has_more, render_transaction_rows(transactions)
+
+
+def _list_context_from(transaction_filter, first_page, totals):
+    """The list's context, from the results of _first_page() and get_totals()."""
+    transactions, has_more, rows = first_page
+    total_income, total_expenses = totals
+    return {
+        'transactions': transactions,
+        'next_cursor': has_more and make_cursor(transactions[-1]),
+        'rows': rows,
         'filter': transaction_filter,
         'total_income': total_income,
         'total_expenses': total_expenses,
         'net_income': total_income - total_expenses
     }
 
-    if request.htmx:
-        return render(request, 'tracker/partials/transactions-container.html', context)
 
-    return render(request, 'tracker/transactions-list.html', context)
+def _list_context(request):
+    transaction_filter = _transaction_filter(request)
+    return _list_context_from(
+        transaction_filter,
+        _first_page(request, transaction_filter.qs),
+        get_totals(request.user.pk, transaction_filter),
+    )
+
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@vary_on_headers(
+    'HX-Request', 'HX-Trigger', 'HX-History-Restore-Request',
+    'X-Viewport-Rows', 'X-Scroll-Velocity',
+)
+@conditional(transactions_etag)
+@restorable
+@query_budget('transactions-list')
+def transactions_list(request):
+    return render(request, _list_template(request), _list_context(request))
+
+
+@async_transactions_view
+@restorable
+@query_budget('transactions-list')
+async def transactions_list_async(request):
+    transaction_filter = _transaction_filter(request)
+    # validating the filter form looks up the selected categories
+    qs = await sync_to_async(lambda: transaction_filter.qs)()
+
+    first_page, totals = await gather_queries(
+        lambda: _first_page(request, qs),
+        lambda: get_totals(request.user.pk, transaction_filter),
+    )
+    context = _list_context_from(transaction_filter, first_page, totals)
+
+    # the filter form renders the category choices, which queries the database
+    return await sync_to_async(render)(request, _list_template(request), context)
+
+
+def _write_filter(request):
+    # the list's current filter, sent by transactions.js with every write
+    return TransactionFilter(
+        QueryDict(request.headers.get('X-Filter-Query', '')),
+        queryset=Transaction.objects.filter(user=request.user)
+    )
+
+
+def _selected(transaction_filter, transaction):
+    """
+    Returns (type, amount) when the filter selects the transaction, else None.
+    This is a single primary key lookup, whatever the filter.
+    """
+    if transaction_filter.qs.filter(pk=transaction.pk).exists():
+        return transaction.type, transaction.amount
+    return None
+
+
+def _written(request, message, transaction_filter, before, transaction, pk,
+             removed=None, added=None):
+    """
+    Response to a successful write: the success message for the form area,
+    plus out-of-band swaps that insert, replace or remove the transaction's
+    row and update the totals, so the list doesn't have to be fetched again.
+    """
+    context = {'message': message, 'target': '#transaction-form-area'}
+    if request.htmx:
+        totals = apply_totals_delta(
+            request.user.pk, transaction_filter, before, removed, added
+        )
+        if totals is None:
+            totals = get_totals(request.user.pk, transaction_filter)
+        total_income, total_expenses = totals
+        context.update({
+            'pk': pk,
+            'removed': removed is not None,
+            'rows': render_transaction_rows([transaction]) if added else [],
+            'total_income': total_income,
+            'total_expenses': total_expenses,
+            'net_income': total_income - total_expenses,
+            'oob': True,
+        })
+    response = render(request, 'tracker/partials/transaction-written.html', context)
+    if request.htmx:
+        return push_url(response, reverse('transactions-list'))
+    return response
 
 
 @login_required
+@restorable
 def create_transaction(request):
     if request.method == 'POST':
         form = TransactionForm(request.POST)
         if form.is_valid():
+            transaction_filter = _write_filter(request)
+            before = cached_totals(request.user.pk, transaction_filter)
             transaction = form.save(commit=False)
             transaction.user = request.user
             transaction.save()
-            context = {'message': "Transaction was added successfully!"}
-            return render(request, 'tracker/partials/transaction-success.html', context)
+            return _written(
+                request,
+                "Transaction was added successfully!",
+                transaction_filter,
+                before,
+                transaction,
+                transaction.pk,
+                added=_selected(transaction_filter, transaction),
+            )
         else:
             context = {'form': form}
             response = render(request, 'tracker/partials/create-transaction.html', context)
-            return retarget(response, '#transaction-block')
+            return retarget(response, '#transaction-form-area')
 
     context = {'form': TransactionForm()}
-    return render(request, 'tracker/partials/create-transaction.html', context)
+    if is_partial(request):
+        return render(request, 'tracker/partials/create-transaction.html', context)
+    # a reload or history restore of the pushed URL: the list with the form open
+    context.update(_list_context(request), form_template='tracker/partials/create-transaction.html')
+    return render(request, 'tracker/transactions-list.html', context)
 
 @login_required
+@restorable
 def update_transaction(request, pk):
     transaction = get_object_or_404(Transaction, pk=pk, user=request.user)
     if request.method == 'POST':
         form = TransactionForm(request.POST, instance=transaction)
+        transaction_filter = _write_filter(request)
+        # validating the form updates the instance, so look at the old values first
+        removed = _selected(transaction_filter, transaction)
         if form.is_valid():
+            before = cached_totals(request.user.pk, transaction_filter)
             transaction = form.save()
-            context = {'message': "Transaction was updated successfully!"}
-            return render(request, 'tracker/partials/transaction-success.html', context)
+            return _written(
+                request,
+                "Transaction was updated successfully!",
+                transaction_filter,
+                before,
+                transaction,
+                transaction.pk,
+                removed=removed,
+                added=_selected(transaction_filter, transaction),
+            )
         else:
             context = {
                 'form': form,
                 'transaction': transaction,
             }
             response = render(request, 'tracker/partials/update-transaction.html', context)
-            return retarget(response, '#transaction-block')
+            return retarget(response, '#transaction-form-area')
         
     context = {
         'form': TransactionForm(instance=transaction),
         'transaction': transaction,
     }
-    return render(request, 'tracker/partials/update-transaction.html', context)
+    if is_partial(request):
+        response = render(request, 'tracker/partials/update-transaction.html', context)
+        # the row's edit link is handled by a delegated click handler, so the
+        # server pushes the URL instead of an hx-push-url attribute
+        return push_url(response, request.get_full_path())
+    context.update(_list_context(request), form_template='tracker/partials/update-transaction.html')
+    return render(request, 'tracker/transactions-list.html', context)
 
 @login_required
 @require_http_methods(["DELETE"])
 def delete_transaction(request, pk):
     transaction = get_object_or_404(Transaction, pk=pk, user=request.user)
+    transaction_filter = _write_filter(request)
+    removed = _selected(transaction_filter, transaction)
+    before = cached_totals(request.user.pk, transaction_filter)
     transaction.delete()
-    context = {
-        'message': f"Transaction of {transaction.amount} on {transaction.date} was deleted successfully!"
-    }
-    return render(request, 'tracker/partials/transaction-success.html', context)
+    return _written(
+        request,
+        f"Transaction of {transaction.amount} on {transaction.date} was deleted successfully!",
+        transaction_filter,
+        before,
+        transaction,
+        pk,
+        removed=removed,
+    )
 
 @login_required
+@cache_control(private=True, no_cache=True)
+@vary_on_headers('HX-Request', 'HX-Trigger', 'X-Viewport-Rows', 'X-Scroll-Velocity')
+@conditional(transactions_etag)
+@query_budget('get-transactions')
 def get_transactions(request):
-    page = request.GET.get('page', 1)  # ?page=2
-    transaction_filter = TransactionFilter(
-        request.GET,
-        queryset=Transaction.objects.filter(user=request.user).select_related('category')
+    transaction_filter = _transaction_filter(request)
+    before = parse_cursor(request.GET.get('before'))
+    transactions, has_more = get_rows(
+        transaction_filter.qs,
+        page_size(request),
+        after=parse_cursor(request.GET.get('after')),
+        before=before,
     )
-    paginator = Paginator(transaction_filter.qs, settings.PAGE_SIZE)
     context = {
-        'transactions': paginator.page(page)
+        'transactions': transactions,
+        # rows fetched upwards by the windowed list have no "load more" trigger
+        'next_cursor': has_more and before is None and make_cursor(transactions[-1]),
+        'rows': render_transaction_rows(transactions),
     }
-    return render(
+    response = render(
         request,
         'tracker/partials/transactions-container.html#transaction_list',
         context
     )
+    response['X-Has-More'] = 'true' if has_more else 'false'
+    return response
+
 
+def _charts(frame, running_balance):
+    """The charts' HTML, from the filtered frame and the rendered running balance chart."""
+    return {
+        'income_expense_barchart': to_div(plot_income_expenses_bar_chart(frame)),
+        'running_balance_chart': running_balance,
+        'category_income_pie': to_div(plot_category_pie_chart(frame.filter(type='income'))),
+        'category_expense_pie': to_div(plot_category_pie_chart(frame.filter(type='expense'))),
+    }
+
+
+def _charts_template(request):
+    if is_partial(request):
+        return 'tracker/partials/charts-container.html'
+    return 'tracker/charts.html'
 
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@vary_on_headers('HX-Request', 'HX-Trigger', 'HX-History-Restore-Request')
+@conditional(transactions_etag)
+@restorable
+@query_budget('transactions-charts')
 def transaction_charts(request):
-    transaction_filter = TransactionFilter(
-        request.GET,
-        queryset=Transaction.objects.filter(user=request.user).select_related('category')
+    transaction_filter = _transaction_filter(request)
+
+    def build_charts():
+        frame = transaction_filter.filter_frame(get_frame(request.user.pk))
+        return _charts(frame, to_div(plot_running_balance_chart(transaction_filter.qs)))
+
+    # identical concurrent requests (double-clicks, several tabs) share one computation
+    charts = coalesce(request_key(request, 'charts'), build_charts)
+    context = {'filter': transaction_filter, **charts}
+    return render(request, _charts_template(request), context)
+
+
+@async_transactions_view
+@restorable
+@query_budget('transactions-charts')
+async def transaction_charts_async(request):
+    transaction_filter = _transaction_filter(request)
+    qs = await sync_to_async(lambda: transaction_filter.qs)()
+
+    def build_charts():
+        # the running balance is a query of its own; the rest is NumPy over the cached frame
+        frame, running_balance = async_to_sync(gather_queries)(
+            lambda: transaction_filter.filter_frame(get_frame(request.user.pk)),
+            lambda: to_div(plot_running_balance_chart(qs)),
+        )
+        return _charts(frame, running_balance)
+
+    # followers block until the leader finishes, so wait in a worker thread
+    charts = await sync_to_async(coalesce, thread_sensitive=False)(
+        request_key(request, 'charts'), build_charts
     )
-    income_expense_bar = plot_income_expenses_bar_chart(transaction_filter.qs)
+    context = {'filter': transaction_filter, **charts}
+    return await sync_to_async(render)(request, _charts_template(request), context)
 
-    category_income_pie = plot_category_pie_chart(
-        transaction_filter.qs.filter(type='income')
+def _pivot(request):
+    transaction_filter = TransactionFilter(
+        request.GET, queryset=Transaction.objects.filter(user=request.user)
     )
-    category_expense_pie = plot_category_pie_chart(
-        transaction_filter.qs.filter(type='expense')
+    # identical concurrent requests (double-clicks, several tabs) share one computation
+    pivot = coalesce(
+        request_key(request, 'pivot'), lambda: Pivot.from_queryset(transaction_filter.qs)
     )
+    return transaction_filter, pivot
 
-    context = {
-        'filter': transaction_filter,
-        'income_expense_barchart': income_expense_bar.to_html(),
-        'category_income_pie': category_income_pie.to_html(),
-        'category_expense_pie': category_expense_pie.to_html(),
-    }
-    if request.htmx:
-        return render(request, 'tracker/partials/charts-container.html', context)
-    return render(request, 'tracker/charts.html', context)
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@vary_on_headers('HX-Request', 'HX-Trigger', 'HX-History-Restore-Request')
+@conditional(transactions_etag)
+@restorable
+@query_budget('pivot-report')
+def pivot_report(request):
+    transaction_filter, pivot = _pivot(request)
+    context = {'filter': transaction_filter, 'pivot': pivot}
+    if is_partial(request):
+        return render(request, 'tracker/partials/pivot-container.html', context)
+    return render(request, 'tracker/pivot.html', context)
+
+
+@login_required
+@query_budget('pivot-report')
+def pivot_report_csv(request):
+    # same key as the page, so a download right after it shares the computation
+    _, pivot = _pivot(request)
+    response = HttpResponse(pivot.to_csv(), content_type='text/csv')
+    response['Content-Disposition'] = 'attachment; filename="pivot.csv"'
+    return response
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@vary_on_headers('HX-Request', 'HX-Trigger', 'HX-History-Restore-Request')
+@conditional(transactions_etag)
+@restorable
+@query_budget('period-comparison')
+def period_comparison(request):
+    form = PeriodComparisonForm(request.GET or None)
+    current, previous = form.periods()
+    context = {'form': form, 'comparison': compare_periods(request.user.pk, current, previous)}
+    if is_partial(request):
+        return render(request, 'tracker/partials/comparison-container.html', context)
+    return render(request, 'tracker/comparison.html', context)
 
 @login_required
 def export(request):
     if request.htmx:
         return HttpResponse(headers={'HX-Redirect': request.get_full_path()})
     
-    transaction_filter = TransactionFilter(
-        request.GET,
-        queryset=Transaction.objects.filter(user=request.user).select_related('category')
-    )
+    transaction_filter = _transaction_filter(request)
+
+    def build_csv():
+        return TransactionResource().export(transaction_filter.qs).csv
 
-    data = TransactionResource().export(transaction_filter.qs)
-    response = HttpResponse(data.csv)
+    response = HttpResponse(coalesce(request_key(request, 'export'), build_csv))
     response['Content-Disposition'] = 'attachment; filename="transactions.csv"'
     return response
 
 @login_required
+@restorable
 def import_transactions(request):
     if request.method == 'POST':
         file = request.FILES.get('file')
@@ -169,4 +436,6 @@ def import_transactions(request):
         else:
             context = {'message': 'Sorry, an error occurred.'}
         return render(request, 'tracker/partials/transaction-success.html', context)
-    return render(request, 'tracker/partials/import-transaction.html')
\ No newline at end of file
+    if is_partial(request):
+        return render(request, 'tracker/partials/import-transaction.html')
+    return render(request, 'tracker/import-transactions.html')
\ No newline at end of file